@@ -0,0 +1,110 @@
+import bpy
+
+
+data = bpy.data
+scene = data.scenes["Scene"]
+
+# properties the parameter wrappers write, by object name
+object_properties = ("location", "rotation_euler", "hide_render", "hide_viewport")
+modifier_properties = {
+    "SUBSURF": ("levels", "render_levels"),
+    "UV_WARP": ("offset", "rotation"),
+}
+light_properties = ("energy", "color", "shadow_soft_size", "spot_size")
+animated_objects = (
+    "paper",
+    "ground_plane",
+    "shadow_plane",
+    "camera_look_at",
+    "light_0",
+    "light_1",
+)
+
+
+def is_driven(struct, path):
+    id_ = struct.id_data
+    if id_.animation_data is None:
+        return False
+
+    full_path = struct.path_from_id(path) if struct != id_ else path
+    return any(k.data_path == full_path for k in id_.animation_data.drivers)
+
+
+def id_properties(struct):
+    # numeric custom properties, e.g. geometry nodes inputs
+    return [
+        f'["{k}"]'
+        for k, v in struct.items()
+        if isinstance(v, (int, float)) and not isinstance(v, bool)
+    ]
+
+
+def keyed_properties():
+    properties = [(scene, k) for k in id_properties(scene)]
+
+    for name in animated_objects:
+        obj = data.objects[name]
+        properties += [(obj, k) for k in object_properties]
+        properties += [(obj, k) for k in id_properties(obj)]
+
+        for modifier in obj.modifiers:
+            properties += [(modifier, k) for k in id_properties(modifier)]
+            properties += [
+                (modifier, k) for k in modifier_properties.get(modifier.type, ())
+            ]
+
+        for constraint in obj.constraints:
+            target = getattr(constraint, "target", None)
+            if target is not None:
+                properties += [(target, k) for k in object_properties]
+
+        if obj.type == "LIGHT":
+            properties += [(obj.data, k) for k in light_properties]
+
+        if obj.active_material is not None:
+            bump = obj.active_material.node_tree.nodes.get("ground_bump")
+            if bump is not None:
+                properties += [(k, "default_value") for k in bump.inputs[:2]]
+
+    for node in data.worlds["World"].node_tree.nodes:
+        if node.type == "BACKGROUND":
+            properties.append((node.inputs[1], "default_value"))
+
+    # drivers overwrite keyframes, their inputs are keyed instead
+    return [(k, v) for k, v in properties if not is_driven(k, v)]
+
+
+class Animation:
+    # keyframes the scene state of several samples on consecutive frames, the
+    # keys go into temporary actions that are dropped again in restore
+    def __init__(self):
+        self.properties = keyed_properties()
+        self.frame_count = 0
+
+        self.__actions = {}
+        for struct, _ in self.properties:
+            id_ = struct.id_data
+            if id_ in self.__actions:
+                continue
+
+            animation_data = id_.animation_data or id_.animation_data_create()
+            self.__actions[id_] = animation_data.action
+            animation_data.action = data.actions.new(f"{id_.name}_samples")
+
+    def key_frame(self):
+        self.frame_count += 1
+        for struct, path in self.properties:
+            struct.keyframe_insert(path, frame=self.frame_count)
+
+        # values only change on the sample frames
+        for id_ in self.__actions:
+            for fcurve in id_.animation_data.action.fcurves:
+                fcurve.keyframe_points[-1].interpolation = "CONSTANT"
+
+    def restore(self):
+        for id_, action in self.__actions.items():
+            samples_action = id_.animation_data.action
+            id_.animation_data.action = action
+            data.actions.remove(samples_action)
+
+        self.__actions = {}
@@ -0,0 +1,384 @@
+from typing import Union, Optional, Dict, Any, List, Sequence
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import platform
+import subprocess
+
+from pathlib import Path as pth
+
+import numpy as np
+
+import config
+import config_batch
+import metrics
+import render_farm
+
+
+# parameters the sweep varies one at a time around the config defaults, the
+# rest of every sample is drawn from the seed
+default_sweeps = {
+    "render.resolution": [(512, 512), (1024, 1024), (2048, 2048)],
+    "render.cycles_samples": [2, 8, 32],
+    "paper.subdivisions": [6, 8],
+    "ground.subdivisions": [7, 9],
+    "render.render_engine": ["cycles", "eevee"],
+}
+
+# relative increase over the baseline that counts as a regression
+regression_tolerances = {
+    "seconds_per_image": 0.1,
+    "peak_rss_mb": 0.1,
+    "output_mb_per_image": 0.05,
+}
+
+
+def run_blender(command: Sequence[str]) -> Dict[str, Any]:
+    # wall time and peak resident memory of a single blender process
+    start_time = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        # kilobytes on linux
+        peak_rss_mb = usage.ru_maxrss / 1024
+    else:
+        process.wait()
+        peak_rss_mb = None
+
+    return {
+        "seconds": time.perf_counter() - start_time,
+        "peak_rss_mb": peak_rss_mb,
+        "returncode": process.returncode,
+    }
+
+
+def run_case(
+    blender_path: Union[str, pth],
+    name: str,
+    columns: config_batch.Columns,
+    work_dir: Union[str, pth],
+    device: str = "CUDA",
+    threads: int = 0,
+) -> Dict[str, Any]:
+    work_dir = pth(work_dir).resolve()
+    output_dir = work_dir / name
+    n_samples = len(columns[config_batch.name_column])
+
+    # start from scratch, otherwise earlier renders would be resumed
+    shutil.rmtree(output_dir, ignore_errors=True)
+    metrics.metrics_path(output_dir).unlink(missing_ok=True)
+
+    columns = dict(columns)
+    columns["render.output_dir"] = np.full(n_samples, str(output_dir))
+
+    batch_path = work_dir / f"{name}.batch"
+    work_dir.mkdir(parents=True, exist_ok=True)
+    config_batch.write_batch(batch_path, columns)
+
+    print(f"Benchmarking {name} with {n_samples} samples...")
+    result = run_blender(
+        render_farm.blender_command(
+            blender_path, batch_path, device=device, threads=threads
+        )
+    )
+
+    if result["returncode"] != 0:
+        raise RuntimeError(f"Blender exited with {result['returncode']} for {name}")
+
+    output_mb = sum(k.stat().st_size for k in output_dir.rglob("*") if k.is_file())
+    output_mb /= 2**20
+
+    records = metrics.read_metrics(metrics.metrics_path(output_dir))
+    render_seconds = [k["stages"]["render"] for k in records]
+    peak_memory = [
+        k["render"]["peak_memory_mb"]
+        for k in records
+        if k["render"].get("peak_memory_mb") is not None
+    ]
+
+    result.update(
+        name=name,
+        n_samples=n_samples,
+        seconds_per_image=result["seconds"] / n_samples,
+        render_seconds_p50=metrics.percentile(render_seconds, 50),
+        render_peak_memory_mb=max(peak_memory) if peak_memory else None,
+        output_mb_per_image=output_mb / n_samples,
+    )
+    return result
+
+
+def format_results(results: Sequence[Dict[str, Any]]) -> str:
+    def number(value, unit):
+        return "-" if value is None else f"{value:.2f}{unit}"
+
+    lines = [
+        f"  {'case':<24} {'per image':>10} {'render p50':>11} "
+        f"{'render peak':>12} {'process peak':>13} {'output':>9}"
+    ]
+    for result in results:
+        lines.append(
+            f"  {result['name']:<24} {number(result['seconds_per_image'], 's'):>10} "
+            f"{number(result['render_seconds_p50'], 's'):>11} "
+            f"{number(result['render_peak_memory_mb'], 'M'):>12} "
+            f"{number(result['peak_rss_mb'], 'M'):>13} "
+            f"{number(result.get('output_mb_per_image'), 'M'):>9}"
+        )
+
+    return "\n".join(lines)
+
+
+def benchmark_ground_detail(
+    blender_path: Union[str, pth],
+    work_dir: Union[str, pth],
+    n_samples: int = 8,
+    seed: int = 0,
+    device: str = "CUDA",
+    threads: int = 0,
+    modes: Sequence[str] = ("mesh", "bump"),
+):
+    # the same samples with a visible ground in every detail mode
+    columns = config_batch.generate_batch(
+        n_samples, seed, device, project_root=render_farm.project_dir
+    )
+    columns["ground.visible"] = np.full(n_samples, True)
+
+    results = []
+    for mode in modes:
+        columns["ground.detail_mode"] = np.full(n_samples, mode)
+        results.append(
+            run_case(blender_path, f"ground_{mode}", columns, work_dir, device, threads)
+        )
+
+    print(format_results(results))
+
+    results_path = pth(work_dir) / "ground_detail.json"
+    with open(results_path, "w") as json_file:
+        json.dump(results, json_file, indent=2)
+    print(f"Results written to {results_path}")
+
+
+def seeded_columns(
+    n_samples: int, seed: int, device: str = "CPU"
+) -> config_batch.Columns:
+    # the same scenes on every machine and blender version
+    config.set_seed(seed)
+    configs = [config.Config(device, render_farm.project_dir) for _ in range(n_samples)]
+
+    columns = config_batch.to_columns(configs)
+    columns[config_batch.name_column] = np.asarray(
+        [f"sample_{i:08d}" for i in range(n_samples)]
+    )
+    return columns
+
+
+def sweep_cases(
+    sweeps: Dict[str, Sequence[Any]], columns: config_batch.Columns
+) -> Dict[str, config_batch.Columns]:
+    # the seeded samples once and every other sweep value on its own, the swept
+    # parameters aren't drawn so every sample has the same base value
+    n_samples = len(columns[config_batch.name_column])
+
+    cases = {"base": {}}
+    for parameter, values in sweeps.items():
+        for value in values:
+            if np.array_equal(columns[parameter][0], value):
+                continue
+
+            label = "x".join(map(str, value)) if isinstance(value, tuple) else value
+            name = f"{parameter.replace('render.', '').replace('.', '_')}_{label}"
+            cases[name] = {parameter: np.asarray([value] * n_samples)}
+
+    return cases
+
+
+def environment(blender_path: Union[str, pth]) -> Dict[str, Any]:
+    # what a result depends on besides the code, compared results should match
+    blend_file_path = render_farm.project_dir / "blender" / "scene.blend"
+    with open(blend_file_path, "rb") as blend_file:
+        blend_hash = hashlib.sha256(blend_file.read()).hexdigest()
+
+    version = subprocess.run(
+        [str(blender_path), "--version"], capture_output=True, text=True
+    ).stdout
+
+    return {
+        "blender_version": version.splitlines()[0] if version else None,
+        "blend_file_hash": blend_hash,
+        "machine": platform.node(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def benchmark_sweep(
+    blender_path: Union[str, pth],
+    work_dir: Union[str, pth],
+    results_path: Optional[Union[str, pth]] = None,
+    n_samples: int = 4,
+    seed: int = 0,
+    device: str = "CPU",
+    threads: int = 0,
+    parameters: Optional[Sequence[str]] = None,
+):
+    sweeps = {k: default_sweeps[k] for k in parameters or default_sweeps}
+    columns = seeded_columns(n_samples, seed, device)
+
+    results = []
+    for name, overrides in sweep_cases(sweeps, columns).items():
+        try:
+            result = run_case(
+                blender_path,
+                name,
+                {**columns, **overrides},
+                work_dir,
+                device,
+                threads,
+            )
+        except RuntimeError as e:
+            # e.g. eevee without a display, the other cases still run
+            print(e)
+            result = {"name": name, "error": str(e)}
+
+        result["parameters"] = {k: v[0].tolist() for k, v in overrides.items()}
+        results.append(result)
+
+    print(format_results([k for k in results if "error" not in k]))
+
+    results_path = pth(results_path or pth(work_dir) / "sweep.json")
+    with open(results_path, "w") as json_file:
+        json.dump(
+            {
+                "environment": environment(blender_path),
+                "seed": seed,
+                "n_samples": n_samples,
+                "device": device,
+                "threads": threads,
+                "results": results,
+            },
+            json_file,
+            indent=2,
+        )
+    print(f"Results written to {results_path}")
+
+
+def regressions(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    tolerances: Optional[Dict[str, float]] = None,
+) -> List[str]:
+    tolerances = {**regression_tolerances, **(tolerances or {})}
+    baseline_cases = {k["name"]: k for k in baseline["results"]}
+
+    found = []
+    for case in current["results"]:
+        before = baseline_cases.get(case["name"])
+        if before is None or "error" in before:
+            continue
+
+        if "error" in case:
+            found.append(f"{case['name']} failed: {case['error']}")
+            continue
+
+        for metric, tolerance in tolerances.items():
+            if before.get(metric) is None or case.get(metric) is None:
+                continue
+
+            change = case[metric] / max(before[metric], 1e-9) - 1
+            if change > tolerance:
+                found.append(
+                    f"{case['name']} {metric} {before[metric]:.2f} -> "
+                    f"{case[metric]:.2f} (+{change:.0%})"
+                )
+
+    return found
+
+
+def compare(
+    baseline_path: Union[str, pth],
+    results_path: Union[str, pth],
+    tolerance: Optional[float] = None,
+) -> bool:
+    with open(baseline_path) as json_file:
+        baseline = json.load(json_file)
+    with open(results_path) as json_file:
+        current = json.load(json_file)
+
+    for key in ("seed", "n_samples", "device", "threads"):
+        if baseline.get(key) != current.get(key):
+            print(f"Warning: {key} differs, {baseline.get(key)} -> {current.get(key)}")
+
+    for key, value in current["environment"].items():
+        if key != "time" and baseline["environment"].get(key) != value:
+            print(f"{key}: {baseline['environment'].get(key)} -> {value}")
+
+    tolerances = None
+    if tolerance is not None:
+        tolerances = {k: tolerance for k in regression_tolerances}
+
+    found = regressions(baseline, current, tolerances)
+    for line in found:
+        print(f"Regression: {line}")
+    if not found:
+        print("No regressions")
+
+    return not found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ground_parser = subparsers.add_parser("ground_detail")
+    ground_parser.add_argument("--blender_path", required=True)
+    ground_parser.add_argument("--work_dir", required=True)
+    ground_parser.add_argument("--n_samples", type=int, default=8)
+    ground_parser.add_argument("--seed", type=int, default=0)
+    ground_parser.add_argument("--cycles-device", default="CUDA")
+    ground_parser.add_argument("--threads", type=int, default=0)
+
+    sweep_parser = subparsers.add_parser("sweep")
+    sweep_parser.add_argument("--blender_path", required=True)
+    sweep_parser.add_argument("--work_dir", required=True)
+    sweep_parser.add_argument("--results_path")
+    sweep_parser.add_argument("--n_samples", type=int, default=4)
+    sweep_parser.add_argument("--seed", type=int, default=0)
+    sweep_parser.add_argument("--cycles-device", default="CPU")
+    sweep_parser.add_argument("--threads", type=int, default=0)
+    sweep_parser.add_argument("--parameters", nargs="+", choices=list(default_sweeps))
+
+    compare_parser = subparsers.add_parser("compare")
+    compare_parser.add_argument("--baseline", required=True)
+    compare_parser.add_argument("--results", required=True)
+    compare_parser.add_argument("--tolerance", type=float)
+
+    args = parser.parse_args()
+
+    if args.command == "ground_detail":
+        benchmark_ground_detail(
+            args.blender_path,
+            args.work_dir,
+            args.n_samples,
+            args.seed,
+            args.cycles_device,
+            args.threads,
+        )
+    elif args.command == "sweep":
+        benchmark_sweep(
+            args.blender_path,
+            args.work_dir,
+            args.results_path,
+            args.n_samples,
+            args.seed,
+            args.cycles_device,
+            args.threads,
+            args.parameters,
+        )
+    else:
+        sys.exit(0 if compare(args.baseline, args.results, args.tolerance) else 1)
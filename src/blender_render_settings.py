@@ -1,5 +1,15 @@
+import re
+import time
+import shutil
+
+from pathlib import Path as pth
+
+import numpy as np
+
 import bpy
 
+import paper_parameters
+
 
 def warn_about_device_fallback(device, device_to_fallback_to):
     print(f"""Failed to enable {device}, falling back to {device_to_fallback_to}""")
@@ -10,8 +20,16 @@ renderer = bpy.ops.render
 preferences = bpy.context.preferences
 cycles_preferences = preferences.addons["cycles"].preferences
 
+# enumerating devices is slow, a long running worker only does it again
+# when the device type changes
+enabled_device_type = None
+
 
 def enable_cycles_devices(device_type):
+    global enabled_device_type
+    if device_type == enabled_device_type:
+        return True
+
     cycles_preferences.compute_device_type = device_type
 
     cycles_preferences.get_devices()
@@ -24,6 +42,9 @@ def enable_cycles_devices(device_type):
         else:
             device.use = False
 
+    if enabled_device:
+        enabled_device_type = device_type
+
     return enabled_device
 
 
@@ -41,6 +62,27 @@ def enable_cycles_gpu(device: str):
     return False
 
 
+# config names of the cycles render budget settings
+budget_properties = {
+    "adaptive_sampling": "use_adaptive_sampling",
+    "noise_threshold": "adaptive_threshold",
+    "min_samples": "adaptive_min_samples",
+    "time_limit": "time_limit",
+    "max_bounces": "max_bounces",
+}
+
+# budget settings that aren't set in a config fall back to the blend file ones
+default_budget = {
+    k: getattr(data.scenes["Scene"].cycles, v) for k, v in budget_properties.items()
+}
+
+
+def set_render_budget_cycles(cycles, **budget):
+    for name, prop in budget_properties.items():
+        value = budget.get(name)
+        setattr(cycles, prop, default_budget[name] if value is None else value)
+
+
 def set_render_engine_cycles(cycles, device, samples, denoise):
     cycles.preview_samples = samples
     cycles.samples = samples
@@ -57,6 +99,147 @@ def set_render_engine_cycles(cycles, device, samples, denoise):
     cycles.device = "CPU"
 
 
+# render phases by keywords of the status cycles reports, checked in order,
+# geometry nodes are evaluated while the scene is synchronized
+render_phases = (
+    ("image_loading", ("image",)),
+    ("bvh", ("bvh",)),
+    ("kernels", ("kernel",)),
+    ("denoising", ("denois",)),
+    ("path_tracing", ("sample", "path tracing", "rendering")),
+    ("scene_sync", ("synchroniz", "updating", "preparing", "loading", "initializ")),
+)
+
+
+# file format and color depth per output format, npy outputs are rendered as
+# uncompressed float exr and converted once the render is finished
+output_formats = {
+    "png8": ("PNG", "8"),
+    "png16": ("PNG", "16"),
+    "exr16": ("OPEN_EXR", "16"),
+    "exr32": ("OPEN_EXR", "32"),
+    "npy": ("OPEN_EXR", "32"),
+}
+
+# slots that aren't set in a config fall back to the blend file format
+default_slot_formats = {
+    k.path: (k.use_node_format, k.format.file_format, k.format.color_depth)
+    for k in data.scenes["Scene"].node_tree.nodes["File Output"].file_slots
+}
+
+npy_slots = set()
+
+# file output slots that are left out of the current render by their link
+unlinked_slots = {}
+
+coordinate_passes = ("combined", "separate", "only")
+denoisers = ("cycles", "external")
+
+# render layer outputs of the passes an external denoiser reads, by the file
+# output slot they're written to
+denoising_passes = {
+    "denoising_albedo": "Denoising Albedo",
+    "denoising_normal": "Denoising Normal",
+}
+
+# extra ground truth written by the same render, by file output slot: the
+# view layer pass it needs, the render layers output, format and color mode
+ground_truth_passes = {
+    "depth": ("use_pass_z", "Depth", "exr32", "BW"),
+    "normal": ("use_pass_normal", "Normal", "exr16", "RGB"),
+    "object_index": ("use_pass_object_index", "IndexOB", "exr16", "BW"),
+    "material_index": ("use_pass_material_index", "IndexMA", "exr16", "BW"),
+    "paper_mask": ("use_pass_object_index", "IndexOB", "png8", "BW"),
+    "crease": (None, paper_parameters.crease_attribute, "exr16", "BW"),
+}
+
+# passes the blend file enables itself stay enabled
+default_view_layer_passes = {
+    k[0]: getattr(data.scenes["Scene"].view_layers["ViewLayer"], k[0])
+    for k in ground_truth_passes.values()
+    if k[0] is not None
+}
+
+# object index pass values, the paper mask keeps the antialiased paper index
+object_pass_indices = {"paper": 1, "ground_plane": 2, "shadow_plane": 3}
+
+# the coordinates only need the first camera ray hit, one unfiltered sample
+# keeps the coordinates of neighboring surfaces from blending at the edges
+coordinate_pass_settings = {
+    "samples": 1,
+    "use_adaptive_sampling": False,
+    "use_denoising": False,
+    "time_limit": 0,
+    "max_bounces": 0,
+    "filter_width": 0.01,
+}
+
+
+def exr_to_npy(path):
+    image = data.images.load(str(path), check_existing=False)
+    try:
+        # read the stored values without any color management
+        image.colorspace_settings.name = "Non-Color"
+        width, height = image.size
+        pixels = np.empty(width * height * image.channels, np.float32)
+        image.pixels.foreach_get(pixels)
+    finally:
+        data.images.remove(image)
+
+    # blender stores the rows bottom to top
+    pixels = pixels.reshape(height, width, -1)[::-1]
+    np.save(path.with_suffix(".npy"), pixels)
+    path.unlink()
+
+
+class RenderStatsRecorder:
+    def __init__(self):
+        self.phases = {}
+        self.peak_memory_mb = None
+        self.samples = None
+        self.__phase = None
+        self.__last_time = None
+
+    def end_phase(self, now):
+        if self.__phase is not None:
+            elapsed = now - self.__last_time
+            self.phases[self.__phase] = self.phases.get(self.__phase, 0.0) + elapsed
+        self.__last_time = now
+
+    def __call__(self, stats, *args):
+        self.end_phase(time.perf_counter())
+
+        status = stats.lower()
+        self.__phase = "other"
+        for phase, keywords in render_phases:
+            if any(k in status for k in keywords):
+                self.__phase = phase
+                break
+
+        peaks = [float(k) for k in re.findall(r"Peak:? ?([0-9.]+)M", stats)]
+        if peaks:
+            self.peak_memory_mb = max(peaks + [self.peak_memory_mb or 0.0])
+
+        samples = re.search(r"Sample ([0-9]+)/([0-9]+)", stats)
+        if samples:
+            self.samples = int(samples.group(1))
+
+    def finish(self):
+        # whatever happens after the last status update is compositing and
+        # writing the file outputs
+        if self.__phase is not None:
+            self.__phase = "compositing_output"
+        self.end_phase(time.perf_counter())
+        self.__phase = None
+
+    def to_dict(self):
+        return {
+            "phases": self.phases,
+            "peak_memory_mb": self.peak_memory_mb,
+            "samples": self.samples,
+        }
+
+
 class RenderSettings:
     def __init__(self):
         self.scene = data.scenes["Scene"]
@@ -72,6 +255,38 @@ class RenderSettings:
         self.scene.render.resolution_x = resolution[0]
         self.scene.render.resolution_y = resolution[1]
 
+    @property
+    def crop_region(self):
+        # pixel box x0, y0, x1, y1 from the bottom left, None is the full frame
+        render = self.scene.render
+        if not (render.use_border and render.use_crop_to_border):
+            return None
+
+        width, height = self.render_resolution
+        return (
+            int(render.border_min_x * width),
+            int(render.border_min_y * height),
+            int(render.border_max_x * width),
+            int(render.border_max_y * height),
+        )
+
+    @crop_region.setter
+    def crop_region(self, region):
+        render = self.scene.render
+        render.use_border = region is not None
+        render.use_crop_to_border = region is not None
+        if region is None:
+            return
+
+        # a quarter pixel inside so that the border lands on the same pixels
+        # whether blender rounds or truncates it
+        width, height = self.render_resolution
+        x0, y0, x1, y1 = region
+        render.border_min_x = (x0 + 0.25) / width
+        render.border_min_y = (y0 + 0.25) / height
+        render.border_max_x = (x1 + 0.25) / width
+        render.border_max_y = (y1 + 0.25) / height
+
     def set_render_engine(
         self,
         render_engine,
@@ -91,6 +306,23 @@ class RenderSettings:
         else:
             raise ValueError(f"{render_engine} is not a valid render engine")
 
+    def set_render_budget(
+        self,
+        adaptive_sampling=None,
+        noise_threshold=None,
+        min_samples=None,
+        time_limit=None,
+        max_bounces=None,
+    ):
+        set_render_budget_cycles(
+            self.cycles,
+            adaptive_sampling=adaptive_sampling,
+            noise_threshold=noise_threshold,
+            min_samples=min_samples,
+            time_limit=time_limit,
+            max_bounces=max_bounces,
+        )
+
     @property
     def output_path(self):
         return self.file_output.base_path
@@ -108,6 +340,182 @@ class RenderSettings:
         self.file_output.file_slots["image"].format.compression = ratio
         self.file_output.file_slots["coordinates"].format.compression = ratio
 
+    @property
+    def output_slots(self):
+        return [k.path for k in self.file_output.file_slots]
+
+    def output_format(self, slot):
+        if slot in npy_slots:
+            return "npy"
+
+        slot_format = self.file_output.file_slots[slot].format
+        for name, formats in output_formats.items():
+            if formats == (slot_format.file_format, slot_format.color_depth):
+                return name
+        return None
+
+    def set_output_format(self, slot, output_format=None, compression=None):
+        file_slot = self.file_output.file_slots[slot]
+        npy_slots.discard(slot)
+
+        if output_format is None and slot not in default_slot_formats:
+            # slots that were added at runtime keep the format they were added with
+            return
+        elif output_format is None:
+            use_node_format, file_format, color_depth = default_slot_formats[slot]
+            file_slot.use_node_format = use_node_format
+        elif output_format in output_formats:
+            file_format, color_depth = output_formats[output_format]
+            file_slot.use_node_format = False
+        else:
+            raise ValueError(f"{output_format} is not a valid output format")
+
+        file_slot.format.file_format = file_format
+        file_slot.format.color_depth = color_depth
+
+        if output_format == "npy":
+            # the file is read back right away, compressing it only costs time
+            npy_slots.add(slot)
+            file_slot.format.exr_codec = "NONE"
+        elif compression is not None and file_format == "PNG":
+            file_slot.format.compression = compression
+        elif compression is not None:
+            file_slot.format.exr_codec = compression
+
+    @property
+    def written_slots(self):
+        return [
+            k.path
+            for k, socket in zip(self.file_output.file_slots, self.file_output.inputs)
+            if socket.is_linked
+        ]
+
+    @written_slots.setter
+    def written_slots(self, slots):
+        # the file output node skips unlinked inputs, None writes every slot
+        links = self.scene.node_tree.links
+        for file_slot, socket in zip(
+            self.file_output.file_slots, self.file_output.inputs
+        ):
+            write = slots is None or file_slot.path in slots
+
+            if write and file_slot.path in unlinked_slots:
+                links.new(unlinked_slots.pop(file_slot.path), socket)
+            elif not write and file_slot.path not in unlinked_slots and socket.links:
+                unlinked_slots[file_slot.path] = socket.links[0].from_socket
+                links.remove(socket.links[0])
+
+    def link_slot(self, slot, source, output_format, color_mode=None):
+        # links a render result to a file output slot that is added on demand,
+        # None unlinks it
+        links = self.scene.node_tree.links
+        if slot not in self.output_slots:
+            if source is None:
+                return
+
+            self.file_output.file_slots.new(slot)
+            file_slot = self.file_output.file_slots[slot]
+            file_slot.use_node_format = False
+            file_slot.format.file_format = output_formats[output_format][0]
+            file_slot.format.color_depth = output_formats[output_format][1]
+            if color_mode is not None:
+                file_slot.format.color_mode = color_mode
+
+        socket = self.file_output.inputs[slot]
+        if source is None:
+            for link in socket.links:
+                links.remove(link)
+        elif not socket.is_linked or socket.links[0].from_socket != source:
+            links.new(source, socket)
+
+    @property
+    def denoising_passes(self):
+        return self.scene.view_layers["ViewLayer"].cycles.denoising_store_passes
+
+    @denoising_passes.setter
+    def denoising_passes(self, enable):
+        # albedo and normal are written through extra file output slots
+        self.scene.view_layers["ViewLayer"].cycles.denoising_store_passes = enable
+
+        render_layers = self.scene.node_tree.nodes["Render Layers"]
+        for slot, output in denoising_passes.items():
+            source = render_layers.outputs[output] if enable else None
+            self.link_slot(slot, source, "exr16")
+
+    def paper_mask_node(self):
+        # the antialiased coverage of the paper index, 1 on the paper
+        nodes = self.scene.node_tree.nodes
+        mask = nodes.get("paper_mask")
+        if mask is None:
+            mask = nodes.new("CompositorNodeIDMask")
+            mask.name = "paper_mask"
+            mask.index = object_pass_indices["paper"]
+            mask.use_antialiasing = True
+            self.scene.node_tree.links.new(
+                nodes["Render Layers"].outputs["IndexOB"], mask.inputs["ID value"]
+            )
+
+        return mask
+
+    @property
+    def ground_truth_passes(self):
+        return [
+            k
+            for k in ground_truth_passes
+            if k in self.output_slots and self.file_output.inputs[k].is_linked
+        ]
+
+    @ground_truth_passes.setter
+    def ground_truth_passes(self, slots):
+        unknown_slots = set(slots) - set(ground_truth_passes)
+        if unknown_slots:
+            raise ValueError(
+                f"{', '.join(sorted(unknown_slots))} are not ground truth passes"
+            )
+
+        view_layer = self.scene.view_layers["ViewLayer"]
+        needed = {ground_truth_passes[k][0] for k in slots}
+        for name, default in default_view_layer_passes.items():
+            setattr(view_layer, name, default or name in needed)
+
+        if "use_pass_object_index" in needed:
+            for name, index in object_pass_indices.items():
+                obj = data.objects[name]
+                if obj.pass_index != index:
+                    obj.pass_index = index
+
+        # main.set_scene stores the crease attribute before the geometry is
+        # evaluated, only the aov is added here
+        if "crease" in slots:
+            if paper_parameters.crease_attribute not in view_layer.aovs:
+                aov = view_layer.aovs.add()
+                aov.name = paper_parameters.crease_attribute
+                aov.type = "VALUE"
+
+        render_layers = self.scene.node_tree.nodes["Render Layers"]
+        for slot, (_, output, output_format, color_mode) in ground_truth_passes.items():
+            if slot not in slots:
+                source = None
+            elif slot == "paper_mask":
+                source = self.paper_mask_node().outputs["Alpha"]
+            else:
+                source = render_layers.outputs[output]
+            self.link_slot(slot, source, output_format, color_mode)
+
+    def convert_outputs(self, frame=None):
+        frame = self.current_frame if frame is None else frame
+        for slot in npy_slots & set(self.written_slots):
+            file_slot = self.file_output.file_slots[slot]
+            exr_to_npy(pth(self.output_path) / f"{file_slot.path}{frame:04d}.exr")
+
+    @property
+    def persistent_data(self):
+        return self.scene.render.use_persistent_data
+
+    @persistent_data.setter
+    def persistent_data(self, enable):
+        self.scene.render.use_persistent_data = enable
+
     @property
     def current_frame(self):
         return self.scene.frame_current
@@ -116,5 +524,58 @@ class RenderSettings:
     def current_frame(self, index):
         self.scene.frame_current = index
 
-    def render(self):
-        renderer.render(scene="Scene")
+    def __render(self, stats_recorder=None, **kwargs):
+        if stats_recorder is None:
+            renderer.render(scene="Scene", **kwargs)
+            return
+
+        bpy.app.handlers.render_stats.append(stats_recorder)
+        try:
+            renderer.render(scene="Scene", **kwargs)
+        finally:
+            bpy.app.handlers.render_stats.remove(stats_recorder)
+            stats_recorder.finish()
+
+    def render(self, stats_recorder=None):
+        self.__render(stats_recorder)
+        self.convert_outputs()
+
+    def render_coordinates(self, stats_recorder=None):
+        # renders only the coordinates slot with the minimal cycles settings
+        engine = self.scene.render.engine
+        settings = {k: getattr(self.cycles, k) for k in coordinate_pass_settings}
+        written_slots = self.written_slots
+
+        self.scene.render.engine = "CYCLES"
+        for name, value in coordinate_pass_settings.items():
+            setattr(self.cycles, name, value)
+        self.written_slots = ["coordinates"]
+
+        try:
+            self.render(stats_recorder)
+        finally:
+            self.scene.render.engine = engine
+            for name, value in settings.items():
+                setattr(self.cycles, name, value)
+            self.written_slots = written_slots
+
+    def render_animation(self, frame_count, stats_recorder=None):
+        frame_range = self.scene.frame_start, self.scene.frame_end
+        filepath = self.scene.render.filepath
+
+        # an animation render also saves the composite of every frame, those
+        # go next to the file outputs and are removed afterwards
+        frames_path = pth(self.output_path) / ".frames"
+        self.scene.frame_start = 1
+        self.scene.frame_end = frame_count
+        self.scene.render.filepath = str(frames_path / "frame")
+
+        try:
+            self.__render(stats_recorder, animation=True)
+        finally:
+            self.scene.frame_start, self.scene.frame_end = frame_range
+            self.scene.render.filepath = filepath
+            shutil.rmtree(frames_path, ignore_errors=True)
+
+        for frame in range(1, frame_count + 1):
+            self.convert_outputs(frame)
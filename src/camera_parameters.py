@@ -2,6 +2,8 @@ import math
 
 import bpy
 
+import scene_changes
+
 
 data = bpy.data
 scene = data.scenes["Scene"]
@@ -27,8 +29,13 @@ class Camera:
 
     @focal_length.setter
     def focal_length(self, focal_length):
-        scene["focal_length"] = focal_length
-        data.scenes["Scene"]["focal_length"] = focal_length
+        def apply(focal_length):
+            scene["focal_length"] = focal_length
+            data.scenes["Scene"]["focal_length"] = focal_length
+
+        scene_changes.tracker.write(
+            "camera", ("scene", "focal_length"), focal_length, apply
+        )
 
     # @property
     # def fstop(self):
@@ -44,12 +51,25 @@ class Camera:
 
     @relative_camera_distance.setter
     def relative_camera_distance(self, distance):
-        scene["relative_camera_distance"] = distance
+        def apply(distance):
+            scene["relative_camera_distance"] = distance
+
+        key = ("scene", "relative_camera_distance")
+        scene_changes.tracker.write("camera", key, distance, apply)
 
     def orbit(self, attitude, azimuth):
-        self.look_at_obj.rotation_euler[0] = math.radians(attitude)
-        self.look_at_obj.rotation_euler[2] = math.radians(azimuth)
+        def apply(orbit):
+            self.look_at_obj.rotation_euler[0] = math.radians(orbit[0])
+            self.look_at_obj.rotation_euler[2] = math.radians(orbit[1])
+
+        key = (self.look_at_obj.name, "orbit")
+        scene_changes.tracker.write("camera", key, (attitude, azimuth), apply)
 
     def look_at_2d(self, x, y):
-        self.look_at_obj.location[0] = x
-        self.look_at_obj.location[1] = y
+        def apply(location):
+            self.look_at_obj.location[0] = location[0]
+            self.look_at_obj.location[1] = location[1]
+
+        scene_changes.tracker.write(
+            "camera", (self.look_at_obj.name, "location"), (x, y), apply
+        )
@@ -1,7 +1,11 @@
-from typing import Union, Tuple, Optional, Dict
+from typing import Union, Tuple, Optional, Dict, List, Iterable, Callable
 import random as rng
 from random import random, uniform, randint
 import json
+import inspect
+import typing
+from contextlib import contextmanager
+from dataclasses import dataclass, fields, is_dataclass
 
 from pathlib import Path as pth
 from typing import Any
@@ -11,7 +15,103 @@ def set_seed(seed: int):
     rng.seed(seed)
 
 
+@contextmanager
+def seeded(seed: Any):
+    # draws inside are reproducible, the global sequence continues afterwards
+    state = rng.getstate()
+    rng.seed(seed)
+    try:
+        yield
+    finally:
+        rng.setstate(state)
+
+
+class ValueSampler:
+    # the config classes draw single values, config_batch draws whole columns
+    # from the same draws with numpy
+    def random(self) -> float:
+        return random()
+
+    def uniform(self, low: float, high: float) -> float:
+        return uniform(low, high)
+
+    def randint(self, low: int, high: int) -> int:
+        return randint(low, high)
+
+    def either(self, condition: bool, draw: Callable[[], Any], otherwise: Any) -> Any:
+        # only draws when the condition holds
+        return draw() if condition else otherwise
+
+
+value_sampler = ValueSampler()
+
+
+def drawn(section: Any, name: str, value: Any) -> Any:
+    # unset parameters are drawn, explicit zeros and False are kept
+    return type(section).draws[name](value_sampler) if value is None else value
+
+
+def light_color(sample: Any) -> Tuple[float, float, float]:
+    c = [sample.uniform(0.7, 1) for _ in range(3)]
+    color_total = sum(c)
+    return tuple(k / color_total for k in c)
+
+
+def second_light_visible(sample: Any) -> bool:
+    return sample.random() > 0.7
+
+
+def first_light_power(sample: Any, power: float, second_visible: bool) -> float:
+    # both lights are visible, need to reduce light power
+    return sample.either(second_visible, lambda: power / 2, power)
+
+
+@dataclass(init=False)
 class Render:
+    __slots__ = (
+        "output_dir",
+        "resolution",
+        "compression_ratio",
+        "render_engine",
+        "cycles_device",
+        "cycles_samples",
+        "cycles_denoise",
+        "adaptive_sampling",
+        "noise_threshold",
+        "min_samples",
+        "time_limit",
+        "max_bounces",
+        "lod_pixels_per_edge",
+        "output_formats",
+        "output_compression",
+        "crop_to_paper",
+        "crop_margin",
+        "coordinate_pass",
+        "denoiser",
+        "ground_truth_passes",
+    )
+
+    output_dir: str
+    resolution: Tuple[int, int]
+    compression_ratio: int
+    render_engine: str
+    cycles_device: str
+    cycles_samples: int
+    cycles_denoise: bool
+    adaptive_sampling: Optional[bool]
+    noise_threshold: Optional[float]
+    min_samples: Optional[int]
+    time_limit: Optional[float]
+    max_bounces: Optional[int]
+    lod_pixels_per_edge: Optional[float]
+    output_formats: Dict[str, str]
+    output_compression: Dict[str, Union[int, str]]
+    crop_to_paper: bool
+    crop_margin: int
+    coordinate_pass: str
+    denoiser: str
+    ground_truth_passes: List[str]
+
     def __init__(
         self,
         project_root: Union[str, pth],
@@ -22,17 +122,106 @@ class Render:
         cycles_device: Optional[str] = None,
         cycles_samples: Optional[int] = None,
         cycles_denoise: Optional[bool] = None,
+        adaptive_sampling: Optional[bool] = None,
+        noise_threshold: Optional[float] = None,
+        min_samples: Optional[int] = None,
+        time_limit: Optional[float] = None,
+        max_bounces: Optional[int] = None,
+        lod_pixels_per_edge: Optional[float] = None,
+        output_formats: Optional[Dict[str, str]] = None,
+        output_compression: Optional[Dict[str, Union[int, str]]] = None,
+        crop_to_paper: Optional[bool] = None,
+        crop_margin: Optional[int] = None,
+        coordinate_pass: Optional[str] = None,
+        denoiser: Optional[str] = None,
+        ground_truth_passes: Optional[List[str]] = None,
     ) -> None:
-        self.output_dir = str(output_dir or (pth(project_root) / "output"))
-        self.resolution = resolution or (1024, 1024)
-        self.compression_ratio = compression_ratio or 70
+        self.output_dir = str(
+            pth(project_root) / "output" if output_dir is None else output_dir
+        )
+        self.resolution = (1024, 1024) if resolution is None else resolution
+        self.compression_ratio = 70 if compression_ratio is None else compression_ratio
         self.render_engine = render_engine or "cycles"
         self.cycles_device = cycles_device or "CUDA"
         self.cycles_samples = cycles_samples or 2
-        self.cycles_denoise = cycles_denoise or True
+        self.cycles_denoise = True if cycles_denoise is None else cycles_denoise
+
+        # render budget, None keeps the setting of the blend file
+        self.adaptive_sampling = adaptive_sampling
+        self.noise_threshold = noise_threshold
+        self.min_samples = min_samples
+        self.time_limit = time_limit
+        self.max_bounces = max_bounces
+
+        # pick the paper and ground subdivision levels from their projected
+        # size, the configured levels become the maximum, None keeps them fixed
+        self.lod_pixels_per_edge = lod_pixels_per_edge
+
+        # per output slot, e.g. {"coordinates": "exr32"} and {"image": 0}, png
+        # compression is 0-100 and exr compression a codec like "ZIP" or "DWAA",
+        # slots that aren't listed keep the format of the blend file
+        self.output_formats = output_formats or {}
+        self.output_compression = output_compression or {}
+
+        # render only the box around the projected paper plus a margin in
+        # pixels, the offset of the crop is written to the metadata
+        self.crop_to_paper = crop_to_paper or False
+        self.crop_margin = 16 if crop_margin is None else crop_margin
 
+        # "combined" writes the coordinates from the beauty render, "separate"
+        # renders them in an extra one sample pass without bounces or pixel
+        # filter, "only" skips the beauty render
+        self.coordinate_pass = coordinate_pass or "combined"
 
+        # "cycles" denoises inside of the render when cycles_denoise is set,
+        # "external" writes albedo and normal passes for src/denoise.py instead
+        self.denoiser = denoiser or "cycles"
+
+        # extra file output slots written by the same render, any of "depth",
+        # "normal", "object_index", "material_index", "paper_mask" and "crease"
+        self.ground_truth_passes = ground_truth_passes or []
+
+
+@dataclass(init=False)
 class Ground:
+    __slots__ = (
+        "visible",
+        "offset",
+        "texture_rotation",
+        "displacement_strength",
+        "subdivisions",
+        "uv_scale",
+        "texture_seed",
+        "detail_mode",
+        "texture_path_base",
+        "albedo_tex",
+        "roughness_tex",
+        "displacement_tex",
+    )
+
+    visible: bool
+    offset: float
+    texture_rotation: float
+    displacement_strength: float
+    subdivisions: int
+    uv_scale: float
+    texture_seed: int
+    detail_mode: str
+    texture_path_base: str
+    albedo_tex: str
+    roughness_tex: str
+    displacement_tex: str
+
+    # distributions of the parameters that are drawn when they aren't set
+    draws = {
+        "visible": lambda sample: sample.random() > 0.3,
+        "offset": lambda sample: sample.uniform(-10, 10),
+        "texture_rotation": lambda sample: sample.uniform(0, 360),
+        "displacement_strength": lambda sample: sample.uniform(0.04, 0.2),
+        "uv_scale": lambda sample: sample.uniform(1.2, 3),
+        "texture_seed": lambda sample: sample.randint(0, 10000),
+    }
+
     def __init__(
         self,
         project_root: Union[str, pth],
@@ -47,14 +236,19 @@ class Ground:
         displacement_tex: Optional[Union[str, pth]] = None,
         uv_scale: Optional[float] = None,
         texture_seed: Optional[int] = None,
+        detail_mode: Optional[str] = None,
     ) -> None:
-        self.visible = visible or (random() > 0.3)
-        self.offset = offset or uniform(-10, 10)
-        self.texture_rotation = texture_rotation or uniform(0, 360)
-        self.displacement_strength = displacement_strength or uniform(0.04, 0.2)
-        self.subdivisions = subdivisions or 9
-        self.uv_scale = uv_scale or uniform(1.2, 3)
-        self.texture_seed = texture_seed or randint(0, 10000)
+        self.visible = drawn(self, "visible", visible)
+        self.offset = drawn(self, "offset", offset)
+        self.texture_rotation = drawn(self, "texture_rotation", texture_rotation)
+        self.displacement_strength = drawn(
+            self, "displacement_strength", displacement_strength
+        )
+        self.subdivisions = 9 if subdivisions is None else subdivisions
+        self.uv_scale = drawn(self, "uv_scale", uv_scale)
+        self.texture_seed = drawn(self, "texture_seed", texture_seed)
+        # "mesh" displaces the subdivided ground, "bump" shades a flat one
+        self.detail_mode = detail_mode or "mesh"
 
         self.texture_path_base = str(
             texture_path_base
@@ -73,17 +267,57 @@ class Ground:
         )
 
 
+@dataclass(init=False)
 class Shadows:
+    __slots__ = ("visible", "seed")
+
+    visible: bool
+    seed: int
+
+    draws = {
+        "visible": lambda sample: sample.random() > 0.4,
+        "seed": lambda sample: sample.randint(0, 1000),
+    }
+
     def __init__(
         self,
         visible: Optional[bool] = None,
         seed: Optional[int] = None,
     ) -> None:
-        self.visible = visible or (random() > 0.4)
-        self.seed = seed or randint(0, 1000)
+        self.visible = drawn(self, "visible", visible)
+        self.seed = drawn(self, "seed", seed)
 
 
+@dataclass(init=False)
 class Paper:
+    __slots__ = (
+        "document_image_path",
+        "size",
+        "subdivisions",
+        "crumpling_strength",
+        "fold_messiness",
+        "fold_smoothness",
+        "texture_rotation",
+        "offset",
+    )
+
+    document_image_path: str
+    size: Tuple[float, float]
+    subdivisions: int
+    crumpling_strength: float
+    fold_messiness: float
+    fold_smoothness: float
+    texture_rotation: float
+    offset: float
+
+    draws = {
+        "crumpling_strength": lambda sample: sample.uniform(0, 1.5),
+        "fold_messiness": lambda sample: sample.uniform(0.03, 0.4),
+        "fold_smoothness": lambda sample: sample.uniform(0, 1),
+        "texture_rotation": lambda sample: sample.uniform(0, 360),
+        "offset": lambda sample: sample.uniform(-10, 10),
+    }
+
     def __init__(
         self,
         project_root: Union[str, pth],
@@ -99,40 +333,79 @@ class Paper:
         self.document_image_path = str(
             document_image_path or pth(project_root, "test_assets", "lorem ipsum.psd")
         )
-        self.size = size or (21.0, 29.7)
-        self.subdivisions = subdivisions or 8
-        self.crumpling_strength = crumpling_strength or uniform(0, 1.5)
-        self.fold_messiness = fold_messiness or uniform(0.03, 0.4)
-        self.fold_smoothness = fold_smoothness or uniform(0, 1)
-        self.texture_rotation = texture_rotation or uniform(0, 360)
-        self.offset = offset or uniform(-10, 10)
+        self.size = (21.0, 29.7) if size is None else size
+        self.subdivisions = 8 if subdivisions is None else subdivisions
+        self.crumpling_strength = drawn(self, "crumpling_strength", crumpling_strength)
+        self.fold_messiness = drawn(self, "fold_messiness", fold_messiness)
+        self.fold_smoothness = drawn(self, "fold_smoothness", fold_smoothness)
+        self.texture_rotation = drawn(self, "texture_rotation", texture_rotation)
+        self.offset = drawn(self, "offset", offset)
 
 
+@dataclass(init=False)
 class Fold:
+    __slots__ = ("strength", "angle")
+
+    strength: float
+    angle: float
+
+    draws = {
+        "strength": lambda sample: sample.either(
+            sample.random() > 0.3, lambda: sample.uniform(0.1, 0.8), 0.0
+        ),
+        "angle": lambda sample: sample.uniform(-15, 15),
+    }
+
     def __init__(
         self,
         strength: Optional[float] = None,
         angle: Optional[float] = None,
     ) -> None:
-        self.strength = strength or (uniform(0.1, 0.8) if random() > 0.3 else 0.0)
-        self.angle = angle or uniform(-15, 15)
+        self.strength = drawn(self, "strength", strength)
+        self.angle = drawn(self, "angle", angle)
 
 
+@dataclass(init=False)
 class Camera:
+    __slots__ = ("focal_length", "relative_camera_distance", "orbit", "look_at_2d")
+
+    focal_length: float
+    relative_camera_distance: float
+    orbit: Tuple[float, float]
+    look_at_2d: Tuple[float, float]
+
+    draws = {
+        "focal_length": lambda sample: sample.randint(24, 135),
+        "orbit": lambda sample: (sample.uniform(0, 25), sample.uniform(0, 360)),
+    }
+
     def __init__(
         self,
-        focal_length: Optional[int] = None,
+        focal_length: Optional[float] = None,
         relative_camera_distance: Optional[float] = None,
         orbit: Optional[Tuple[float, float]] = None,
-        look_at_2d: Optional[Tuple[int, int]] = None,
+        look_at_2d: Optional[Tuple[float, float]] = None,
     ) -> None:
-        self.focal_length = focal_length or randint(24, 135)
+        self.focal_length = drawn(self, "focal_length", focal_length)
         self.relative_camera_distance = relative_camera_distance or 1.3
-        self.orbit = orbit or (uniform(0, 25), uniform(0, 360))
-        self.look_at_2d = look_at_2d or (0, 0)
+        self.orbit = drawn(self, "orbit", orbit)
+        self.look_at_2d = (0, 0) if look_at_2d is None else look_at_2d
 
 
+@dataclass(init=False)
 class HDRI:
+    __slots__ = ("texture_path", "light_strength", "backdrop_strength", "seed")
+
+    texture_path: str
+    light_strength: float
+    backdrop_strength: float
+    seed: int
+
+    draws = {
+        "light_strength": lambda sample: sample.uniform(0.02, 0.3),
+        "seed": lambda sample: sample.randint(0, 10000),
+    }
+
     def __init__(
         self,
         project_root: Union[str, pth],
@@ -144,44 +417,98 @@ class HDRI:
         self.texture_path = str(
             texture_path or pth(project_root, "test_assets", "canary_wharf_2k.exr")
         )
-        self.light_strength = light_strength or uniform(0.02, 0.3)
-        self.backdrop_strength = backdrop_strength or 1.0
-        self.seed = seed or randint(0, 10000)
+        self.light_strength = drawn(self, "light_strength", light_strength)
+        self.backdrop_strength = 1.0 if backdrop_strength is None else backdrop_strength
+        self.seed = drawn(self, "seed", seed)
 
 
+@dataclass(init=False)
 class Light:
+    __slots__ = (
+        "visible",
+        "distance",
+        "orbit",
+        "look_at_2d",
+        "power",
+        "shadow_softness_radius",
+        "light_cone_angle",
+        "color",
+    )
+
+    visible: bool
+    distance: float
+    orbit: Tuple[float, float]
+    look_at_2d: Tuple[float, float]
+    power: float
+    shadow_softness_radius: float
+    light_cone_angle: float
+    color: Tuple[float, float, float]
+
+    draws = {
+        "distance": lambda sample: sample.uniform(2, 4),
+        "orbit": lambda sample: (sample.uniform(0, 45), sample.uniform(0, 360)),
+        "look_at_2d": lambda sample: (
+            sample.uniform(-0.4, 0.4),
+            sample.uniform(-0.4, 0.4),
+        ),
+        "power": lambda sample: sample.uniform(500, 900),
+        "shadow_softness_radius": lambda sample: sample.uniform(0.03, 0.8),
+        "light_cone_angle": lambda sample: sample.uniform(30, 90),
+        "color": light_color,
+    }
+
     def __init__(
         self,
         visible: Optional[bool] = None,
         color: Optional[Tuple[float, float, float]] = None,
         distance: Optional[float] = None,
         orbit: Optional[Tuple[float, float]] = None,
-        look_at_2d: Optional[Tuple[int, int]] = None,
+        look_at_2d: Optional[Tuple[float, float]] = None,
         power: Optional[float] = None,
         shadow_softness_radius: Optional[float] = None,
         light_cone_angle: Optional[float] = None,
     ) -> None:
-        self.visible = visible or True
+        self.visible = True if visible is None else visible
 
-        self.distance = distance or uniform(2, 4)
-        self.orbit = orbit or (uniform(0, 45), uniform(0, 360))
-        self.look_at_2d = look_at_2d or (
-            uniform(-0.4, 0.4),
-            uniform(-0.4, 0.4),
-        )
+        self.distance = drawn(self, "distance", distance)
+        self.orbit = drawn(self, "orbit", orbit)
+        self.look_at_2d = drawn(self, "look_at_2d", look_at_2d)
 
-        self.power = power or uniform(500, 900)
-        self.shadow_softness_radius = shadow_softness_radius or uniform(0.03, 0.8)
-        self.light_cone_angle = light_cone_angle or uniform(30, 90)
+        self.power = drawn(self, "power", power)
+        self.shadow_softness_radius = drawn(
+            self, "shadow_softness_radius", shadow_softness_radius
+        )
+        self.light_cone_angle = drawn(self, "light_cone_angle", light_cone_angle)
 
-        self.color = color
-        if not self.color:
-            c = [uniform(0.7, 1) for _ in range(3)]
-            color_total = sum(c)
-            self.color = tuple(k / color_total for k in c)
+        self.color = drawn(self, "color", color or None)
 
 
+@dataclass(init=False)
 class Config:
+    __slots__ = (
+        "project_root",
+        "render",
+        "ground",
+        "shadows",
+        "paper",
+        "folds",
+        "camera",
+        "hdri",
+        "lights",
+        "variants",
+    )
+
+    project_root: str
+    render: Render
+    ground: Ground
+    shadows: Shadows
+    paper: Paper
+    folds: Tuple[Fold, Fold]
+    camera: Camera
+    hdri: HDRI
+    lights: Tuple[Light, Light]
+    variants: List[Dict[str, Any]]
+
     def __init__(
         self,
         cycles_device: str = "CUDA",
@@ -194,6 +521,7 @@ class Config:
         camera: Optional[Camera] = None,
         hdri: Optional[HDRI] = None,
         lights: Optional[Tuple[Light, Light]] = None,
+        variants: Optional[List[Dict[str, Any]]] = None,
     ) -> None:
         self.project_root = str(pth(project_root or pth.cwd()).resolve())
 
@@ -208,57 +536,337 @@ class Config:
             self.lights = lights
         else:
             self.lights = tuple(Light() for _ in range(2))
-            self.lights[1].visible = random() > 0.7
-            if self.lights[1].visible:
-                # both lights are visible, need to reduce light power
-                self.lights[0].power /= 2
+            self.lights[1].visible = second_light_visible(value_sampler)
+            self.lights[0].power = first_light_power(
+                value_sampler, self.lights[0].power, self.lights[1].visible
+            )
+
+        # camera, light and hdri overrides rendered from the same paper geometry, e.g.
+        # {"name": "top", "camera": {"orbit": [0, 0]}, "lights": [{}, {"visible": true}]}
+        self.variants = variants or []
 
     def to_dict(self) -> dict:
-        def to_dict_recursive(obj) -> Any:
-            if not hasattr(obj, "__dict__"):
-                return obj
+        return dump_config(self)
 
-            dictionary = obj.__dict__.copy()
+    def from_dict(self: "Config", dictionary: Dict[str, Any]) -> "Config":
+        # kept for older callers, load_config doesn't draw a config first
+        return load_config(dictionary)
 
-            for key in dictionary:
-                for k in (tuple, list):
-                    if isinstance(dictionary[key], k):
-                        dictionary[key] = k(
-                            to_dict_recursive(k) for k in dictionary[key]
-                        )
-                        break
-                else:
-                    dictionary[key] = to_dict_recursive(dictionary[key])
 
-            return dictionary
+class ConfigValueError(ValueError):
+    # the keys are collected on the way out so that valid configs don't pay
+    # for building the path of every value
+    def __init__(self, message: str, keys: Optional[List[str]] = None) -> None:
+        super().__init__(message)
+        self.message = message
+        self.keys = keys or []
 
-        return to_dict_recursive(self)
+    def __str__(self) -> str:
+        return " ".join([".".join(["config", *self.keys]), self.message])
 
-    def from_dict(self: "Config", dictionary: Dict[str, Any]) -> "Config":
-        def from_dict_recursive(obj: Any, dict_: Dict[str, Any]) -> Any:
-            if not hasattr(obj, "__dict__"):
-                return dict_
 
-            obj_dict = obj.__dict__
-            for key, value in obj_dict.items():
-                if isinstance(value, (list, tuple)):
-                    obj_dict[key] = type(value)(
-                        from_dict_recursive(v, d) for v, d in zip(value, dict_[key])
-                    )
-                else:
-                    obj_dict[key] = from_dict_recursive(value, dict_[key])
+# (value, project root) -> checked value, by annotation
+Converter = Callable[[Any, str], Any]
+
+# field names and converters per config class, built on first use
+schemas: Dict[type, List[Tuple[str, Converter]]] = {}
+schema_keys: Dict[type, set] = {}
+
+
+def type_name(type_: Any) -> str:
+    return getattr(type_, "__name__", None) or str(type_).replace("typing.", "")
+
+
+def scalar_converter(type_: type) -> Converter:
+    # ints are valid floats, bools are neither ints nor floats
+    accepted = (int, float) if type_ is float else (type_,)
+
+    def convert(value, project_root):
+        if not isinstance(value, accepted) or (
+            type_ is not bool and isinstance(value, bool)
+        ):
+            raise ConfigValueError(f"has to be of type {type_.__name__}, got {value!r}")
+        return value
+
+    return convert
+
+
+def with_key(convert: Converter, value: Any, key: Any, project_root: str) -> Any:
+    try:
+        return convert(value, project_root)
+    except ConfigValueError as e:
+        e.keys.insert(0, str(key))
+        raise
+
+
+def converter(type_: Any) -> Converter:
+    origin = typing.get_origin(type_)
+    args = typing.get_args(type_)
+
+    if type_ is Any:
+        return lambda value, project_root: value
+
+    if is_dataclass(type_):
+        return lambda value, project_root: load_section(type_, value, project_root)
 
-            obj.__dict__ = obj_dict
-            return obj
+    if origin is Union:
+        nullable = type(None) in args
+        options = [converter(k) for k in args if k is not type(None)]
 
-        return from_dict_recursive(self, dictionary)
+        def convert(value, project_root):
+            if value is None and nullable:
+                return None
+
+            for option in options:
+                try:
+                    return option(value, project_root)
+                except ConfigValueError:
+                    continue
+            raise ConfigValueError(
+                f"has to be of type {type_name(type_)}, got {value!r}"
+            )
+
+        return convert
+
+    if origin in (tuple, list):
+        variable_length = origin is list or (len(args) == 2 and args[1] is Ellipsis)
+        if variable_length:
+            items = [converter(args[0] if args else Any)]
+        else:
+            items = [converter(k) for k in args]
+
+        def convert(value, project_root):
+            if not isinstance(value, (list, tuple)):
+                raise ConfigValueError(f"has to be a list, got {value!r}")
+            if not variable_length and len(value) != len(items):
+                raise ConfigValueError(
+                    f"has to have {len(items)} items, got {len(value)}"
+                )
+
+            item_converters = items * len(value) if variable_length else items
+            return origin(
+                with_key(k, v, i, project_root)
+                for i, (k, v) in enumerate(zip(item_converters, value))
+            )
+
+        return convert
+
+    if origin is dict:
+        values = converter(args[1] if args else Any)
+
+        def convert(value, project_root):
+            if not isinstance(value, dict):
+                raise ConfigValueError(f"has to be a dictionary, got {value!r}")
+            return {k: with_key(values, v, k, project_root) for k, v in value.items()}
+
+        return convert
+
+    if type_ in (bool, int, float, str):
+        return scalar_converter(type_)
+
+    raise TypeError(f"No converter for {type_name(type_)}")
+
+
+def schema(cls: type) -> List[Tuple[str, Converter]]:
+    if cls not in schemas:
+        hints = typing.get_type_hints(cls)
+        schemas[cls] = [(k.name, converter(hints[k.name])) for k in fields(cls)]
+        schema_keys[cls] = {k.name for k in fields(cls)}
+
+    return schemas[cls]
+
+
+def load_section(cls: type, dictionary: Any, project_root: str) -> Any:
+    if not isinstance(dictionary, dict):
+        raise ConfigValueError(f"has to be a dictionary, got {dictionary!r}")
+
+    section_schema = schema(cls)
+    unknown_keys = dictionary.keys() - schema_keys[cls]
+    if unknown_keys:
+        raise ConfigValueError(f"has unknown keys {', '.join(sorted(unknown_keys))}")
+
+    if len(dictionary) == len(section_schema):
+        # complete sections are filled in directly, nothing is drawn
+        section = cls.__new__(cls)
+        for name, convert in section_schema:
+            setattr(
+                section, name, with_key(convert, dictionary[name], name, project_root)
+            )
+        return section
+
+    # configs written before a parameter existed draw only the missing ones
+    values = {
+        name: with_key(convert, dictionary[name], name, project_root)
+        for name, convert in section_schema
+        if name in dictionary
+    }
+    if "project_root" in inspect.signature(cls).parameters:
+        return cls(**{"project_root": project_root, **values})
+    return cls(**values)
+
+
+# sections a variant can override, the paper and ground are shared by the views
+variant_sections = {"camera": Camera, "hdri": HDRI}
+
+
+def load_overrides(cls: type, dictionary: Any, project_root: str) -> Dict[str, Any]:
+    # the given keys of a section, checked like a full section
+    if not isinstance(dictionary, dict):
+        raise ConfigValueError(f"has to be a dictionary, got {dictionary!r}")
+
+    converters = dict(schema(cls))
+    unknown_keys = dictionary.keys() - schema_keys[cls]
+    if unknown_keys:
+        raise ConfigValueError(f"has unknown keys {', '.join(sorted(unknown_keys))}")
+
+    return {
+        k: with_key(converters[k], v, k, project_root) for k, v in dictionary.items()
+    }
+
+
+def load_variant(dictionary: Any, project_root: str, n_lights: int) -> Dict[str, Any]:
+    if not isinstance(dictionary, dict):
+        raise ConfigValueError(f"has to be a dictionary, got {dictionary!r}")
+
+    unknown_keys = dictionary.keys() - {"name", "lights", *variant_sections}
+    if unknown_keys:
+        raise ConfigValueError(
+            f"has unknown keys {', '.join(sorted(unknown_keys))}, variants can "
+            "only override the camera, hdri and lights"
+        )
+
+    name = dictionary.get("name")
+    if not isinstance(name, str) or not name:
+        raise ConfigValueError(f"has to be a non-empty string, got {name!r}", ["name"])
+
+    variant: Dict[str, Any] = {"name": name}
+    for key, cls in variant_sections.items():
+        if key in dictionary:
+            variant[key] = with_key(
+                lambda value, root, cls=cls: load_overrides(cls, value, root),
+                dictionary[key],
+                key,
+                project_root,
+            )
+
+    def load_lights(lights, root):
+        if not isinstance(lights, (list, tuple)) or len(lights) > n_lights:
+            raise ConfigValueError(
+                f"has to be a list of at most {n_lights} overrides, got {lights!r}"
+            )
+        return [
+            with_key(lambda value, root: load_overrides(Light, value, root), k, i, root)
+            for i, k in enumerate(lights)
+        ]
+
+    if "lights" in dictionary:
+        variant["lights"] = with_key(
+            load_lights, dictionary["lights"], "lights", project_root
+        )
+
+    return variant
+
+
+def load_variants(
+    variants: List[Any], project_root: str, n_lights: int
+) -> List[Dict[str, Any]]:
+    loaded = [
+        with_key(
+            lambda value, root: load_variant(value, root, n_lights),
+            variant,
+            i,
+            project_root,
+        )
+        for i, variant in enumerate(variants)
+    ]
+
+    # every variant is rendered into a directory of its name
+    names = [k["name"] for k in loaded]
+    duplicates = sorted({k for k in names if names.count(k) > 1})
+    if duplicates:
+        raise ConfigValueError(f"have duplicate names {', '.join(duplicates)}")
+
+    return loaded
+
+
+def load_config(dictionary: Dict[str, Any]) -> Config:
+    project_root = (
+        dictionary.get("project_root") if isinstance(dictionary, dict) else None
+    )
+    if project_root is None:
+        project_root = str(pth.cwd().resolve())
+
+    config = load_section(Config, dictionary, project_root)
+
+    # configs written before the denoiser existed store cycles_denoise as true
+    # but were rendered without denoising, they keep rendering that way
+    render = dictionary.get("render")
+    if isinstance(render, dict) and "denoiser" not in render:
+        config.render.cycles_denoise = False
+
+    # variants are partial overrides, there is nothing to fill in
+    config.variants = with_key(
+        lambda value, root: load_variants(value, root, len(config.lights)),
+        config.variants,
+        "variants",
+        project_root,
+    )
+
+    return config
+
+
+def dump_section(section: Any) -> Dict[str, Any]:
+    dictionary = {}
+    for name, _ in schema(type(section)):
+        value = getattr(section, name)
+        if is_dataclass(value):
+            value = dump_section(value)
+        elif isinstance(value, tuple) and value and is_dataclass(value[0]):
+            value = tuple(dump_section(k) for k in value)
+        elif isinstance(value, dict):
+            value = dict(value)
+        elif isinstance(value, list):
+            value = [dict(k) if isinstance(k, dict) else k for k in value]
+
+        dictionary[name] = value
+
+    return dictionary
+
+
+def dump_config(config: Config) -> Dict[str, Any]:
+    return dump_section(config)
+
+
+def load_configs(dictionaries: Iterable[Dict[str, Any]]) -> List[Config]:
+    return [load_config(k) for k in dictionaries]
+
+
+def dump_configs(configs: Iterable[Config]) -> List[Dict[str, Any]]:
+    return [dump_config(k) for k in configs]
+
+
+def apply_variant(config: Config, variant: Dict[str, Any]) -> Config:
+    dictionary = dump_config(config)
+    dictionary["variants"] = []
+
+    for key in ("camera", "hdri"):
+        dictionary[key].update(variant.get(key, {}))
+
+    for light, overrides in zip(dictionary["lights"], variant.get("lights", [])):
+        light.update(overrides)
+
+    return load_config(dictionary)
 
 
 def write_config(path: Union[str, pth], config: Config):
     with open(path, "w") as json_file:
-        json.dump(config.to_dict(), json_file, indent=2)
+        json.dump(dump_config(config), json_file, indent=2)
 
 
 def read_config(path: Union[str, pth]) -> Config:
     with open(path) as json_file:
-        return Config().from_dict(json.load(json_file))
+        return load_config(json.load(json_file))
+
+
+def read_configs(paths: Iterable[Union[str, pth]]) -> List[Config]:
+    return [read_config(k) for k in paths]
@@ -0,0 +1,354 @@
+from typing import Union, Optional, Dict, Any, Sequence
+import json
+import shutil
+
+from pathlib import Path as pth
+
+import numpy as np
+
+import config
+import view_check
+
+
+Columns = Dict[str, np.ndarray]
+
+name_column = "sample_name"
+# variants are sparse overrides that differ between samples, they are stored
+# as a json string per sample instead of flattened columns
+variants_column = "variants"
+# column names, sample count and constant columns of a batch directory
+batch_file = "batch.json"
+
+
+def flatten(dictionary: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    # {"lights": [{"power": 1}]} -> {"lights.0.power": 1}, value tuples are kept
+    flat = {}
+    for key, value in dictionary.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (list, tuple)) and value and isinstance(value[0], dict):
+            for i, k in enumerate(value):
+                flat.update(flatten(k, f"{name}.{i}."))
+        else:
+            flat[name] = value
+
+    return flat
+
+
+def unflatten(flat: Dict[str, Any]) -> Dict[str, Any]:
+    dictionary: Dict[str, Any] = {}
+    for name, value in flat.items():
+        node = dictionary
+        keys = name.split(".")
+        for key in keys[:-1]:
+            node = node.setdefault(key, {})
+
+        node[keys[-1]] = value
+
+    return lists_from_digit_keys(dictionary)
+
+
+def lists_from_digit_keys(node: Any) -> Any:
+    if not isinstance(node, dict):
+        return node
+
+    if node and all(k.isdigit() for k in node):
+        return [lists_from_digit_keys(node[str(i)]) for i in range(len(node))]
+
+    return {k: lists_from_digit_keys(v) for k, v in node.items()}
+
+
+def to_columns(configs: Sequence[config.Config]) -> Columns:
+    dictionaries = [k.to_dict() for k in configs]
+    variants = [k.pop(variants_column) for k in dictionaries]
+    rows = [flatten(k) for k in dictionaries]
+
+    # unset optional parameters are left out, reading fills in their default
+    columns = {
+        key: np.asarray([k[key] for k in rows])
+        for key in rows[0]
+        if any(k[key] is not None for k in rows)
+    }
+
+    if any(variants):
+        columns[variants_column] = np.asarray([json.dumps(k) for k in variants])
+
+    return columns
+
+
+def config_from_columns(columns: Columns, index: int) -> config.Config:
+    flat = {
+        k: v[index].tolist()
+        for k, v in columns.items()
+        if k not in (name_column, variants_column)
+    }
+
+    dictionary = unflatten(flat)
+    if variants_column in columns:
+        dictionary[variants_column] = json.loads(str(columns[variants_column][index]))
+
+    # parameters without a column are drawn while loading, seeded per sample so
+    # that a batch loads the same configs every time
+    seed = str(columns[name_column][index]) if name_column in columns else index
+    with config.seeded(seed):
+        return config.load_config(dictionary)
+
+
+class ColumnSampler:
+    # the sampler of config.Config section draws, draws n samples at once
+    def __init__(self, rng: np.random.Generator, n: int) -> None:
+        self.rng = rng
+        self.n = n
+
+    def random(self) -> np.ndarray:
+        return self.rng.random(self.n)
+
+    def uniform(self, low: float, high: float) -> np.ndarray:
+        return self.rng.uniform(low, high, self.n)
+
+    def randint(self, low: int, high: int) -> np.ndarray:
+        return self.rng.integers(low, high, self.n, endpoint=True)
+
+    def either(self, condition: np.ndarray, draw: Any, otherwise: Any) -> np.ndarray:
+        return np.where(condition, draw(), otherwise)
+
+
+def draw_columns(
+    rng: np.random.Generator,
+    n: int,
+    cycles_device: str = "CUDA",
+    project_root: Optional[Union[str, pth]] = None,
+    output_dir: Optional[Union[str, pth]] = None,
+) -> Columns:
+    # draws the distributions of config.Config, all samples at once
+    sample = ColumnSampler(rng, n)
+
+    # parameters that aren't drawn are the same for every sample
+    with config.seeded(0):
+        defaults = config.Config(cycles_device, project_root)
+    if output_dir is not None:
+        defaults.render.output_dir = str(output_dir)
+
+    sections = [
+        ("ground", defaults.ground),
+        ("shadows", defaults.shadows),
+        ("paper", defaults.paper),
+        *((f"folds.{i}", k) for i, k in enumerate(defaults.folds)),
+        ("camera", defaults.camera),
+        ("hdri", defaults.hdri),
+        *((f"lights.{i}", k) for i, k in enumerate(defaults.lights)),
+    ]
+
+    drawn = {}
+    for prefix, section in sections:
+        for name, draw in type(section).draws.items():
+            value = draw(sample)
+            if isinstance(value, tuple):
+                value = np.stack(value, -1)
+            drawn[f"{prefix}.{name}"] = value
+
+    drawn["lights.1.visible"] = config.second_light_visible(sample)
+    drawn["lights.0.power"] = config.first_light_power(
+        sample, drawn["lights.0.power"], drawn["lights.1.visible"]
+    )
+
+    def full(value):
+        value = np.asarray(value)
+        return np.broadcast_to(value, (n, *value.shape)).copy()
+
+    dictionary = defaults.to_dict()
+    dictionary.pop(variants_column)
+    # unset optional parameters are left out like in to_columns
+    return {
+        key: drawn[key] if key in drawn else full(value)
+        for key, value in flatten(dictionary).items()
+        if key in drawn or value is not None
+    }
+
+
+def generate_batch(
+    n_samples: int,
+    seed: int,
+    cycles_device: str = "CUDA",
+    project_root: Optional[Union[str, pth]] = None,
+    output_dir: Optional[Union[str, pth]] = None,
+    view_limits: Optional[Dict[str, float]] = None,
+    max_redraws: int = 20,
+) -> Columns:
+    rng = np.random.default_rng(seed)
+    args = cycles_device, project_root, output_dir
+
+    def with_names(columns):
+        # numbered after dropping so that the names have no gaps
+        n = len(next(iter(columns.values())))
+        names = np.asarray([f"sample_{i:08d}" for i in range(n)])
+        return {name_column: names, **columns}
+
+    columns = draw_columns(rng, n_samples, *args)
+    if view_limits is None:
+        return with_names(columns)
+
+    # samples whose paper would be out of frame, tiny or dark are drawn again
+    # before anything is rendered, the first draw is the same as without checks
+    stats = view_check.RejectionStats()
+    drawn = np.ones(n_samples, bool)
+    for redraw in range(max_redraws + 1):
+        metrics = view_check.view_metrics({k: v[drawn] for k, v in columns.items()})
+        reasons = view_check.rejections(metrics, view_limits)
+        stats.add(reasons)
+
+        rejected = np.zeros(n_samples, bool)
+        rejected[drawn] = reasons != ""
+        if not rejected.any() or redraw == max_redraws:
+            break
+
+        redrawn = draw_columns(rng, rejected.sum(), *args)
+        for key, column in redrawn.items():
+            columns[key][rejected] = column
+        drawn = rejected
+
+    if rejected.any():
+        columns = {k: v[~rejected] for k, v in columns.items()}
+        print(f"Dropped {rejected.sum()} samples that failed every redraw")
+
+    stats.report()
+    return with_names(columns)
+
+
+def write_batch(path: Union[str, pth], columns: Columns):
+    # a directory with an uncompressed npy file per column, so that readers can
+    # map it and only load the rows of their shard, columns with the same value
+    # for every sample store it once
+    for key, column in columns.items():
+        if column.dtype == object:
+            raise ValueError(f"{key} has to be set for either all samples or none")
+
+    path = pth(path)
+    temp_path = path.with_name(f".{path.name}.partial")
+    shutil.rmtree(temp_path, ignore_errors=True)
+    temp_path.mkdir(parents=True)
+
+    n_samples = len(columns[name_column])
+    constant = []
+    for key, column in columns.items():
+        if n_samples and (column == column[:1]).all():
+            constant.append(key)
+            column = np.asarray(column[0])
+        np.save(temp_path / f"{key}.npy", column)
+
+    with open(temp_path / batch_file, "w") as json_file:
+        json.dump(
+            {"n_samples": n_samples, "columns": list(columns), "constant": constant},
+            json_file,
+        )
+
+    shutil.rmtree(path, ignore_errors=True)
+    temp_path.rename(path)
+
+
+def is_batch(path: Union[str, pth]) -> bool:
+    # batches written before the npy layout are a single npz file
+    path = pth(path)
+    return (path / batch_file).is_file() or (path.is_file() and path.suffix == ".npz")
+
+
+def read_batch(path: Union[str, pth]) -> Columns:
+    path = pth(path)
+    if path.is_file():
+        with np.load(path) as npz_file:
+            return dict(npz_file)
+
+    with open(path / batch_file) as json_file:
+        batch = json.load(json_file)
+
+    columns = {}
+    for key in batch["columns"]:
+        if key in batch["constant"]:
+            value = np.load(path / f"{key}.npy")
+            columns[key] = np.broadcast_to(value, (batch["n_samples"], *value.shape))
+        else:
+            columns[key] = np.load(path / f"{key}.npy", mmap_mode="r")
+
+    return columns
+
+
+class BatchReader:
+    def __init__(self, path: Union[str, pth]) -> None:
+        self.columns = read_batch(path)
+
+    def __len__(self) -> int:
+        return len(self.columns[name_column])
+
+    def name(self, index: int) -> str:
+        return str(self.columns[name_column][index])
+
+    def config(self, index: int) -> config.Config:
+        return config_from_columns(self.columns, index)
+
+
+def export_json(path: Union[str, pth], config_dir: Union[str, pth]):
+    # writes the same per-sample json layout that config.write_config does
+    config_dir = pth(config_dir)
+    config_dir.mkdir(parents=True, exist_ok=True)
+
+    batch = BatchReader(path)
+    for i in range(len(batch)):
+        config.write_config(config_dir / f"{batch.name(i)}.json", batch.config(i))
+
+
+def import_json(config_dir: Union[str, pth], path: Union[str, pth]):
+    config_paths = sorted(pth(config_dir).glob("*.json"))
+
+    columns = to_columns([config.read_config(k) for k in config_paths])
+    columns[name_column] = np.asarray([k.stem for k in config_paths])
+
+    write_batch(path, columns)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser("generate")
+    generate_parser.add_argument("--n_samples", type=int, required=True)
+    generate_parser.add_argument("--seed", type=int, required=True)
+    generate_parser.add_argument("--cycles-device", default="CUDA")
+    generate_parser.add_argument("--output_dir")
+    generate_parser.add_argument("--batch_path", required=True)
+    # redraw samples with the paper out of frame, tiny or dark
+    generate_parser.add_argument("--check_views", action="store_true")
+    for name, limit in view_check.default_limits.items():
+        generate_parser.add_argument(f"--{name}", type=float, default=limit)
+
+    export_parser = subparsers.add_parser("export")
+    export_parser.add_argument("--batch_path", required=True)
+    export_parser.add_argument("--config_dir", required=True)
+
+    import_parser = subparsers.add_parser("import")
+    import_parser.add_argument("--config_dir", required=True)
+    import_parser.add_argument("--batch_path", required=True)
+
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        write_batch(
+            args.batch_path,
+            generate_batch(
+                args.n_samples,
+                args.seed,
+                args.cycles_device,
+                output_dir=args.output_dir,
+                view_limits=(
+                    {k: getattr(args, k) for k in view_check.default_limits}
+                    if args.check_views
+                    else None
+                ),
+            ),
+        )
+    elif args.command == "export":
+        export_json(args.batch_path, args.config_dir)
+    else:
+        import_json(args.config_dir, args.batch_path)
@@ -0,0 +1,233 @@
+from typing import Union, Optional, Tuple, Sequence, List
+import os
+
+from pathlib import Path as pth
+
+import numpy as np
+
+# opencv only reads exr files when it's enabled before the import
+os.environ.setdefault("OPENCV_IO_ENABLE_OPENEXR", "1")
+import cv2 as cv
+
+
+# remap status of every point
+VISIBLE = 0
+# no rendered pixel shows the point, it's hidden by a fold or outside the frame
+OCCLUDED = 1
+# the point is outside of the document
+OFF_PAPER = 2
+
+
+# suffixes of the output formats the file output slots can write
+output_suffixes = (".png", ".exr", ".npy")
+
+
+def to_float(img: np.ndarray, fdtype=np.float32) -> np.ndarray:
+    if np.issubdtype(img.dtype, np.floating):
+        return img.astype(fdtype)
+    return img.astype(fdtype) / np.iinfo(img.dtype).max
+
+
+def output_file(sample_path: Union[str, pth], slot: str, frame: int = 1) -> pth:
+    for suffix in output_suffixes:
+        path = pth(sample_path) / f"{slot}{frame:04d}{suffix}"
+        if path.is_file():
+            return path
+
+    raise FileNotFoundError(f"No {slot} output in {sample_path}")
+
+
+def read_output(path: Union[str, pth]) -> np.ndarray:
+    # channels in opencv order for all formats, bgr(a)
+    path = pth(path)
+    if path.suffix == ".npy":
+        img = np.load(path)
+        return img[..., [2, 1, 0, *range(3, img.shape[-1])]]
+
+    # unchanged to read as uint16 or float
+    return cv.imread(str(path), cv.IMREAD_UNCHANGED)
+
+
+def write_output(path: Union[str, pth], img: np.ndarray):
+    # inverse of read_output, bgr(a) in opencv order for all formats
+    path = pth(path)
+    if path.suffix == ".npy":
+        np.save(path, img[..., [2, 1, 0, *range(3, img.shape[-1])]])
+        return
+
+    if not cv.imwrite(str(path), img):
+        raise ValueError(f"Failed to write {path}")
+
+
+def read_coordinates(path: Union[str, pth]) -> Tuple[np.ndarray, np.ndarray]:
+    coords = to_float(read_output(path))
+    alpha = coords[..., 0]
+    # flip y to match opencv coordinates
+    coords[..., 1] = 1 - coords[..., 1]
+    coords = np.where(alpha[..., None] < 1, -1, coords[..., 1:3])
+    coords = coords[..., ::-1]
+
+    # coords are document x, y in 0-1 (-1 where there is no paper)
+    return np.ascontiguousarray(coords), alpha
+
+
+class CoordinateIndex:
+    # inverse lookup grid over the document from a rendered coordinate map,
+    # every grid cell stores a least squares affine fit of the pixels whose
+    # document coordinates fall into it
+    def __init__(self, coords: np.ndarray, grid_size: Optional[int] = None) -> None:
+        self.image_size = coords.shape[1], coords.shape[0]
+
+        valid = np.all(coords >= 0, axis=-1)
+        ys, xs = np.nonzero(valid)
+        uv = coords[ys, xs].astype(np.float64)
+
+        # a few pixels per cell on average so that cells are rarely empty
+        self.grid_size = grid_size or max(2, int(np.sqrt(len(uv)) / 2))
+        g = self.grid_size
+
+        cell = np.clip((uv * g).astype(np.int64), 0, g - 1)
+        flat = cell[:, 1] * g + cell[:, 0]
+
+        def cell_sum(weights=None):
+            return np.bincount(flat, weights, minlength=g * g)
+
+        pixels = np.stack((xs, ys), -1).astype(np.float64) + 0.5
+
+        counts = cell_sum()
+        self.filled = (counts > 0).reshape(g, g)
+
+        n = np.maximum(counts, 1)[:, None]
+        mean_uv = np.stack([cell_sum(uv[:, k]) for k in range(2)], -1) / n
+        mean_px = np.stack([cell_sum(pixels[:, k]) for k in range(2)], -1) / n
+
+        # covariance of uv and the cross covariance of pixels and uv per cell
+        d_uv = uv - mean_uv[flat]
+        d_px = pixels - mean_px[flat]
+        cov_uv = np.stack(
+            [
+                np.stack([cell_sum(d_uv[:, i] * d_uv[:, j]) for j in range(2)], -1)
+                for i in range(2)
+            ],
+            -2,
+        )
+        cov_px_uv = np.stack(
+            [
+                np.stack([cell_sum(d_px[:, i] * d_uv[:, j]) for j in range(2)], -1)
+                for i in range(2)
+            ],
+            -2,
+        )
+
+        # cells with too few pixels or degenerate spread fall back to the mean
+        det = np.linalg.det(cov_uv)
+        solvable = (counts >= 3) & (np.abs(det) > 1e-18)
+        jacobian = np.zeros((g * g, 2, 2))
+        jacobian[solvable] = cov_px_uv[solvable] @ np.linalg.inv(cov_uv[solvable])
+
+        self.mean_uv = mean_uv.reshape(g, g, 2)
+        self.mean_px = mean_px.reshape(g, g, 2)
+        self.jacobian = jacobian.reshape(g, g, 2, 2)
+
+        # pixel position of every cell center
+        centers = (np.stack(np.meshgrid(np.arange(g), np.arange(g)), -1) + 0.5) / g
+        self.center_px = self.affine(centers, np.arange(g)[:, None], np.arange(g))
+
+    @classmethod
+    def from_file(
+        cls, path: Union[str, pth], grid_size: Optional[int] = None
+    ) -> "CoordinateIndex":
+        return cls(read_coordinates(path)[0], grid_size)
+
+    def affine(self, uv: np.ndarray, cy: np.ndarray, cx: np.ndarray) -> np.ndarray:
+        offset = uv - self.mean_uv[cy, cx]
+        return self.mean_px[cy, cx] + np.einsum(
+            "...ij,...j->...i", self.jacobian[cy, cx], offset
+        )
+
+    def remap_uv(self, uv: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # document coordinates in 0-1 to sub-pixel image x, y
+        uv = np.asarray(uv, np.float64).reshape(-1, 2)
+        g = self.grid_size
+
+        status = np.full(len(uv), VISIBLE, np.uint8)
+        off_paper = np.any((uv < 0) | (uv > 1), axis=-1)
+        status[off_paper] = OFF_PAPER
+
+        cell = np.clip((uv * g).astype(np.int64), 0, g - 1)
+        cx, cy = cell[:, 0], cell[:, 1]
+        status[~off_paper & ~self.filled[cy, cx]] = OCCLUDED
+
+        # bilinear interpolation between the four surrounding cell centers,
+        # within half a cell of the border there are no centers on the outside
+        grid_uv = uv * g - 0.5
+        border = np.any((grid_uv < 0) | (grid_uv > g - 1), axis=-1)
+        grid_uv = np.clip(grid_uv, 0, g - 1)
+        x0 = np.minimum(grid_uv[:, 0].astype(np.int64), g - 2)
+        y0 = np.minimum(grid_uv[:, 1].astype(np.int64), g - 2)
+        fx = (grid_uv[:, 0] - x0)[:, None]
+        fy = (grid_uv[:, 1] - y0)[:, None]
+
+        neighbors_filled = (
+            self.filled[y0, x0]
+            & self.filled[y0, x0 + 1]
+            & self.filled[y0 + 1, x0]
+            & self.filled[y0 + 1, x0 + 1]
+        )
+
+        pixels = (
+            self.center_px[y0, x0] * (1 - fx) * (1 - fy)
+            + self.center_px[y0, x0 + 1] * fx * (1 - fy)
+            + self.center_px[y0 + 1, x0] * (1 - fx) * fy
+            + self.center_px[y0 + 1, x0 + 1] * fx * fy
+        )
+
+        # near holes and the border only the fit of the cell containing the
+        # point is reliable, it extrapolates to the paper edge
+        interpolated = neighbors_filled & ~border
+        pixels = np.where(interpolated[:, None], pixels, self.affine(uv, cy, cx))
+
+        # points whose fit lands outside of the image aren't visible either
+        outside = np.any((pixels < 0) | (pixels > self.image_size), axis=-1)
+        status[(status == VISIBLE) & outside] = OCCLUDED
+
+        pixels[status != VISIBLE] = np.nan
+        return pixels, status
+
+    def remap_points(
+        self, points: np.ndarray, document_size: Tuple[int, int]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # document pixel x, y to image pixel x, y
+        points = np.asarray(points, np.float64)
+        pixels, status = self.remap_uv(points.reshape(-1, 2) / document_size)
+        return pixels.reshape(points.shape), status.reshape(points.shape[:-1])
+
+    def remap_boxes(
+        self, boxes: np.ndarray, document_size: Tuple[int, int]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # x0, y0, x1, y1 boxes to their four remapped corners
+        boxes = np.asarray(boxes, np.float64).reshape(-1, 4)
+        x0, y0, x1, y1 = boxes.T
+        corners = np.stack(
+            (
+                np.stack((x0, y0), -1),
+                np.stack((x1, y0), -1),
+                np.stack((x1, y1), -1),
+                np.stack((x0, y1), -1),
+            ),
+            1,
+        )
+        return self.remap_points(corners, document_size)
+
+    def remap_polygons(
+        self, polygons: Sequence[np.ndarray], document_size: Tuple[int, int]
+    ) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        # remaps all polygons in one call and splits the result again
+        polygons = [np.asarray(k, np.float64).reshape(-1, 2) for k in polygons]
+        if not polygons:
+            return [], []
+
+        pixels, status = self.remap_points(np.concatenate(polygons), document_size)
+
+        splits = np.cumsum([len(k) for k in polygons])[:-1]
+        return np.split(pixels, splits), np.split(status, splits)
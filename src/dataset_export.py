@@ -0,0 +1,382 @@
+from typing import Union, Optional, Dict, Any, List, Tuple
+import io
+import json
+import time
+import tarfile
+import argparse
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, Future
+
+from pathlib import Path as pth
+
+import numpy as np
+
+import manifest
+import coordinate_index
+
+
+status_names = {
+    coordinate_index.VISIBLE: "visible",
+    coordinate_index.OCCLUDED: "occluded",
+    coordinate_index.OFF_PAPER: "off_paper",
+}
+
+
+def annotations_path(document_image_path: Union[str, pth]) -> pth:
+    # annotations live next to the document, "page.png" -> "page.annotations.json"
+    return pth(document_image_path).with_suffix(".annotations.json")
+
+
+def read_annotations(path: Union[str, pth]) -> Dict[str, Any]:
+    # {"image_size": [w, h], "annotations": [{"type": "box", "bbox": [x0, y0,
+    # x1, y1], ...}, {"type": "polygon" or "text_line", "points": [[x, y]]}]}
+    with open(path) as json_file:
+        return json.load(json_file)
+
+
+def annotation_points(annotation: Dict[str, Any]) -> np.ndarray:
+    if annotation["type"] == "box":
+        x0, y0, x1, y1 = annotation["bbox"]
+        return np.array(((x0, y0), (x1, y0), (x1, y1), (x0, y1)), np.float64)
+
+    return np.asarray(annotation["points"], np.float64).reshape(-1, 2)
+
+
+def record_version(record: Dict[str, Any]) -> str:
+    # a sample rendered again, e.g. with --resume after its config changed, gets
+    # a new version and is exported again
+    return f"{record.get('config_hash')}@{record.get('finished_at')}"
+
+
+def sample_views(output_dir: pth, name: str) -> List[Tuple[str, pth]]:
+    # samples rendered with variants have a subdirectory per variant
+    sample_path = output_dir / name
+    if any(sample_path.glob("coordinates0001.*")):
+        return [(name, sample_path)]
+
+    return [
+        (f"{name}_{k.name}", k)
+        for k in sorted(sample_path.iterdir())
+        if k.is_dir() and any(k.glob("coordinates0001.*"))
+    ]
+
+
+def remap_sample(
+    sample_path: Union[str, pth],
+    annotations: Dict[str, Any],
+    name: Optional[str] = None,
+    image: Optional[str] = None,
+) -> Dict[str, Any]:
+    sample_path = pth(sample_path)
+    index = coordinate_index.CoordinateIndex.from_file(
+        coordinate_index.output_file(sample_path, "coordinates")
+    )
+
+    source = annotations["annotations"]
+    polygons, statuses = index.remap_polygons(
+        [annotation_points(k) for k in source], tuple(annotations["image_size"])
+    )
+
+    remapped = []
+    for annotation, points, status in zip(source, polygons, statuses):
+        visible = status == coordinate_index.VISIBLE
+
+        record = {k: v for k, v in annotation.items() if k not in ("bbox", "points")}
+        record["points"] = [
+            [float(x), float(y)] if k else None for (x, y), k in zip(points, visible)
+        ]
+        record["status"] = [status_names[int(k)] for k in status]
+        record["visible_fraction"] = float(visible.mean()) if len(visible) else 0.0
+        record["bbox"] = (
+            [*np.min(points[visible], 0).tolist(), *np.max(points[visible], 0).tolist()]
+            if visible.any()
+            else None
+        )
+        remapped.append(record)
+
+    if image is None:
+        image_path = coordinate_index.output_file(sample_path, "image")
+        image = f"{sample_path.name}/{image_path.name}"
+
+    width, height = index.image_size
+    return {
+        "sample": name or sample_path.name,
+        "image": image,
+        "width": width,
+        "height": height,
+        "annotations": remapped,
+    }
+
+
+class ShardWriter(ABC):
+    # shards are written under a temporary name and renamed when complete,
+    # so a consumer can start reading finished shards while rendering goes on
+    suffix = ""
+
+    def __init__(
+        self, export_dir: Union[str, pth], samples_per_shard: int = 1000
+    ) -> None:
+        self.export_dir = pth(export_dir)
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        self.samples_per_shard = samples_per_shard
+        self.index_path = self.export_dir / "index.jsonl"
+
+        # record version every sample was exported from, None for indexes
+        # written before versions were stored
+        self.exported: Dict[str, Optional[str]] = {}
+        self.shard_index = 0
+        if self.index_path.is_file():
+            with open(self.index_path) as index_file:
+                for line in index_file:
+                    shard = json.loads(line)
+                    versions = shard.get("versions", {})
+                    self.exported.update({k: versions.get(k) for k in shard["samples"]})
+                    self.shard_index += 1
+
+        self.samples: List[str] = []
+        self.versions: Dict[str, Optional[str]] = {}
+        self.shard_path: Optional[pth] = None
+
+    @abstractmethod
+    def open(self, path: pth):
+        pass
+
+    @abstractmethod
+    def write_sample(self, record: Dict[str, Any], sample_path: pth):
+        pass
+
+    @abstractmethod
+    def close_file(self):
+        pass
+
+    def is_exported(self, name: str, version: Optional[str] = None) -> bool:
+        return name in self.exported and self.exported[name] in (None, version)
+
+    def write(
+        self,
+        record: Dict[str, Any],
+        sample_path: Union[str, pth],
+        version: Optional[str] = None,
+    ):
+        if self.shard_path is None:
+            self.shard_path = self.export_dir / f"shard-{self.shard_index:06d}"
+            self.open(self.shard_path.with_name(f"{self.shard_path.name}.partial"))
+
+        self.write_sample(record, pth(sample_path))
+        self.samples.append(record["sample"])
+        self.versions[record["sample"]] = version
+
+        if len(self.samples) >= self.samples_per_shard:
+            self.flush()
+
+    def flush(self):
+        if self.shard_path is None:
+            return
+
+        self.close_file()
+        partial_path = self.shard_path.with_name(f"{self.shard_path.name}.partial")
+        final_path = self.shard_path.with_name(f"{self.shard_path.name}{self.suffix}")
+        partial_path.rename(final_path)
+
+        # a sample that was exported again is in a later shard as well, the
+        # last shard of the index has its current version
+        with open(self.index_path, "a") as index_file:
+            shard = {
+                "shard": final_path.name,
+                "samples": self.samples,
+                "versions": self.versions,
+            }
+            index_file.write(json.dumps(shard) + "\n")
+
+        print(f"Wrote {final_path.name} with {len(self.samples)} samples")
+
+        self.exported.update(self.versions)
+        self.samples = []
+        self.versions = {}
+        self.shard_path = None
+        self.shard_index += 1
+
+
+class JsonlShardWriter(ShardWriter):
+    # one coco style record per line, images stay in the render directory and
+    # are referenced relative to it
+    suffix = ".jsonl"
+
+    def open(self, path: pth):
+        self.file = open(path, "w")
+
+    def write_sample(self, record: Dict[str, Any], sample_path: pth):
+        self.file.write(json.dumps(record) + "\n")
+
+    def close_file(self):
+        self.file.close()
+
+
+class TarShardWriter(ShardWriter):
+    # webdataset layout, every file of a sample shares the sample name as key
+    suffix = ".tar"
+
+    def open(self, path: pth):
+        self.file = tarfile.open(path, "w")
+
+    def add_bytes(self, name: str, data: bytes):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self.file.addfile(info, io.BytesIO(data))
+
+    def write_sample(self, record: Dict[str, Any], sample_path: pth):
+        name = record["sample"]
+        for slot in ("image", "coordinates"):
+            path = coordinate_index.output_file(sample_path, slot)
+            self.add_bytes(f"{name}.{slot}{path.suffix}", path.read_bytes())
+        self.add_bytes(f"{name}.json", json.dumps(record).encode())
+
+    def close_file(self):
+        self.file.close()
+
+
+writers = {"jsonl": JsonlShardWriter, "webdataset": TarShardWriter}
+
+
+def export(
+    output_dir: Union[str, pth],
+    export_dir: Union[str, pth],
+    format: str = "webdataset",
+    samples_per_shard: int = 1000,
+    n_workers: Optional[int] = None,
+    annotations: Optional[Union[str, pth]] = None,
+    follow: bool = False,
+    idle_timeout: float = 600.0,
+    poll_interval: float = 5.0,
+):
+    output_dir = pth(output_dir)
+    records_path = manifest.manifest_dir(output_dir)
+    writer = writers[format](export_dir, samples_per_shard)
+
+    annotation_cache: Dict[str, Dict[str, Any]] = {}
+
+    def sample_annotations(record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        path = annotations or (
+            record.get("document_image_path")
+            and annotations_path(record["document_image_path"])
+        )
+        if not path or not pth(path).is_file():
+            return None
+
+        path = str(path)
+        if path not in annotation_cache:
+            annotation_cache[path] = read_annotations(path)
+        return annotation_cache[path]
+
+    # record file modification and version of the samples that were submitted
+    modified: Dict[str, int] = {}
+    submitted: Dict[str, str] = {}
+    pending: Dict[str, Tuple[Future, pth, str]] = {}
+    last_new_sample = time.monotonic()
+    n_exported = 0
+    failed: List[str] = []
+
+    with ProcessPoolExecutor(n_workers) as executor:
+        scanned = False
+        while True:
+            # samples only get a record once they were rendered completely
+            record_paths = [] if scanned and not follow else records_path.glob("*.json")
+            scanned = True
+
+            for record_path in sorted(record_paths):
+                name = record_path.stem
+                try:
+                    record_modified = record_path.stat().st_mtime_ns
+                except FileNotFoundError:
+                    continue
+                if modified.get(name) == record_modified:
+                    continue
+
+                # noisy samples are picked up again once they are denoised
+                record = manifest.read_record(output_dir, name)
+                if record is None or record.get("denoise_pending"):
+                    continue
+
+                modified[name] = record_modified
+                version = record_version(record)
+                if submitted.get(name) == version:
+                    continue
+
+                submitted[name] = version
+                last_new_sample = time.monotonic()
+
+                sample_annotation = sample_annotations(record)
+                if sample_annotation is None:
+                    print(f"No annotations for {name}, skipping")
+                    continue
+
+                for view_name, view_path in sample_views(output_dir, name):
+                    if writer.is_exported(view_name, version):
+                        continue
+
+                    # e.g. a coordinate only render of a view without an image
+                    try:
+                        image = coordinate_index.output_file(view_path, "image")
+                    except FileNotFoundError as e:
+                        print(f"{e}, skipping {view_name}")
+                        failed.append(view_name)
+                        continue
+
+                    image = image.relative_to(output_dir)
+                    future = executor.submit(
+                        remap_sample,
+                        view_path,
+                        sample_annotation,
+                        view_name,
+                        image.as_posix(),
+                    )
+                    pending[view_name] = future, view_path, version
+
+            for name, (future, view_path, version) in list(pending.items()):
+                if not future.done():
+                    continue
+
+                del pending[name]
+                try:
+                    writer.write(future.result(), view_path, version)
+                    n_exported += 1
+                except Exception as e:
+                    print(f"Failed to export {name}: {type(e).__name__}: {e}")
+                    failed.append(name)
+
+            idle = time.monotonic() - last_new_sample > idle_timeout
+            if not pending and (not follow or idle):
+                break
+
+            time.sleep(poll_interval if follow else 0.1)
+
+    writer.flush()
+
+    print(f"Exported {n_exported} views, {len(failed)} failed")
+    if failed:
+        print(f"Failed views: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--export_dir", required=True)
+    parser.add_argument("--format", choices=list(writers), default="webdataset")
+    parser.add_argument("--samples_per_shard", type=int, default=1000)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--annotations")
+    parser.add_argument("--follow", action="store_true")
+    parser.add_argument("--idle_timeout", type=float, default=600.0)
+    args = parser.parse_args()
+
+    export(
+        args.output_dir,
+        args.export_dir,
+        args.format,
+        args.samples_per_shard,
+        args.workers,
+        args.annotations,
+        args.follow,
+        args.idle_timeout,
+    )
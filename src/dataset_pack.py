@@ -0,0 +1,258 @@
+from typing import Union, Optional, Dict, Any, Tuple, Sequence
+import json
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from pathlib import Path as pth
+
+import numpy as np
+
+import config
+import config_batch
+import manifest
+import coordinate_index
+import dataset_export
+
+
+# every field is one flat file of all samples back to back
+fields = {
+    "images": (np.uint8, 3),
+    "coordinates": (None, 2),
+    "masks": (np.uint8, 1),
+}
+
+coordinate_dtypes = {"uint16": np.uint16, "float16": np.float16}
+
+
+def load_view(
+    view_path: pth, coordinates_dtype: str
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    image = coordinate_index.read_output(
+        coordinate_index.output_file(view_path, "image")
+    )
+    image = np.clip(coordinate_index.to_float(image[..., :3]), 0, 1)
+    image = np.round(image[..., ::-1] * 255).astype(np.uint8)
+
+    coords, alpha = coordinate_index.read_coordinates(
+        coordinate_index.output_file(view_path, "coordinates")
+    )
+
+    # uint16 stores 0-1 in the full range, pixels without paper are masked out
+    if coordinates_dtype == "uint16":
+        coords = np.round(np.clip(coords, 0, 1) * 65535).astype(np.uint16)
+    else:
+        coords = coords.astype(np.float16)
+
+    mask = np.round(np.clip(alpha, 0, 1) * 255).astype(np.uint8)
+
+    return image, coords, mask
+
+
+def sample_config(record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if record.get("config") is not None:
+        return record["config"]
+
+    if record.get("config_path") and pth(record["config_path"]).is_file():
+        return config.read_config(record["config_path"]).to_dict()
+
+    return None
+
+
+def pack(
+    output_dir: Union[str, pth],
+    pack_dir: Union[str, pth],
+    coordinates_dtype: str = "uint16",
+    n_workers: Optional[int] = None,
+):
+    if coordinates_dtype not in coordinate_dtypes:
+        raise ValueError(f"{coordinates_dtype} is not a valid coordinates dtype")
+
+    output_dir = pth(output_dir)
+    pack_dir = pth(pack_dir)
+
+    # only samples with a completion record were rendered completely, noisy
+    # samples that still wait for the denoiser are left out
+    names, view_paths, configs = [], [], []
+    for record_path in sorted(manifest.manifest_dir(output_dir).glob("*.json")):
+        record = manifest.read_record(output_dir, record_path.stem)
+        if record is None or record.get("denoise_pending"):
+            continue
+
+        sample = sample_config(record)
+        variants = {k["name"]: k for k in (sample or {}).get("variants", [])}
+
+        for view_name, view_path in dataset_export.sample_views(
+            output_dir, record_path.stem
+        ):
+            view_config = sample
+            if view_path.name in variants:
+                view_config = config.apply_variant(
+                    config.load_config(sample), variants[view_path.name]
+                ).to_dict()
+
+            names.append(view_name)
+            view_paths.append(view_path)
+            configs.append(view_config)
+
+    # written next to the pack and moved in place once complete
+    temp_dir = pack_dir.with_name(f".{pack_dir.name}.partial")
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    temp_dir.mkdir(parents=True)
+
+    files = {k: open(temp_dir / f"{k}.bin", "wb") for k in fields}
+    offsets = np.zeros(len(names), np.int64)
+    sizes = np.zeros((len(names), 2), np.int64)
+
+    offset = 0
+    with ProcessPoolExecutor(n_workers) as executor:
+        views = executor.map(
+            load_view,
+            view_paths,
+            [coordinates_dtype] * len(view_paths),
+            chunksize=16,
+        )
+
+        for i, arrays in enumerate(views):
+            for file, array in zip(files.values(), arrays):
+                file.write(np.ascontiguousarray(array).tobytes())
+
+            offsets[i] = offset
+            sizes[i] = arrays[0].shape[:2]
+            offset += sizes[i].prod()
+
+            if (i + 1) % 1000 == 0:
+                print(f"Packed {i + 1} of {len(names)} samples")
+
+    for file in files.values():
+        file.close()
+
+    with open(temp_dir / "configs.jsonl", "w") as configs_file:
+        for sample in configs:
+            configs_file.write(json.dumps(sample) + "\n")
+
+    np.savez(
+        temp_dir / "index.npz",
+        names=np.asarray(names, str),
+        offsets=offsets,
+        sizes=sizes,
+        coordinates_dtype=np.asarray(coordinates_dtype),
+    )
+
+    shutil.rmtree(pack_dir, ignore_errors=True)
+    temp_dir.rename(pack_dir)
+
+    print(f"Packed {len(names)} samples into {pack_dir}")
+
+
+class DatasetReader:
+    # zero-copy random access into a packed render directory, every sample is
+    # an rgb uint8 image, document x, y coordinates and a uint8 paper mask
+    def __init__(self, pack_dir: Union[str, pth]) -> None:
+        pack_dir = pth(pack_dir)
+
+        with np.load(pack_dir / "index.npz") as index:
+            self.names = index["names"]
+            self.offsets = index["offsets"]
+            self.sizes = index["sizes"]
+            self.coordinates_dtype = str(index["coordinates_dtype"])
+
+        self.arrays = {}
+        for name, (dtype, channels) in fields.items():
+            dtype = dtype or coordinate_dtypes[self.coordinates_dtype]
+            path = pack_dir / f"{name}.bin"
+            self.arrays[name] = (
+                np.memmap(path, dtype, "r").reshape(-1, channels)
+                if path.stat().st_size
+                else np.zeros((0, channels), dtype)
+            )
+
+        with open(pack_dir / "configs.jsonl") as configs_file:
+            self.configs = configs_file.readlines()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def name(self, index: int) -> str:
+        return str(self.names[index])
+
+    def field(self, name: str, index: int) -> np.ndarray:
+        height, width = self.sizes[index]
+        start = self.offsets[index]
+        return self.arrays[name][start : start + height * width].reshape(
+            height, width, -1
+        )
+
+    def image(self, index: int) -> np.ndarray:
+        return self.field("images", index)
+
+    def coordinates(self, index: int) -> np.ndarray:
+        return self.field("coordinates", index)
+
+    def mask(self, index: int) -> np.ndarray:
+        return self.field("masks", index)[..., 0]
+
+    def coordinates_float(self, index: int) -> np.ndarray:
+        # document x, y in 0-1, -1 where there is no paper like read_coordinates
+        coords = coordinate_index.to_float(self.coordinates(index))
+        return np.where(self.mask(index)[..., None] < 255, -1, coords)
+
+    def batch(
+        self, indices: Union[slice, Sequence[int]], name: str = "images"
+    ) -> np.ndarray:
+        # a slice of same sized samples is a view of the file, anything else
+        # is gathered into a new array
+        if isinstance(indices, slice):
+            indices = range(*indices.indices(len(self)))
+
+        indices = np.asarray(indices, np.int64)
+        if len(indices) == 0:
+            raise ValueError("Can't batch zero samples")
+
+        sizes = self.sizes[indices]
+        if np.any(sizes != sizes[0]):
+            raise ValueError(f"Samples of a batch need the same size, got {sizes}")
+
+        height, width = sizes[0]
+        pixels = height * width
+        channels = self.arrays[name].shape[1]
+
+        contiguous = np.all(np.diff(self.offsets[indices]) == pixels)
+        if contiguous:
+            start = self.offsets[indices[0]]
+            flat = self.arrays[name][start : start + len(indices) * pixels]
+            return flat.reshape(len(indices), height, width, channels)
+
+        return np.stack([self.field(name, k) for k in indices])
+
+    def config_dict(self, index: int) -> Optional[Dict[str, Any]]:
+        return json.loads(self.configs[index])
+
+    def config(self, index: int) -> Optional[config.Config]:
+        dictionary = self.config_dict(index)
+        return None if dictionary is None else config.load_config(dictionary)
+
+    def parameters(self, index: int) -> Dict[str, Any]:
+        # flat parameter names like in the metrics, e.g. "paper.crumpling_strength"
+        return config_batch.flatten(self.config_dict(index) or {})
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        return {
+            "name": self.name(index),
+            "image": self.image(index),
+            "coordinates": self.coordinates(index),
+            "mask": self.mask(index),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--pack_dir", required=True)
+    parser.add_argument(
+        "--coordinates_dtype", choices=list(coordinate_dtypes), default="uint16"
+    )
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    pack(args.output_dir, args.pack_dir, args.coordinates_dtype, args.workers)
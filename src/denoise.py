@@ -0,0 +1,231 @@
+from typing import Union, Optional, Dict, List, Tuple, Sequence
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, Future
+
+from pathlib import Path as pth
+
+import numpy as np
+
+import manifest
+import coordinate_index
+import dataset_export
+
+
+# auxiliary passes the render writes next to the noisy image
+denoising_slots = ("denoising_albedo", "denoising_normal")
+
+# one open image denoise device per worker process
+oidn_device = None
+
+
+def srgb_to_linear(img: np.ndarray) -> np.ndarray:
+    return np.where(img <= 0.04045, img / 12.92, ((img + 0.055) / 1.055) ** 2.4)
+
+
+def linear_to_srgb(img: np.ndarray) -> np.ndarray:
+    img = np.clip(img, 0, 1)
+    return np.where(img <= 0.0031308, img * 12.92, 1.055 * img ** (1 / 2.4) - 0.055)
+
+
+def run_filter(color: np.ndarray, albedo: np.ndarray, normal: np.ndarray) -> np.ndarray:
+    # optional dependency, only the denoising workers need it
+    import oidn
+
+    global oidn_device
+    if oidn_device is None:
+        oidn_device = oidn.NewDevice()
+        oidn.CommitDevice(oidn_device)
+
+    height, width = color.shape[:2]
+    images = {
+        "color": color,
+        "albedo": albedo,
+        "normal": normal,
+        "output": np.empty_like(color),
+    }
+    # the filter reads the arrays in place, they have to stay alive until it ran
+    images = {k: np.ascontiguousarray(v, np.float32) for k, v in images.items()}
+
+    oidn_filter = oidn.NewFilter(oidn_device, "RT")
+    try:
+        for name, image in images.items():
+            oidn.SetSharedFilterImage(
+                oidn_filter, name, image, oidn.FORMAT_FLOAT3, width, height
+            )
+        oidn.CommitFilter(oidn_filter)
+        oidn.ExecuteFilter(oidn_filter)
+    finally:
+        oidn.ReleaseFilter(oidn_filter)
+
+    return images["output"]
+
+
+def denoise_view(view_path: pth, keep_passes: bool = False):
+    image_path = coordinate_index.output_file(view_path, "image")
+    try:
+        pass_paths = [
+            coordinate_index.output_file(view_path, k) for k in denoising_slots
+        ]
+    except FileNotFoundError:
+        # the passes are only deleted once the denoised image replaced the noisy
+        # one, the view was denoised by a run that stopped before the record was
+        # updated
+        return
+
+    image = coordinate_index.read_output(image_path)
+    albedo, normal = [coordinate_index.read_output(k) for k in pass_paths]
+
+    # the filter expects linear 0-1 colors, integer formats are display encoded
+    # and float formats are compressed into 0-1 and expanded again afterwards
+    color = coordinate_index.to_float(image[..., :3])
+    if np.issubdtype(image.dtype, np.floating):
+        color = np.maximum(color, 0)
+        color = color / (1 + color)
+    else:
+        color = srgb_to_linear(color)
+
+    # the outputs are read in opencv order, the filter takes rgb colors and xyz
+    # normals
+    denoised = run_filter(
+        color[..., ::-1],
+        np.clip(coordinate_index.to_float(albedo[..., 2::-1]), 0, 1),
+        coordinate_index.to_float(normal[..., 2::-1]),
+    )[..., ::-1]
+
+    if np.issubdtype(image.dtype, np.floating):
+        denoised = np.clip(denoised, 0, 1 - 1e-6)
+        denoised = (denoised / (1 - denoised)).astype(image.dtype)
+    else:
+        maximum = np.iinfo(image.dtype).max
+        denoised = np.round(linear_to_srgb(denoised) * maximum).astype(image.dtype)
+
+    image = image.copy()
+    image[..., :3] = denoised
+
+    # written next to the noisy image and moved in place once complete
+    temp_path = image_path.with_name(f".{image_path.stem}.denoised{image_path.suffix}")
+    coordinate_index.write_output(temp_path, image)
+    temp_path.replace(image_path)
+
+    if not keep_passes:
+        for path in pass_paths:
+            path.unlink()
+
+
+def denoise_views(
+    view_paths: Sequence[pth], keep_passes: bool = False
+) -> List[Optional[str]]:
+    # one batch of views per task, the denoiser device is reused in between
+    errors = []
+    for view_path in view_paths:
+        try:
+            denoise_view(view_path, keep_passes)
+            errors.append(None)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+
+    return errors
+
+
+def is_pending(record: Dict) -> bool:
+    return bool(record.get("denoise_pending"))
+
+
+def denoise(
+    output_dir: Union[str, pth],
+    n_workers: Optional[int] = None,
+    batch_size: int = 8,
+    keep_passes: bool = False,
+    follow: bool = False,
+    idle_timeout: float = 600.0,
+    poll_interval: float = 5.0,
+):
+    # denoises the samples of a render in a process pool as they finish, the
+    # blender workers don't wait for it
+    output_dir = pth(output_dir)
+    records_path = manifest.manifest_dir(output_dir)
+
+    submitted = set()
+    queued: List[Tuple[str, pth]] = []
+    views_left: Dict[str, int] = {}
+    failed: Dict[str, List[str]] = {}
+    pending: List[Tuple[Future, List[Tuple[str, pth]]]] = []
+    last_new_sample = time.monotonic()
+    n_denoised = 0
+
+    with ProcessPoolExecutor(n_workers) as executor:
+        scanned = False
+        while True:
+            # samples only get a record once they were rendered completely
+            record_paths = [] if scanned and not follow else records_path.glob("*.json")
+            scanned = True
+
+            for record_path in sorted(record_paths):
+                name = record_path.stem
+                if name in submitted:
+                    continue
+
+                record = manifest.read_record(output_dir, name)
+                if record is None or not is_pending(record):
+                    continue
+
+                submitted.add(name)
+                last_new_sample = time.monotonic()
+
+                views = dataset_export.sample_views(output_dir, name)
+                views_left[name] = len(views)
+                queued += [(name, view_path) for _, view_path in views]
+
+            # full batches while rendering goes on, the rest once it's idle
+            while len(queued) >= batch_size or (queued and not pending):
+                batch, queued = queued[:batch_size], queued[batch_size:]
+                future = executor.submit(
+                    denoise_views, [k[1] for k in batch], keep_passes
+                )
+                pending.append((future, batch))
+
+            for future, batch in [k for k in pending if k[0].done()]:
+                pending.remove((future, batch))
+
+                for (name, view_path), error in zip(batch, future.result()):
+                    if error is not None:
+                        print(f"Failed to denoise {view_path}: {error}")
+                        failed.setdefault(name, []).append(error)
+
+                    views_left[name] -= 1
+                    if views_left[name]:
+                        continue
+
+                    # failed samples keep their noisy image and stay pending
+                    if name not in failed:
+                        manifest.update_record(output_dir, name, denoise_pending=False)
+                        n_denoised += 1
+
+            idle = time.monotonic() - last_new_sample > idle_timeout
+            if not pending and not queued and (not follow or idle):
+                break
+
+            time.sleep(poll_interval if follow else 0.1)
+
+    print(f"Denoised {n_denoised} samples, {len(failed)} failed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--batch_size", type=int, default=8)
+    parser.add_argument("--keep_passes", action="store_true")
+    parser.add_argument("--follow", action="store_true")
+    parser.add_argument("--idle_timeout", type=float, default=600.0)
+    args = parser.parse_args()
+
+    denoise(
+        args.output_dir,
+        args.workers,
+        args.batch_size,
+        args.keep_passes,
+        args.follow,
+        args.idle_timeout,
+    )
@@ -0,0 +1,367 @@
+import os
+import json
+import hashlib
+
+from pathlib import Path as pth
+
+import numpy as np
+
+import bpy
+
+
+data = bpy.data
+
+# attribute value property and component count per data type
+attribute_layouts = {
+    "FLOAT": ("value", 1, np.float32),
+    "INT": ("value", 1, np.int32),
+    "INT8": ("value", 1, np.int8),
+    "BOOLEAN": ("value", 1, bool),
+    "FLOAT2": ("vector", 2, np.float32),
+    "FLOAT_VECTOR": ("vector", 3, np.float32),
+    "FLOAT_COLOR": ("color", 4, np.float32),
+    "BYTE_COLOR": ("color", 4, np.float32),
+}
+
+# modifier properties that only change the ui or the viewport
+ignored_properties = ("rna_type", "name", "is_active", "execution_time")
+
+# modifiers that keep running on top of a stored mesh, the uv warps are drawn
+# for every sample and only move the texture coordinates the shaders read, a
+# uv warp commutes with the subdivision and folds so its place in the stack
+# doesn't matter
+live_modifier_types = ("UV_WARP",)
+
+
+def plain(value):
+    # json serializable version of a blender property value
+    if isinstance(value, (bool, int, float, str)) or value is None:
+        return value
+
+    if isinstance(value, bpy.types.Image):
+        return ["image", value.filepath]
+
+    if isinstance(value, bpy.types.ID):
+        return [type(value).__name__, value.name]
+
+    try:
+        return [plain(k) for k in value]
+    except TypeError:
+        return repr(value)
+
+
+def node_tree_images(tree, seen=None):
+    seen = set() if seen is None else seen
+    if tree is None or tree.name in seen:
+        return []
+    seen.add(tree.name)
+
+    images = []
+    for node in tree.nodes:
+        if getattr(node, "image", None) is not None:
+            images.append(node.image.filepath)
+        if getattr(node, "node_tree", None) is not None:
+            images += node_tree_images(node.node_tree, seen)
+
+        for socket in node.inputs:
+            if socket.type == "IMAGE" and socket.default_value is not None:
+                images.append(socket.default_value.filepath)
+
+    return images
+
+
+def driver_inputs(id_, data_path=None, depth=0, ignored_paths=()):
+    # current values of everything the drivers of the datablock read, drivers
+    # that read driven properties are followed so derived values are covered
+    animation_data = getattr(id_, "animation_data", None)
+    if animation_data is None or depth > 4:
+        return []
+
+    inputs = []
+    for fcurve in animation_data.drivers:
+        if data_path is not None and fcurve.data_path != data_path:
+            continue
+        if ignored_paths and fcurve.data_path.startswith(ignored_paths):
+            continue
+
+        driver = fcurve.driver
+        inputs.append([fcurve.data_path, fcurve.array_index, driver.expression])
+
+        for variable in driver.variables:
+            for target in variable.targets:
+                if target.id is None:
+                    continue
+
+                if variable.type != "SINGLE_PROP":
+                    inputs.append(plain(target.id.matrix_world))
+                    continue
+
+                try:
+                    value = target.id.path_resolve(target.data_path)
+                except ValueError:
+                    value = None
+
+                inputs.append([target.id.name, target.data_path, plain(value)])
+                inputs += driver_inputs(target.id, target.data_path, depth + 1)
+
+    return inputs
+
+
+def modifier_state(modifier):
+    state = {}
+    for prop in modifier.bl_rna.properties:
+        name = prop.identifier
+        if name in ignored_properties or name.startswith(("show_", "is_")):
+            continue
+        state[name] = plain(getattr(modifier, name))
+
+    # geometry nodes inputs are id properties of the modifier
+    for name in modifier.keys():
+        state[f'["{name}"]'] = plain(modifier[name])
+
+    if modifier.type == "NODES":
+        state["images"] = node_tree_images(modifier.node_group)
+        # nodes added at runtime, e.g. the stored crease attribute
+        state["nodes"] = sorted(k.name for k in modifier.node_group.nodes)
+
+    return state
+
+
+def is_live(modifier):
+    return modifier.type in live_modifier_types
+
+
+def mesh_to_arrays(mesh):
+    def get(collection, name, count, dtype):
+        values = np.empty(len(collection) * count, dtype)
+        collection.foreach_get(name, values)
+        return values
+
+    arrays = {
+        "positions": get(mesh.vertices, "co", 3, np.float32),
+        "edges": get(mesh.edges, "vertices", 2, np.int32),
+        "loop_vertices": get(mesh.loops, "vertex_index", 1, np.int32),
+        "loop_edges": get(mesh.loops, "edge_index", 1, np.int32),
+        "loop_starts": get(mesh.polygons, "loop_start", 1, np.int32),
+        "loop_totals": get(mesh.polygons, "loop_total", 1, np.int32),
+        "smooth": get(mesh.polygons, "use_smooth", 1, bool),
+        "material_indices": get(mesh.polygons, "material_index", 1, np.int32),
+    }
+
+    uv_names = [k.name for k in mesh.uv_layers]
+    for i, uv_layer in enumerate(mesh.uv_layers):
+        arrays[f"uv_{i}"] = get(uv_layer.data, "uv", 2, np.float32)
+
+    attributes = []
+    for attribute in mesh.attributes:
+        name = attribute.name
+        if name in uv_names or name.startswith(".") or name == "position":
+            continue
+        if attribute.data_type not in attribute_layouts:
+            continue
+
+        key, count, dtype = attribute_layouts[attribute.data_type]
+        arrays[f"attribute_{len(attributes)}"] = get(attribute.data, key, count, dtype)
+        attributes.append([name, attribute.domain, attribute.data_type])
+
+    layout = {
+        "uv_layers": uv_names,
+        "attributes": attributes,
+        "materials": [k.name if k else None for k in mesh.materials],
+    }
+    arrays["layout"] = np.asarray(json.dumps(layout))
+
+    return arrays
+
+
+def mesh_from_arrays(name, arrays):
+    layout = json.loads(str(arrays["layout"]))
+
+    mesh = data.meshes.new(name)
+    mesh.vertices.add(len(arrays["positions"]) // 3)
+    mesh.edges.add(len(arrays["edges"]) // 2)
+    mesh.loops.add(len(arrays["loop_vertices"]))
+    mesh.polygons.add(len(arrays["loop_starts"]))
+
+    mesh.vertices.foreach_set("co", arrays["positions"])
+    mesh.edges.foreach_set("vertices", arrays["edges"])
+    mesh.loops.foreach_set("vertex_index", arrays["loop_vertices"])
+    mesh.loops.foreach_set("edge_index", arrays["loop_edges"])
+    mesh.polygons.foreach_set("loop_start", arrays["loop_starts"])
+    mesh.polygons.foreach_set("loop_total", arrays["loop_totals"])
+    mesh.polygons.foreach_set("use_smooth", arrays["smooth"])
+    mesh.polygons.foreach_set("material_index", arrays["material_indices"])
+
+    for i, uv_name in enumerate(layout["uv_layers"]):
+        mesh.uv_layers.new(name=uv_name).data.foreach_set("uv", arrays[f"uv_{i}"])
+
+    for i, (attribute_name, domain, data_type) in enumerate(layout["attributes"]):
+        attribute = mesh.attributes.get(attribute_name)
+        if attribute is None:
+            attribute = mesh.attributes.new(attribute_name, data_type, domain)
+
+        key = attribute_layouts[data_type][0]
+        attribute.data.foreach_set(key, arrays[f"attribute_{i}"])
+
+    for material_name in layout["materials"]:
+        mesh.materials.append(data.materials.get(material_name))
+
+    mesh.update()
+    return mesh
+
+
+class GeometryCache:
+    # evaluated meshes of modifier stacks stored by a hash of everything the
+    # stack reads, a hit replaces the modifiers with the stored mesh
+    def __init__(self, cache_dir=None, max_size_mb=2048):
+        self.cache_dir = cache_dir
+        self.max_size_mb = max_size_mb
+        self.hits = 0
+        self.misses = 0
+        self.__originals = {}
+        self.__current = {}
+
+    @property
+    def enabled(self):
+        return self.cache_dir is not None
+
+    def key(self, obj):
+        # only the stored modifiers count, e.g. the fold, crumpling, subdivision
+        # and paper size inputs of the paper, not its uv warp
+        mesh, enabled = self.__originals[obj.name]
+        modifiers = [k for k in obj.modifiers if enabled[k.name] and not is_live(k)]
+        live_paths = tuple(
+            f'modifiers["{k.name}"]' for k in obj.modifiers if is_live(k)
+        )
+
+        state = {
+            "blender": bpy.app.version_string,
+            "blend_file": [data.filepath, os.path.getmtime(data.filepath)],
+            "mesh": [mesh.name, len(mesh.vertices), len(mesh.polygons)],
+            "modifiers": [[k.name, k.type, modifier_state(k)] for k in modifiers],
+            "drivers": driver_inputs(obj, ignored_paths=live_paths),
+        }
+
+        serialized = json.dumps(state, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(serialized.encode()).hexdigest()
+
+    def path(self, key):
+        return pth(self.cache_dir) / f"{key}.npz"
+
+    def set_modifiers(self, obj, stored, live):
+        # stored are the modifiers a cached mesh already contains, live the ones
+        # that run on top of it
+        for modifier in obj.modifiers:
+            enabled = live if is_live(modifier) else stored
+            visible = enabled and self.__originals[obj.name][1][modifier.name]
+            modifier.show_render = visible
+            modifier.show_viewport = visible
+
+    def swap_mesh(self, obj, mesh, key):
+        previous = obj.data
+        obj.data = mesh
+        self.__current[obj.name] = key
+
+        # baked meshes are only kept while they are in use
+        if previous != self.__originals[obj.name][0] and previous.users == 0:
+            data.meshes.remove(previous)
+
+    def apply(self, obj):
+        if obj.name not in self.__originals:
+            enabled = {k.name: k.show_render for k in obj.modifiers}
+            self.__originals[obj.name] = obj.data, enabled
+
+        key = self.key(obj)
+        if self.__current.get(obj.name) == key:
+            self.hits += 1
+            return
+
+        path = self.path(key)
+        try:
+            with np.load(path) as npz_file:
+                arrays = dict(npz_file)
+        except (OSError, ValueError):
+            arrays = None
+
+        if arrays is not None:
+            # refresh the access time for the lru eviction
+            os.utime(path)
+            self.hits += 1
+
+            self.swap_mesh(obj, mesh_from_arrays(f"{obj.name}_cached", arrays), key)
+            self.set_modifiers(obj, stored=False, live=True)
+            return
+
+        self.misses += 1
+
+        # evaluate the original modifier stack once and keep the result, the
+        # live modifiers are applied to it later
+        self.swap_mesh(obj, self.__originals[obj.name][0], None)
+        self.set_modifiers(obj, stored=True, live=False)
+
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        mesh = data.meshes.new_from_object(
+            obj.evaluated_get(depsgraph),
+            preserve_all_data_layers=True,
+            depsgraph=depsgraph,
+        )
+        mesh.name = f"{obj.name}_cached"
+
+        self.write(path, mesh_to_arrays(mesh))
+
+        self.swap_mesh(obj, mesh, key)
+        self.set_modifiers(obj, stored=False, live=True)
+
+    def restore(self, obj):
+        # back to the original mesh and modifiers, e.g. before saving the scene
+        if obj.name not in self.__originals:
+            return
+
+        self.swap_mesh(obj, self.__originals[obj.name][0], None)
+        self.set_modifiers(obj, stored=True, live=True)
+
+    def write(self, path, arrays):
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # several workers can share the cache directory
+        temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(temp_path, "wb") as npz_file:
+            np.savez(npz_file, **arrays)
+        os.replace(temp_path, path)
+
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for path in pth(self.cache_dir).glob("*.npz"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        # least recently used entries go first
+        entries.sort()
+        total = sum(k[1] for k in entries)
+        for _, size, path in entries:
+            if total <= self.max_size_mb * 2**20:
+                break
+
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def report(self):
+        total = self.hits + self.misses
+        print(
+            f"Geometry cache: {self.hits} hits, {self.misses} misses "
+            f"({self.hits / max(total, 1):.0%} hit rate)"
+        )
+
+        self.hits = 0
+        self.misses = 0
+
+
+cache = GeometryCache()
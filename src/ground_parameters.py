@@ -2,17 +2,26 @@ import math
 
 import bpy
 
+import image_cache
+import scene_changes
+
 
 data = bpy.data
 scene = data.scenes["Scene"]
 
 
 textures = {
-    "albedo": bpy.data.images["background_albedo"],
-    "roughness": bpy.data.images["background_roughness"],
-    "depth": bpy.data.images["background_depth"],
+    "albedo": image_cache.ImageSlot("background_albedo"),
+    "roughness": image_cache.ImageSlot("background_roughness"),
+    "depth": image_cache.ImageSlot("background_depth"),
 }
 
+# the depth texture displaces the ground mesh, the others are only shaded
+texture_categories = {"albedo": "shading", "roughness": "shading", "depth": "geometry"}
+
+# mesh displaces the subdivided ground, bump shades the same relief on a flat plane
+detail_modes = ("mesh", "bump")
+
 
 class Ground:
     def __init__(self):
@@ -24,9 +33,13 @@ class Ground:
 
     @visible.setter
     def visible(self, visible):
-        hide = not visible
-        self.obj.hide_render = hide
-        self.obj.hide_viewport = hide
+        def apply(hide):
+            self.obj.hide_render = hide
+            self.obj.hide_viewport = hide
+
+        scene_changes.tracker.write(
+            "geometry", (self.obj.name, "hide"), not visible, apply
+        )
 
     @property
     def displacement_strength(self):
@@ -34,7 +47,12 @@ class Ground:
 
     @displacement_strength.setter
     def displacement_strength(self, strength):
-        scene["ground_plane_displacement"] = strength
+        def apply(strength):
+            scene["ground_plane_displacement"] = strength
+
+        scene_changes.tracker.write(
+            "geometry", ("scene", "ground_plane_displacement"), strength, apply
+        )
 
     @property
     def texture_rotation(self):
@@ -42,7 +60,12 @@ class Ground:
 
     @texture_rotation.setter
     def texture_rotation(self, angle):
-        scene["ground_plane_rotation"] = math.radians(angle)
+        def apply(angle):
+            scene["ground_plane_rotation"] = math.radians(angle)
+
+        scene_changes.tracker.write(
+            "geometry", ("scene", "ground_plane_rotation"), angle, apply
+        )
 
     @property
     def subdivisions(self):
@@ -50,8 +73,13 @@ class Ground:
 
     @subdivisions.setter
     def subdivisions(self, n_divisions):
-        self.obj.modifiers["Subdivision"].render_levels = n_divisions
-        self.obj.modifiers["Subdivision"].levels = n_divisions
+        def apply(n_divisions):
+            self.obj.modifiers["Subdivision"].render_levels = n_divisions
+            self.obj.modifiers["Subdivision"].levels = n_divisions
+
+        scene_changes.tracker.write(
+            "geometry", (self.obj.name, "subdivisions"), n_divisions, apply
+        )
 
     @property
     def offset(self):
@@ -59,8 +87,14 @@ class Ground:
 
     @offset.setter
     def offset(self, offset):
-        self.obj.modifiers["UVWarp"].offset[0] = offset
-        self.obj.modifiers["UVWarp"].offset[1] = offset * 2
+        # the uv warp is part of the modifier stack
+        def apply(offset):
+            self.obj.modifiers["UVWarp"].offset[0] = offset
+            self.obj.modifiers["UVWarp"].offset[1] = offset * 2
+
+        scene_changes.tracker.write(
+            "geometry", (self.obj.name, "uv_offset"), offset, apply
+        )
 
     @property
     def uv_scale(self):
@@ -68,7 +102,12 @@ class Ground:
 
     @uv_scale.setter
     def uv_scale(self, scale):
-        self.obj["uv_scale"] = scale
+        def apply(scale):
+            self.obj["uv_scale"] = scale
+
+        scene_changes.tracker.write(
+            "shading", (self.obj.name, "uv_scale"), scale, apply
+        )
 
     @property
     def texture_seed(self):
@@ -76,7 +115,84 @@ class Ground:
 
     @texture_seed.setter
     def texture_seed(self, seed):
-        self.obj["texture_seed"] = seed
+        def apply(seed):
+            self.obj["texture_seed"] = seed
+
+        scene_changes.tracker.write(
+            "shading", (self.obj.name, "texture_seed"), seed, apply
+        )
 
     def replace_texture(self, path, type):
-        textures[type].filepath = path
+        scene_changes.tracker.write_image(
+            texture_categories[type], textures[type], path
+        )
+
+    def bump_node(self, create=False):
+        tree = self.obj.active_material.node_tree
+        bump = tree.nodes.get("ground_bump")
+        if bump is not None or not create:
+            return bump
+
+        # the height texture shares the texture coordinates of the albedo
+        albedo = next(k for k, _ in textures["albedo"].users if k.id_data == tree)
+        bsdf = next(k for k in tree.nodes if k.type == "BSDF_PRINCIPLED")
+
+        height = tree.nodes.new("ShaderNodeTexImage")
+        height.name = "ground_bump_height"
+        height.image = textures["depth"].image
+        height.interpolation = "Cubic"
+        textures["depth"].users.append((height, "image"))
+
+        if albedo.inputs["Vector"].is_linked:
+            tree.links.new(
+                albedo.inputs["Vector"].links[0].from_socket, height.inputs["Vector"]
+            )
+
+        bump = tree.nodes.new("ShaderNodeBump")
+        bump.name = "ground_bump"
+        bump.inputs["Strength"].default_value = 0.0
+        tree.links.new(height.outputs["Color"], bump.inputs["Height"])
+
+        if bsdf.inputs["Normal"].is_linked:
+            tree.links.new(
+                bsdf.inputs["Normal"].links[0].from_socket, bump.inputs["Normal"]
+            )
+        tree.links.new(bump.outputs["Normal"], bsdf.inputs["Normal"])
+
+        return bump
+
+    @property
+    def detail_mode(self):
+        bump = self.bump_node()
+        if bump is None or bump.inputs["Strength"].default_value == 0:
+            return "mesh"
+        return "bump"
+
+    @detail_mode.setter
+    def detail_mode(self, mode):
+        if mode not in detail_modes:
+            raise ValueError(f"{mode} is not a valid ground detail mode")
+
+        # a bump with zero strength leaves the normals untouched
+        def apply(mode):
+            bump = self.bump_node(create=mode == "bump")
+            if bump is not None:
+                bump.inputs["Strength"].default_value = float(mode == "bump")
+
+        scene_changes.tracker.write(
+            "shading", (self.obj.name, "detail_mode"), mode, apply
+        )
+
+    @property
+    def bump_distance(self):
+        bump = self.bump_node()
+        return 0.0 if bump is None else bump.inputs["Distance"].default_value
+
+    @bump_distance.setter
+    def bump_distance(self, distance):
+        def apply(distance):
+            self.bump_node(create=True).inputs["Distance"].default_value = distance
+
+        scene_changes.tracker.write(
+            "shading", (self.obj.name, "bump_distance"), distance, apply
+        )
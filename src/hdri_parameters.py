@@ -1,12 +1,15 @@
 import bpy
 
+import image_cache
+import scene_changes
+
 
 data = bpy.data
 scene = data.scenes["Scene"]
 file_output = scene.node_tree.nodes["File Output"]
 hdri_light = data.worlds["World"].node_tree.nodes["Background"]
 hdri_backdrop = data.worlds["World"].node_tree.nodes["Background.001"]
-hdri_image = bpy.data.images["hdri"]
+hdri_image = image_cache.ImageSlot("hdri")
 
 
 class HDRI:
@@ -19,7 +22,7 @@ class HDRI:
 
     @image_path.setter
     def image_path(self, path):
-        hdri_image.filepath = path
+        scene_changes.tracker.write_image("lighting", hdri_image, path)
 
     @property
     def light_strength(self):
@@ -27,7 +30,12 @@ class HDRI:
 
     @light_strength.setter
     def light_strength(self, strength):
-        hdri_light.inputs[1].default_value = strength
+        def apply(strength):
+            hdri_light.inputs[1].default_value = strength
+
+        scene_changes.tracker.write(
+            "lighting", ("world", "light_strength"), strength, apply
+        )
 
     @property
     def backdrop_strength(self):
@@ -35,7 +43,12 @@ class HDRI:
 
     @backdrop_strength.setter
     def backdrop_strength(self, strength):
-        hdri_backdrop.inputs[1].default_value = strength
+        def apply(strength):
+            hdri_backdrop.inputs[1].default_value = strength
+
+        scene_changes.tracker.write(
+            "lighting", ("world", "backdrop_strength"), strength, apply
+        )
 
     @property
     def seed(self):
@@ -43,4 +56,7 @@ class HDRI:
 
     @seed.setter
     def seed(self, seed):
-        scene["hdri_seed"] = seed
+        def apply(seed):
+            scene["hdri_seed"] = seed
+
+        scene_changes.tracker.write("lighting", ("scene", "hdri_seed"), seed, apply)
@@ -0,0 +1,137 @@
+from collections import OrderedDict
+import os
+
+import bpy
+
+
+data = bpy.data
+
+
+def find_image_users(image):
+    # every (owner, attribute) pair that points at the image, shader and
+    # compositor image nodes, geometry node image sockets and textures
+    trees = [k.node_tree for k in data.materials if k.node_tree]
+    trees += [k.node_tree for k in data.worlds if k.node_tree]
+    trees += [k.node_tree for k in data.scenes if k.node_tree]
+    trees += list(data.node_groups)
+
+    users = []
+    for tree in trees:
+        for node in tree.nodes:
+            if getattr(node, "image", None) == image:
+                users.append((node, "image"))
+
+            for socket in node.inputs:
+                if socket.type == "IMAGE" and socket.default_value == image:
+                    users.append((socket, "default_value"))
+
+    for texture in data.textures:
+        if getattr(texture, "image", None) == image:
+            users.append((texture, "image"))
+
+    return users
+
+
+def file_mtime(path):
+    try:
+        return os.path.getmtime(bpy.path.abspath(path))
+    except OSError:
+        return None
+
+
+class ImageCache:
+    def __init__(self, capacity=16):
+        self.capacity = capacity
+        self.slots = []
+        self.hits = 0
+        self.misses = 0
+        self.__pool = OrderedDict()
+
+    def get(self, path, template):
+        key = (path, template.colorspace_settings.name, template.alpha_mode)
+        mtime = file_mtime(path)
+
+        if key in self.__pool:
+            image, cached_mtime = self.__pool[key]
+            if cached_mtime == mtime:
+                self.__pool.move_to_end(key)
+                self.hits += 1
+                return image
+
+            # the file changed on disk since it was loaded
+            image.reload()
+            self.__pool[key] = (image, mtime)
+            self.__pool.move_to_end(key)
+            self.misses += 1
+            return image
+
+        image = data.images.load(path, check_existing=False)
+        image.colorspace_settings.name = template.colorspace_settings.name
+        image.alpha_mode = template.alpha_mode
+
+        self.__pool[key] = (image, mtime)
+        self.misses += 1
+        self.evict(keep=image)
+
+        return image
+
+    def evict(self, keep=None):
+        in_use = {k.image for k in self.slots}
+        in_use.add(keep)
+
+        for key in list(self.__pool):
+            if len(self.__pool) <= self.capacity:
+                break
+
+            image, _ = self.__pool[key]
+            if image in in_use:
+                continue
+
+            del self.__pool[key]
+            data.images.remove(image)
+
+    def report(self):
+        total = self.hits + self.misses
+        print(
+            f"Image cache: {self.hits} hits, {self.misses} misses "
+            f"({self.hits / max(total, 1):.0%} hit rate)"
+        )
+
+        self.hits = 0
+        self.misses = 0
+
+
+cache = ImageCache()
+
+
+class ImageSlot:
+    def __init__(self, image_name, image_cache=cache):
+        self.template = data.images[image_name]
+        self.users = find_image_users(self.template)
+        self.image = self.template
+        self.__cache = image_cache
+        self.__state = None
+
+        image_cache.slots.append(self)
+
+    @property
+    def filepath(self):
+        return self.image.filepath
+
+    @filepath.setter
+    def filepath(self, path):
+        path = str(path)
+        state = (path, file_mtime(path))
+
+        # skip no-op reassignments, they would make blender reload the image
+        if state == self.__state:
+            self.__cache.hits += 1
+            return
+
+        image = self.__cache.get(path, self.template)
+        if image != self.image:
+            for owner, attribute in self.users:
+                setattr(owner, attribute, image)
+            self.image = image
+
+        self.__state = state
@@ -0,0 +1,255 @@
+from typing import (
+    Union,
+    Optional,
+    Dict,
+    Any,
+    List,
+    Sequence,
+    Iterator,
+    Tuple,
+    Callable,
+)
+import os
+import sys
+import json
+import time
+import socket
+import subprocess
+
+from pathlib import Path as pth
+
+import manifest
+import render_farm
+
+
+Job = Dict[str, Any]
+Reply = Callable[[Dict[str, Any]], None]
+
+# blender prints its own progress to stdout, results are marked with a prefix
+result_prefix = "@result "
+
+
+def parse_job(line: str) -> Job:
+    try:
+        job = json.loads(line)
+    except json.JSONDecodeError as e:
+        return {"command": "invalid", "error": f"Invalid job: {e}"}
+
+    if not isinstance(job, dict):
+        return {"command": "invalid", "error": "Invalid job: not an object"}
+
+    return job
+
+
+def stdin_jobs() -> Iterator[Tuple[Job, Reply]]:
+    def reply(result):
+        print(result_prefix + json.dumps(result), flush=True)
+
+    for line in sys.stdin:
+        if line.strip():
+            yield parse_job(line), reply
+
+
+def is_job_file(path: pth) -> bool:
+    # hidden files are jobs that are still being written
+    return path.suffix == ".json" and not path.name.startswith(".")
+
+
+def submit_directory_job(path: Union[str, pth], name: str, job: Job) -> pth:
+    # written under a temporary name and renamed, so that a worker never
+    # claims a job file that is only partly written
+    job_path = pth(path) / f"{name}.json"
+    manifest.write_json_atomic(job_path, job)
+    return pth(path) / "results" / job_path.name
+
+
+def send_reply(reply: Reply, result: Dict[str, Any]) -> bool:
+    # a client that went away or a failed result write must not end a
+    # persistent worker
+    try:
+        reply(result)
+    except Exception as e:
+        print(f"Failed to reply to job {result.get('id')}: {type(e).__name__}: {e}")
+        return False
+
+    return True
+
+
+# workers on several machines can share a queue directory, dots would be
+# taken for suffixes
+host_name = socket.gethostname().replace(".", "_")
+
+
+def claimed_name(
+    job_path: pth, host: str = host_name, pid: Optional[int] = None
+) -> str:
+    return f"{job_path.stem}.{host}.{os.getpid() if pid is None else pid}.claimed"
+
+
+def is_running(pid: int) -> bool:
+    # signal 0 only checks the process on posix, it terminates it on windows
+    if os.name == "nt" or pid == os.getpid():
+        return True
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+def reclaim_jobs(path: pth) -> List[pth]:
+    # jobs claimed by workers of this machine that crashed mid-render go back
+    # into the queue, other machines reclaim their own
+    reclaimed = []
+    for claimed_path in sorted(path.glob("*.claimed")):
+        stem, host, pid = claimed_path.name[: -len(".claimed")].rsplit(".", 2)
+        if host != host_name or not pid.isdigit() or is_running(int(pid)):
+            continue
+
+        job_path = claimed_path.with_name(f"{stem}.json")
+        try:
+            claimed_path.rename(job_path)
+        except FileNotFoundError:
+            continue
+
+        print(f"Reclaimed {job_path.name} from worker {pid}")
+        reclaimed.append(job_path)
+
+    return reclaimed
+
+
+def directory_jobs(
+    path: Union[str, pth], poll_interval: float = 0.5
+) -> Iterator[Tuple[Job, Reply]]:
+    # several workers can watch the same directory, a job is claimed by
+    # renaming it and its result is written to the results subdirectory.
+    # producers have to write the job to another name and rename it to its
+    # final name.json, e.g. with submit_directory_job
+    path = pth(path)
+    results_path = path / "results"
+    results_path.mkdir(parents=True, exist_ok=True)
+
+    reclaim_jobs(path)
+
+    while True:
+        job_paths = sorted(k for k in path.glob("*.json") if is_job_file(k))
+        if not job_paths:
+            time.sleep(poll_interval)
+            continue
+
+        for job_path in job_paths:
+            claimed_path = job_path.with_name(claimed_name(job_path))
+            try:
+                job_path.rename(claimed_path)
+            except FileNotFoundError:
+                continue
+
+            with open(claimed_path) as json_file:
+                job = parse_job(json_file.read())
+
+            def reply(result, name=job_path.stem, claimed_path=claimed_path):
+                manifest.write_json_atomic(results_path / f"{name}.json", result)
+                claimed_path.unlink()
+
+            yield job, reply
+
+
+def socket_jobs(path: Union[str, pth]) -> Iterator[Tuple[Job, Reply]]:
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("Unix sockets are not supported on this platform")
+
+    path = pth(path)
+    if path.exists():
+        path.unlink()
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(path))
+    server.listen()
+
+    try:
+        while True:
+            connection, _ = server.accept()
+            with connection, connection.makefile("rw") as stream:
+
+                def reply(result, stream=stream):
+                    stream.write(json.dumps(result) + "\n")
+                    stream.flush()
+
+                for line in stream:
+                    if line.strip():
+                        yield parse_job(line), reply
+    finally:
+        server.close()
+        if path.exists():
+            path.unlink()
+
+
+def jobs(
+    source: str, queue_path: Optional[Union[str, pth]] = None
+) -> Iterator[Tuple[Job, Reply]]:
+    if source == "stdin":
+        return stdin_jobs()
+
+    if queue_path is None:
+        raise ValueError(f"A queue path is required for {source} jobs")
+
+    if source == "directory":
+        return directory_jobs(queue_path)
+    elif source == "socket":
+        return socket_jobs(queue_path)
+
+    raise ValueError(f"{source} is not a valid job source")
+
+
+class WorkerClient:
+    # keeps one blender process with a loaded scene around and feeds it jobs
+    # over stdin, e.g. {"id": 0, "config_path": "/abs/path/sample.json"}
+    def __init__(
+        self,
+        blender_path: Union[str, pth],
+        device: str = "CUDA",
+        render_engine: str = "CYCLES",
+        threads: int = 0,
+        extra_args: Sequence[str] = (),
+    ) -> None:
+        command = render_farm.blender_command(
+            blender_path,
+            None,
+            device=device,
+            render_engine=render_engine,
+            threads=threads,
+            extra_args=["--worker", "stdin", *extra_args],
+        )
+
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+
+    def submit(self, job: Job) -> Dict[str, Any]:
+        self.process.stdin.write(json.dumps(job) + "\n")
+        self.process.stdin.flush()
+
+        for line in self.process.stdout:
+            if line.startswith(result_prefix):
+                return json.loads(line[len(result_prefix) :])
+
+        raise RuntimeError(f"Worker exited with {self.process.wait()}")
+
+    def close(self):
+        if self.process.poll() is None:
+            self.submit({"command": "stop"})
+        self.process.wait()
+
+    def __enter__(self) -> "WorkerClient":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,81 @@
+import math
+
+import numpy as np
+
+
+def crosses_frame(start, end, resolution):
+    # whether the segments touch the frame, clipped against its sides the way
+    # liang barsky does
+    delta = end - start
+    enter = np.zeros(len(start))
+    leave = np.ones(len(start))
+    for axis, size in enumerate(resolution):
+        for p, q in (
+            (-delta[:, axis], start[:, axis]),
+            (delta[:, axis], size - start[:, axis]),
+        ):
+            parallel = p == 0
+            t = q / np.where(parallel, 1, p)
+            enter = np.where(p < 0, np.maximum(enter, t), enter)
+            leave = np.where(p > 0, np.minimum(leave, t), leave)
+            # parallel to a side and outside of it
+            leave = np.where(parallel & (q < 0), -1, leave)
+
+    return enter <= leave
+
+
+def loop_polygons(loop_starts, loop_count):
+    # polygon index of every loop, the loops of a polygon are contiguous
+    return np.searchsorted(np.sort(loop_starts), np.arange(loop_count), "right") - 1
+
+
+def contains_point(pixels, polygons, point):
+    # even odd rule for every polygon
+    loop_vertices, _, loop_starts = polygons
+    loop_starts = np.sort(loop_starts)
+    loops = np.arange(len(loop_vertices))
+    polygon = loop_polygons(loop_starts, len(loops))
+
+    # the next loop wraps around to the first one of the polygon
+    following = loops + 1
+    last = np.append(polygon[1:] != polygon[:-1], True)
+    following[last] = loop_starts[polygon[last]]
+
+    x0, y0 = pixels[loop_vertices].T
+    x1, y1 = pixels[loop_vertices[following]].T
+    x, y = point
+    straddles = (y0 > y) != (y1 > y)
+    height = np.where(straddles, y1 - y0, 1)
+    crossing = straddles & (x < x0 + (y - y0) * (x1 - x0) / height)
+
+    crossings = np.bincount(polygon, crossing, minlength=len(loop_starts))
+    return crossings % 2 == 1
+
+
+def edge_pixels(pixels, in_front, edges, polygons, resolution):
+    # on screen length of the edges that cross the frame or belong to a polygon
+    # that covers all of it, e.g. a ground quad larger than the view
+    visible = in_front[edges].all(-1)
+    visible &= crosses_frame(pixels[edges[:, 0]], pixels[edges[:, 1]], resolution)
+
+    loop_vertices, loop_edges, loop_starts = polygons
+    if len(loop_starts):
+        polygon = loop_polygons(loop_starts, len(loop_vertices))
+        behind = np.bincount(polygon, ~in_front[loop_vertices], len(loop_starts))
+        covering = contains_point(pixels, polygons, np.divide(resolution, 2))
+        covering &= behind == 0
+        visible[loop_edges[covering[polygon]]] = True
+
+    return np.linalg.norm(
+        pixels[edges[visible, 0]] - pixels[edges[visible, 1]], axis=-1
+    )
+
+
+def subdivision_level(lengths, pixels_per_edge, max_level):
+    # every subdivision level halves the edges, the long edges decide
+    if not len(lengths):
+        return 0
+
+    longest = np.percentile(lengths, 90)
+    level = math.ceil(math.log2(max(longest / pixels_per_edge, 1)))
+    return min(level, max_level)
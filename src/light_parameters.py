@@ -2,6 +2,8 @@ import math
 
 import bpy
 
+import scene_changes
+
 
 data = bpy.data
 scene = data.scenes["Scene"]
@@ -19,9 +21,13 @@ class Light:
 
     @visible.setter
     def visible(self, visible):
-        hide = not visible
-        self.obj.hide_render = hide
-        self.obj.hide_viewport = hide
+        def apply(hide):
+            self.obj.hide_render = hide
+            self.obj.hide_viewport = hide
+
+        scene_changes.tracker.write(
+            "lighting", (self.obj.name, "hide"), not visible, apply
+        )
 
     @property
     def power(self):
@@ -29,7 +35,10 @@ class Light:
 
     @power.setter
     def power(self, power):
-        self.__data.energy = power
+        def apply(power):
+            self.__data.energy = power
+
+        scene_changes.tracker.write("lighting", (self.obj.name, "power"), power, apply)
 
     @property
     def color(self):
@@ -37,7 +46,12 @@ class Light:
 
     @color.setter
     def color(self, color):
-        self.__data.color = color
+        def apply(color):
+            self.__data.color = color
+
+        scene_changes.tracker.write(
+            "lighting", (self.obj.name, "color"), tuple(color), apply
+        )
 
     @property
     def distance(self):
@@ -45,15 +59,29 @@ class Light:
 
     @distance.setter
     def distance(self, distance):
-        self.obj.location[2] = distance
+        def apply(distance):
+            self.obj.location[2] = distance
+
+        scene_changes.tracker.write(
+            "lighting", (self.obj.name, "distance"), distance, apply
+        )
 
     def orbit(self, attitude, azimuth):
-        self.look_at_obj.rotation_euler[0] = math.radians(attitude)
-        self.look_at_obj.rotation_euler[2] = math.radians(azimuth)
+        def apply(orbit):
+            self.look_at_obj.rotation_euler[0] = math.radians(orbit[0])
+            self.look_at_obj.rotation_euler[2] = math.radians(orbit[1])
+
+        key = (self.look_at_obj.name, "orbit")
+        scene_changes.tracker.write("lighting", key, (attitude, azimuth), apply)
 
     def look_at_2d(self, x, y):
-        self.look_at_obj.location[0] = x
-        self.look_at_obj.location[1] = y
+        def apply(location):
+            self.look_at_obj.location[0] = location[0]
+            self.look_at_obj.location[1] = location[1]
+
+        scene_changes.tracker.write(
+            "lighting", (self.look_at_obj.name, "location"), (x, y), apply
+        )
 
     @property
     def shadow_softness_radius(self):
@@ -61,7 +89,12 @@ class Light:
 
     @shadow_softness_radius.setter
     def shadow_softness_radius(self, radius):
-        self.__data.shadow_soft_size = radius
+        def apply(radius):
+            self.__data.shadow_soft_size = radius
+
+        scene_changes.tracker.write(
+            "lighting", (self.obj.name, "shadow_soft_size"), radius, apply
+        )
 
     @property
     def light_cone_angle(self):
@@ -69,4 +102,9 @@ class Light:
 
     @light_cone_angle.setter
     def light_cone_angle(self, angle):
-        self.__data.spot_size = math.radians(angle)
+        def apply(angle):
+            self.__data.spot_size = math.radians(angle)
+
+        scene_changes.tracker.write(
+            "lighting", (self.obj.name, "spot_size"), angle, apply
+        )
@@ -1,17 +1,30 @@
-from typing import Union
+from typing import Union, Optional, Dict, Any, List, Tuple
 import sys
 import argparse
+import traceback
 
 from pathlib import Path as pth
 from pathlib import PurePath as ppth
 
 import shutil
+import time
 
 import bpy
+import numpy as np
 
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--config_path")
+parser.add_argument("--shard-index", type=int, default=0)
+parser.add_argument("--shard-count", type=int, default=1)
+parser.add_argument("--resume", action="store_true")
+parser.add_argument("--image_cache_size", type=int, default=16)
+parser.add_argument("--geometry_cache")
+parser.add_argument("--geometry_cache_size", type=int, default=2048)
+parser.add_argument("--schedule", action="store_true")
+parser.add_argument("--animation_frames", type=int, default=0)
+parser.add_argument("--worker", choices=["stdin", "directory", "socket"])
+parser.add_argument("--queue_path")
 
 
 blend_dir = pth(bpy.data.filepath).parent
@@ -24,7 +37,19 @@ if str(src_dir) not in sys.path:
     sys.path.append(str(src_dir))
 
 import config
-
+import config_batch
+import job_queue
+import manifest
+import metrics
+import render_farm
+import scheduler
+
+import animation
+import image_cache
+import geometry_cache
+import level_of_detail
+import projection
+import scene_changes
 import ground_parameters
 import blender_render_settings
 import hdri_parameters
@@ -42,7 +67,7 @@ import shadow_parameters
 # importlib.reload(paper_parameters)
 
 
-def generate_and_render(conf: config.Config, output_path: Union[str, pth]):
+def set_scene(conf: config.Config, sample_metrics: metrics.SampleMetrics):
     # ground parameters
     ground = ground_parameters.Ground()
     ground.visible = conf.ground.visible
@@ -50,8 +75,17 @@ def generate_and_render(conf: config.Config, output_path: Union[str, pth]):
     if conf.ground.visible:
         ground.offset = conf.ground.offset
         ground.texture_rotation = conf.ground.texture_rotation
-        ground.displacement_strength = conf.ground.displacement_strength
-        ground.subdivisions = conf.ground.subdivisions
+        ground.detail_mode = conf.ground.detail_mode
+
+        if conf.ground.detail_mode == "bump":
+            # the relief is shaded, a flat plane needs no subdivisions
+            ground.displacement_strength = 0.0
+            ground.bump_distance = conf.ground.displacement_strength
+            ground.subdivisions = 0
+        else:
+            ground.displacement_strength = conf.ground.displacement_strength
+            ground.subdivisions = conf.ground.subdivisions
+
         ground.uv_scale = conf.ground.uv_scale
         ground.texture_seed = conf.ground.texture_seed
 
@@ -64,6 +98,8 @@ def generate_and_render(conf: config.Config, output_path: Union[str, pth]):
     shadows.visible = conf.shadows.visible
     shadows.seed = conf.shadows.seed
 
+    sample_metrics.lap("ground")
+
     # paper parameters
     paper = paper_parameters.Paper()
     paper.text_image_path = conf.paper.document_image_path
@@ -75,10 +111,18 @@ def generate_and_render(conf: config.Config, output_path: Union[str, pth]):
     paper.texture_rotation = conf.paper.texture_rotation
     paper.offset = conf.paper.offset
 
+    # the attribute has to be part of the geometry before it is cached
+    if "crease" in conf.render.ground_truth_passes:
+        paper.store_crease()
+
     for i, (fold, fold_conf) in enumerate(zip(paper.folds, conf.folds)):
         fold.strength = fold_conf.strength
         fold.angle = fold_conf.angle + i * 90
 
+    sample_metrics.lap("paper")
+
+
+def set_view(conf: config.Config, sample_metrics: metrics.SampleMetrics):
     # camera parameters
     camera = camera_parameters.Camera()
 
@@ -105,6 +149,8 @@ def generate_and_render(conf: config.Config, output_path: Union[str, pth]):
 
         light.color = light_conf.color
 
+    sample_metrics.lap("camera_and_lights")
+
     # hdri parameters
     hdri = hdri_parameters.HDRI()
 
@@ -113,7 +159,12 @@ def generate_and_render(conf: config.Config, output_path: Union[str, pth]):
     hdri.backdrop_strength = conf.hdri.backdrop_strength
     hdri.seed = conf.hdri.seed
 
-    # render settings
+    sample_metrics.lap("hdri")
+
+
+def apply_render_settings(
+    conf: config.Config, output_path: Union[str, pth]
+) -> blender_render_settings.RenderSettings:
     render_settings = blender_render_settings.RenderSettings()
 
     # jump to the first frame
@@ -121,43 +172,658 @@ def generate_and_render(conf: config.Config, output_path: Union[str, pth]):
 
     render_settings.output_path = output_path
     render_settings.compression_ratio = conf.render.compression_ratio
+
+    render_settings.written_slots = None
+
+    if conf.render.denoiser not in blender_render_settings.denoisers:
+        raise ValueError(f"{conf.render.denoiser} is not a valid denoiser")
+
+    # a separate process denoises with the albedo and normal passes
+    external_denoiser = conf.render.denoiser == "external"
+    render_settings.denoising_passes = external_denoiser
+
+    # depth, normals, index masks and creases from the same render
+    render_settings.ground_truth_passes = conf.render.ground_truth_passes
+
+    unknown_slots = set(conf.render.output_formats) - set(render_settings.output_slots)
+    if unknown_slots:
+        raise ValueError(f"{', '.join(sorted(unknown_slots))} are not output slots")
+
+    for slot in render_settings.output_slots:
+        render_settings.set_output_format(
+            slot,
+            conf.render.output_formats.get(slot),
+            conf.render.output_compression.get(slot),
+        )
     render_settings.render_resolution = conf.render.resolution
+    render_settings.crop_region = None
 
     # change render engine to cycles, change to using specified device and change sampling settings
     render_settings.set_render_engine(
         conf.render.render_engine,
         conf.render.cycles_device,
         conf.render.cycles_samples,
-        False,
+        conf.render.cycles_denoise and not external_denoiser,
     )
 
+    # stop sampling at a noise threshold or a time limit instead of a fixed count
+    render_settings.set_render_budget(
+        conf.render.adaptive_sampling,
+        conf.render.noise_threshold,
+        conf.render.min_samples,
+        conf.render.time_limit,
+        conf.render.max_bounces,
+    )
+
+    return render_settings
+
+
+def crop_to_paper(
+    conf: config.Config, render_settings: blender_render_settings.RenderSettings
+) -> Optional[Dict[str, Any]]:
+    paper = paper_parameters.Paper()
+    objects = [paper.obj, ground_parameters.Ground().obj]
+
+    # the outline only needs the unsubdivided folds, subdividing only smooths
+    # the surface towards the inside. a stored mesh of the geometry cache is
+    # already subdivided and its modifiers are hidden, it is measured as it is
+    # rendered
+    subdivisions = [
+        k
+        for obj in objects
+        for k in obj.modifiers
+        if k.type == "SUBSURF" and k.show_render
+    ]
+    levels = [k.levels for k in subdivisions]
+    for modifier in subdivisions:
+        modifier.levels = 0
+
+    try:
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        region = projection.pixel_bounds(
+            paper.obj, depsgraph, conf.render.resolution, conf.render.crop_margin
+        )
+    finally:
+        # back to the levels the geometry cache key was built from, nothing to
+        # mark
+        for modifier, level in zip(subdivisions, levels):
+            modifier.levels = level
+
+    # keep the full frame when the paper is partly behind the camera
+    render_settings.crop_region = region
+    if region is None:
+        return None
+
+    x0, y0, x1, y1 = region
+    height = conf.render.resolution[1]
+    return {"offset": [x0, height - y1], "size": [x1 - x0, y1 - y0]}
+
+
+def render_view(
+    conf: config.Config,
+    output_path: Union[str, pth],
+    sample_metrics: metrics.SampleMetrics,
+    view_metadata: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    render_settings = apply_render_settings(conf, output_path)
+
+    sample_metrics.lap("render_settings")
+
+    if conf.render.crop_to_paper:
+        crop = crop_to_paper(conf, render_settings)
+        if view_metadata is not None and crop is not None:
+            # x, y of the top left corner of the crop in the full frame
+            view_metadata["crop"] = crop
+
+        sample_metrics.lap("crop")
+
+    coordinate_pass = conf.render.coordinate_pass
+    if coordinate_pass not in blender_render_settings.coordinate_passes:
+        raise ValueError(f"{coordinate_pass} is not a valid coordinate pass")
+
+    render_stats = {}
+    if coordinate_pass == "separate":
+        # the second pass reuses the synchronized scene of the first
+        persistent_data = render_settings.persistent_data
+        render_settings.persistent_data = True
+        render_settings.written_slots = [
+            k for k in render_settings.output_slots if k != "coordinates"
+        ]
+
     # render
-    render_settings.render()
+    if coordinate_pass != "only":
+        stats_recorder = blender_render_settings.RenderStatsRecorder()
+        render_settings.render(stats_recorder)
+
+        render_seconds = -sample_metrics.stages.get("render", 0.0)
+        sample_metrics.lap("render")
+        render_seconds += sample_metrics.stages["render"]
+
+        print(
+            f"Rendered {stats_recorder.samples} of {conf.render.cycles_samples} "
+            f"samples in {render_seconds:.2f}s"
+        )
+        render_stats = stats_recorder.to_dict()
+
+    if coordinate_pass != "combined":
+        stats_recorder = blender_render_settings.RenderStatsRecorder()
+        try:
+            render_settings.render_coordinates(stats_recorder)
+        finally:
+            if coordinate_pass == "separate":
+                render_settings.persistent_data = persistent_data
+
+        sample_metrics.lap("coordinate_pass")
+        render_stats["coordinate_pass"] = stats_recorder.to_dict()
+
+    return render_stats
+
+
+def choose_subdivisions(
+    conf: config.Config,
+    views: List[config.Config],
+    sample_metrics: metrics.SampleMetrics,
+) -> Dict[str, Any]:
+    meshes = {"paper": (paper_parameters.Paper(), conf.paper.subdivisions)}
+    if conf.ground.visible:
+        max_level = conf.ground.subdivisions if conf.ground.detail_mode == "mesh" else 0
+        meshes["ground"] = (ground_parameters.Ground(), max_level)
+
+    # measure the unsubdivided meshes, the configured levels are the maximum.
+    # the stored meshes of the geometry cache are subdivided already, the
+    # original stacks are measured and evaluate_geometry swaps them in again
+    for mesh, _ in meshes.values():
+        geometry_cache.cache.restore(mesh.obj)
+        mesh.subdivisions = 0
+    scene_changes.tracker.mark("geometry")
+
+    lengths = {k: [] for k in meshes}
+    for view in views:
+        set_view(view, sample_metrics)
+
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        for name, (mesh, _) in meshes.items():
+            lengths[name].append(
+                level_of_detail.edge_pixels(
+                    *projection.project_mesh(
+                        mesh.obj, depsgraph, view.render.resolution
+                    ),
+                    view.render.resolution,
+                )
+            )
+
+    levels = {}
+    for name, (mesh, max_level) in meshes.items():
+        levels[name] = level_of_detail.subdivision_level(
+            np.concatenate(lengths[name]), conf.render.lod_pixels_per_edge, max_level
+        )
+        mesh.subdivisions = levels[name]
+
+    print(f"Subdivision levels: {levels}")
+
+    sample_metrics.lap("level_of_detail")
+    return levels
+
+
+def evaluate_geometry(conf: config.Config, sample_metrics: metrics.SampleMetrics):
+    # swap in the stored meshes of modifier stacks that were evaluated before
+    if not geometry_cache.cache.enabled:
+        return
+
+    # hashing the modifier stacks is skipped when nothing they read was written
+    if "geometry" not in scene_changes.tracker.changed:
+        return
+
+    # the ground displacement samples its texture through the uv warp that is
+    # drawn for every sample, a stored ground would never be used again
+    geometry_cache.cache.apply(paper_parameters.Paper().obj)
+
+    sample_metrics.lap("geometry_cache")
+
+
+def generate_and_render(
+    conf: config.Config,
+    output_path: Union[str, pth],
+    sample_metrics: Optional[metrics.SampleMetrics] = None,
+) -> Dict[str, Any]:
+    sample_metrics = sample_metrics or metrics.SampleMetrics(pth(output_path).name)
+    metadata = {}
+
+    names = [k.get("name") for k in conf.variants]
+    if None in names or len(set(names)) != len(names):
+        raise ValueError(f"Variants need unique names, got {names}")
+
+    views = [config.apply_variant(conf, k) for k in conf.variants] or [conf]
+
+    set_scene(conf, sample_metrics)
+
+    if conf.render.lod_pixels_per_edge is not None:
+        metadata["subdivisions"] = choose_subdivisions(conf, views, sample_metrics)
+
+    evaluate_geometry(conf, sample_metrics)
+
+    if not conf.variants:
+        set_view(conf, sample_metrics)
+        sample_metrics.render = render_view(conf, output_path, sample_metrics, metadata)
+        sample_metrics.scene_changes = scene_changes.tracker.take_changes()
+        return metadata
+
+    # keep the evaluated paper and ground between the variant renders,
+    # only the camera, lights and hdri change
+    render_settings = blender_render_settings.RenderSettings()
+    persistent_data = render_settings.persistent_data
+    render_settings.persistent_data = True
+
+    sample_metrics.render = {"variants": {}}
+    try:
+        for name, view in zip(names, views):
+            print(f"Rendering variant {name}...")
+
+            set_view(view, sample_metrics)
+            view_metadata = {}
+            sample_metrics.render["variants"][name] = render_view(
+                view, pth(output_path) / name, sample_metrics, view_metadata
+            )
+            if view_metadata:
+                metadata.setdefault("variants", {})[name] = view_metadata
+    finally:
+        render_settings.persistent_data = persistent_data
+
+    sample_metrics.scene_changes = scene_changes.tracker.take_changes()
+    return metadata
+
+
+previous_sample = None
+
+
+def render_sample(
+    name: str,
+    sample: config.Config,
+    config_hash: str,
+    config_path: Optional[Union[str, pth]] = None,
+    resume: bool = False,
+) -> Dict[str, Any]:
+    global previous_sample
+
+    sample_output_dir = pth(sample.render.output_dir)
+    output_path = sample_output_dir / name
+    result = {"name": name, "output_path": str(output_path)}
+
+    if resume and manifest.is_complete(sample_output_dir, name, config_hash):
+        result["status"] = "skipped"
+        return result
+
+    cost, changed = scheduler.transition_cost(previous_sample, sample)
+    print(f"Scene changes: {', '.join(changed) or 'none'} (cost {cost:.0f})")
+    previous_sample = sample
+
+    # render into a temporary directory so that a crash never leaves
+    # a partially written sample behind
+    temp_path = manifest.temp_output_path(sample_output_dir, name)
+    if temp_path.is_dir():
+        shutil.rmtree(temp_path)
+
+    sample_metrics = metrics.SampleMetrics(name)
+    sample_metrics.parameters = config_batch.flatten(sample.to_dict())
+
+    start_time = time.perf_counter()
+    metadata = generate_and_render(sample, temp_path, sample_metrics)
+    render_seconds = time.perf_counter() - start_time
+
+    return finish_sample(
+        name,
+        sample,
+        config_hash,
+        config_path,
+        temp_path,
+        render_seconds,
+        sample_metrics,
+        metadata,
+    )
 
 
-if __name__ == "__main__":
-    args, unknown = parser.parse_known_args(sys.argv[14:])
+def finish_sample(
+    name: str,
+    sample: config.Config,
+    config_hash: str,
+    config_path: Optional[Union[str, pth]],
+    temp_path: pth,
+    render_seconds: float,
+    sample_metrics: metrics.SampleMetrics,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    sample_output_dir = pth(sample.render.output_dir)
+    output_path = sample_output_dir / name
+
+    if metadata:
+        manifest.write_json_atomic(temp_path / "metadata.json", metadata)
+
+    if output_path.is_dir() and sample.render.coordinate_pass == "only":
+        # re-rendering the coordinates keeps the other outputs of a sample
+        manifest.merge_outputs(output_path, temp_path, "coordinates")
+
+    if output_path.is_dir():
+        shutil.rmtree(output_path)
+    temp_path.rename(output_path)
+
+    manifest.write_record(
+        sample_output_dir,
+        name,
+        config_path,
+        config_hash,
+        render_seconds,
+        {
+            "document_image_path": sample.paper.document_image_path,
+            "config": sample.to_dict(),
+            # src/denoise.py clears it once the noisy images are denoised
+            "denoise_pending": (
+                sample.render.denoiser == "external"
+                and sample.render.coordinate_pass != "only"
+            ),
+        },
+    )
+
+    metrics.write_metrics(metrics.metrics_path(sample_output_dir), sample_metrics)
+
+    return {
+        "name": name,
+        "output_path": str(output_path),
+        "status": "done",
+        "render_seconds": render_seconds,
+        "metrics": sample_metrics.to_dict(),
+    }
+
+
+def can_animate(sample: config.Config) -> bool:
+    # variants, level of detail and coordinate passes change the scene in
+    # between renders, crops change the image size
+    return (
+        not sample.variants
+        and sample.render.lod_pixels_per_edge is None
+        and not sample.render.crop_to_paper
+        and sample.render.coordinate_pass == "combined"
+    )
+
+
+def animation_key(sample: config.Config) -> str:
+    # samples of one animation share everything that can't be keyframed
+    return manifest.dict_hash(
+        {
+            "render": sample.to_dict()["render"],
+            "images": [
+                sample.ground.albedo_tex,
+                sample.ground.roughness_tex,
+                sample.ground.displacement_tex,
+                sample.paper.document_image_path,
+                sample.hdri.texture_path,
+            ],
+            "detail_mode": sample.ground.detail_mode,
+        }
+    )
 
-    config_path = pth(args.config_path)
+
+def render_animation(
+    samples: List[Tuple[str, config.Config, str, Optional[pth]]],
+    resume: bool = False,
+) -> List[Dict[str, Any]]:
+    global previous_sample
+
+    results = []
+    pending = []
+    for name, sample, config_hash, config_path in samples:
+        sample_output_dir = pth(sample.render.output_dir)
+        if resume and manifest.is_complete(sample_output_dir, name, config_hash):
+            results.append(
+                {
+                    "name": name,
+                    "output_path": str(sample_output_dir / name),
+                    "status": "skipped",
+                }
+            )
+            continue
+
+        pending.append((name, sample, config_hash, config_path))
+
+    if not pending:
+        return results
+
+    print(f"Rendering {len(pending)} samples as one animation...")
+
+    first = pending[0][1]
+    sample_output_dir = pth(first.render.output_dir)
+    animation_path = manifest.temp_output_path(
+        sample_output_dir, f"{pending[0][0]}.animation"
+    )
+    if animation_path.is_dir():
+        shutil.rmtree(animation_path)
+
+    # the keyframes drive the original modifier stacks
+    geometry_cache.cache.restore(paper_parameters.Paper().obj)
+    geometry_cache.cache.restore(ground_parameters.Ground().obj)
+
+    # nodes have to exist before the keyed properties are collected
+    ground_parameters.Ground().detail_mode = first.ground.detail_mode
+
+    render_settings = blender_render_settings.RenderSettings()
+    persistent_data = render_settings.persistent_data
+    render_settings.persistent_data = True
+
+    keyframes = animation.Animation()
+    sample_metrics = []
+    try:
+        # one frame per sample
+        for name, sample, _, _ in pending:
+            frame_metrics = metrics.SampleMetrics(name)
+            frame_metrics.parameters = config_batch.flatten(sample.to_dict())
+
+            set_scene(sample, frame_metrics)
+            set_view(sample, frame_metrics)
+            keyframes.key_frame()
+
+            frame_metrics.lap("keyframes")
+            sample_metrics.append(frame_metrics)
+
+        apply_render_settings(first, animation_path)
+
+        start_time = time.perf_counter()
+        stats_recorder = blender_render_settings.RenderStatsRecorder()
+        render_settings.render_animation(len(pending), stats_recorder)
+        render_seconds = time.perf_counter() - start_time
+    finally:
+        keyframes.restore()
+        render_settings.persistent_data = persistent_data
+        render_settings.current_frame = 1
+
+        # the keyframes left the values of some frame behind
+        scene_changes.tracker.forget()
+
+    previous_sample = pending[-1][1]
+
+    print(
+        f"Rendered {len(pending)} frames in {render_seconds:.2f}s "
+        f"({render_seconds / len(pending):.2f}s per sample)"
+    )
+
+    # split the frames back into one directory per sample
+    for frame, (name, sample, config_hash, config_path) in enumerate(pending, 1):
+        temp_path = manifest.temp_output_path(sample_output_dir, name)
+        if temp_path.is_dir():
+            shutil.rmtree(temp_path)
+        temp_path.mkdir(parents=True)
+
+        for slot in render_settings.output_slots:
+            for path in animation_path.glob(f"{slot}{frame:04d}.*"):
+                path.rename(temp_path / f"{slot}0001{path.suffix}")
+
+        frame_metrics = sample_metrics[frame - 1]
+        frame_metrics.stages["render"] = render_seconds / len(pending)
+        frame_metrics.render = dict(
+            stats_recorder.to_dict(), animation_frames=len(pending)
+        )
+
+        results.append(
+            finish_sample(
+                name,
+                sample,
+                config_hash,
+                config_path,
+                temp_path,
+                sum(frame_metrics.stages.values()),
+                frame_metrics,
+            )
+        )
+
+    shutil.rmtree(animation_path)
+    return results
+
+
+def run_batch(
+    config_path: Union[str, pth],
+    shard_index: int = 0,
+    shard_count: int = 1,
+    schedule: bool = False,
+    resume: bool = False,
+    animation_frames: int = 0,
+):
+    config_path = pth(config_path)
 
     if not config_path.is_absolute():
         raise FileNotFoundError(f"Config path {config_path} is not absolute")
 
     config_path = config_path.resolve()
 
-    if not config_path.is_dir():
-        raise FileNotFoundError(f"Config path {config_path} is not a directory")
+    # either a directory of json configs or a columnar config batch
+    if config_batch.is_batch(config_path):
+        batch = config_batch.BatchReader(config_path)
+        keys = render_farm.shard_samples(range(len(batch)), shard_index, shard_count)
+
+        def load(index):
+            sample = batch.config(index)
+            return batch.name(index), sample, manifest.dict_hash(sample.to_dict()), None
+
+    elif config_path.is_dir():
+        keys = render_farm.shard_samples(
+            render_farm.list_samples(config_path), shard_index, shard_count
+        )
+
+        def load(path):
+            return path.stem, config.read_config(path), manifest.config_hash(path), path
+
+    else:
+        raise FileNotFoundError(
+            f"Config path {config_path} is not a directory or a config batch"
+        )
+
+    # optionally reorder the samples to minimize scene changes between renders,
+    # output names stay the same because they come from the config names
+    if schedule:
+        samples = [load(k) for k in keys]
+        samples = scheduler.schedule(samples, [k[1] for k in samples])
+    else:
+        samples = keys
+
+    sample_metrics = []
+
+    def add_results(results):
+        for result in results:
+            if result["status"] == "skipped":
+                print(f"Skipped sample {result['name']}, already rendered")
+            else:
+                sample_metrics.append(result["metrics"])
+
+    # consecutive samples that only differ in keyframeable parameters are
+    # rendered together as frames of one animation
+    group, group_key = [], None
+    for i, k in enumerate(samples):
+        loaded = k if schedule else load(k)
 
-    samples = [k for k in config_path.iterdir() if k.is_file() and k.suffix == ".json"]
+        if animation_frames > 1 and can_animate(loaded[1]):
+            key = animation_key(loaded[1])
+            if group and (len(group) >= animation_frames or key != group_key):
+                add_results(render_animation(group, resume))
+                group = []
+
+            group.append(loaded)
+            group_key = key
+            continue
 
-    for i, k in enumerate(samples):
         print(f"Generating sample {i+1} of {len(samples)}...")
+        add_results([render_sample(*loaded, resume)])
+
+    if group:
+        add_results(render_animation(group, resume))
+
+    print(metrics.summarize(sample_metrics))
+
+
+def run_job(job: job_queue.Job, resume: bool = False) -> Dict[str, Any]:
+    if "config_path" in job:
+        config_path = pth(job["config_path"])
+        sample = config.read_config(config_path)
+        name = job.get("name", config_path.stem)
+        return render_sample(
+            name, sample, manifest.config_hash(config_path), config_path, resume
+        )
+
+    sample = config.load_config(job["config"])
+    return render_sample(
+        job["name"], sample, manifest.dict_hash(job["config"]), None, resume
+    )
+
 
-        sample = config.read_config(k)
+def run_worker(source: str, queue_path: Optional[str] = None, resume: bool = False):
+    # keep the scene, devices and render data loaded between jobs
+    render_settings = blender_render_settings.RenderSettings()
+    render_settings.persistent_data = True
+
+    print(f"Waiting for jobs from {source}...")
+
+    for job, reply in job_queue.jobs(source, queue_path):
+        command = job.get("command", "render")
+
+        if command == "stop":
+            job_queue.send_reply(reply, {"id": job.get("id"), "status": "stopped"})
+            break
 
-        output_path = pth(sample.render.output_dir) / k.stem
+        try:
+            if command != "render":
+                raise ValueError(job.get("error", f"{command} is not a valid command"))
 
-        if output_path.is_dir():
-            shutil.rmtree(output_path)
+            result = run_job(job, resume)
+        except Exception as e:
+            traceback.print_exc()
+            result = {"status": "error", "error": str(e)}
 
-        generate_and_render(sample, output_path)
+        result["id"] = job.get("id")
+        job_queue.send_reply(reply, result)
+
+        image_cache.cache.report()
+        scene_changes.tracker.report()
+        if geometry_cache.cache.enabled:
+            geometry_cache.cache.report()
+
+
+if __name__ == "__main__":
+    # only parse the arguments passed after "--", the rest belong to blender
+    args, unknown = parser.parse_known_args(sys.argv[sys.argv.index("--") + 1 :])
+
+    image_cache.cache.capacity = args.image_cache_size
+    geometry_cache.cache.cache_dir = args.geometry_cache
+    geometry_cache.cache.max_size_mb = args.geometry_cache_size
+
+    if args.worker:
+        run_worker(args.worker, args.queue_path, args.resume)
+    else:
+        run_batch(
+            args.config_path,
+            args.shard_index,
+            args.shard_count,
+            args.schedule,
+            args.resume,
+            args.animation_frames,
+        )
+
+        image_cache.cache.report()
+        scene_changes.tracker.report()
+        if geometry_cache.cache.enabled:
+            geometry_cache.cache.report()
@@ -0,0 +1,138 @@
+from typing import Union, Optional, Dict, Any
+import os
+import json
+import time
+import hashlib
+
+from pathlib import Path as pth
+
+
+def manifest_dir(output_dir: Union[str, pth]) -> pth:
+    # lives next to the output directory so it doesn't show up as a sample
+    output_dir = pth(output_dir)
+    return output_dir.parent / f"{output_dir.name}.manifest"
+
+
+def record_path(output_dir: Union[str, pth], sample_name: str) -> pth:
+    return manifest_dir(output_dir) / f"{sample_name}.json"
+
+
+def temp_output_path(output_dir: Union[str, pth], sample_name: str) -> pth:
+    return pth(output_dir) / f".{sample_name}.partial"
+
+
+def dict_hash(dictionary: Dict[str, Any]) -> str:
+    serialized = json.dumps(dictionary, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+def config_hash(config_path: Union[str, pth]) -> str:
+    # hash the parsed config so formatting changes don't invalidate renders
+    with open(config_path) as json_file:
+        return dict_hash(json.load(json_file))
+
+
+def write_json_atomic(path: Union[str, pth], dictionary: Dict[str, Any]):
+    path = pth(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(temp_path, "w") as json_file:
+        json.dump(dictionary, json_file, indent=2)
+        json_file.flush()
+        os.fsync(json_file.fileno())
+
+    os.replace(temp_path, path)
+
+
+def output_files(output_path: Union[str, pth]) -> Dict[str, int]:
+    output_path = pth(output_path)
+    return {
+        str(k.relative_to(output_path).as_posix()): k.stat().st_size
+        for k in sorted(output_path.rglob("*"))
+        if k.is_file()
+    }
+
+
+def merge_outputs(
+    previous_path: Union[str, pth], output_path: Union[str, pth], replaced: str
+):
+    # moves the files of an earlier render into a new one that only rendered
+    # the outputs starting with replaced, file by file so that the
+    # directories of variants are merged instead of skipped
+    previous_path, output_path = pth(previous_path), pth(output_path)
+    for path in sorted(previous_path.rglob("*")):
+        if not path.is_file() or path.name.startswith(replaced):
+            continue
+
+        target = output_path / path.relative_to(previous_path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(path, target)
+
+
+def write_record(
+    output_dir: Union[str, pth],
+    sample_name: str,
+    config_path: Optional[Union[str, pth]],
+    hash_: str,
+    render_seconds: float,
+    extra: Optional[Dict[str, Any]] = None,
+):
+    output_path = pth(output_dir) / sample_name
+
+    record = {
+        "sample": sample_name,
+        "config_path": str(config_path) if config_path else None,
+        "config_hash": hash_,
+        "files": output_files(output_path),
+        "render_seconds": render_seconds,
+        "finished_at": time.time(),
+    }
+    record.update(extra or {})
+
+    write_json_atomic(record_path(output_dir, sample_name), record)
+
+
+def update_record(output_dir: Union[str, pth], sample_name: str, **changes: Any):
+    # outputs that were changed after the render, e.g. by denoising
+    record = read_record(output_dir, sample_name)
+    if record is None:
+        return
+
+    record["files"] = output_files(pth(output_dir) / sample_name)
+    record.update(changes)
+
+    write_json_atomic(record_path(output_dir, sample_name), record)
+
+
+def read_record(
+    output_dir: Union[str, pth], sample_name: str
+) -> Optional[Dict[str, Any]]:
+    path = record_path(output_dir, sample_name)
+    if not path.is_file():
+        return None
+
+    try:
+        with open(path) as json_file:
+            return json.load(json_file)
+    except json.JSONDecodeError:
+        return None
+
+
+def is_complete(output_dir: Union[str, pth], sample_name: str, hash_: str) -> bool:
+    record = read_record(output_dir, sample_name)
+    if record is None or record.get("config_hash") != hash_:
+        return False
+
+    files = record.get("files")
+    if not files:
+        return False
+
+    # every recorded output has to exist with the size it was written with
+    output_path = pth(output_dir) / sample_name
+    for name, size in files.items():
+        path = output_path / name
+        if not path.is_file() or path.stat().st_size != size:
+            return False
+
+    return True
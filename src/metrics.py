@@ -0,0 +1,155 @@
+from typing import Union, Dict, Any, List, Sequence
+import sys
+import json
+import time
+from collections import defaultdict, Counter
+
+from pathlib import Path as pth
+
+
+# parameters that usually dominate the render time, the summary breaks the
+# render time down by their values
+cost_parameters = (
+    "paper.subdivisions",
+    "ground.subdivisions",
+    "ground.visible",
+    "ground.detail_mode",
+    "render.resolution",
+    "render.cycles_samples",
+)
+
+
+def metrics_path(output_dir: Union[str, pth]) -> pth:
+    output_dir = pth(output_dir)
+    return output_dir.parent / f"{output_dir.name}.metrics.jsonl"
+
+
+class SampleMetrics:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.stages: Dict[str, float] = {}
+        self.render: Dict[str, Any] = {}
+        self.parameters: Dict[str, Any] = {}
+        # parts of the scene the parameter classes actually changed
+        self.scene_changes: List[str] = []
+        self.__last_time = time.perf_counter()
+
+    def lap(self, stage: str):
+        # the time since the previous lap belongs to the given stage
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self.__last_time
+        self.__last_time = now
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sample": self.name,
+            "stages": self.stages,
+            "render": self.render,
+            "parameters": self.parameters,
+            "scene_changes": self.scene_changes,
+        }
+
+
+def write_metrics(path: Union[str, pth], metrics: SampleMetrics):
+    path = pth(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # a single short line per write, so concurrent workers can share the file
+    with open(path, "a") as metrics_file:
+        metrics_file.write(json.dumps(metrics.to_dict()) + "\n")
+
+
+def read_metrics(path: Union[str, pth]) -> List[Dict[str, Any]]:
+    with open(path) as metrics_file:
+        return [json.loads(k) for k in metrics_file if k.strip()]
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    values = sorted(values)
+    if not values:
+        return float("nan")
+
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summary_line(name: str, values: Sequence[float]) -> str:
+    return (
+        f"  {name:<24} p50 {percentile(values, 50):8.3f}s  "
+        f"p90 {percentile(values, 90):8.3f}s  p99 {percentile(values, 99):8.3f}s  "
+        f"total {sum(values):10.1f}s"
+    )
+
+
+def summarize(records: Sequence[Dict[str, Any]]) -> str:
+    if not records:
+        return "No metrics recorded"
+
+    lines = [f"Timings of {len(records)} samples:"]
+
+    stages = defaultdict(list)
+    phases = defaultdict(list)
+    for record in records:
+        for k, v in record["stages"].items():
+            stages[k].append(v)
+        for k, v in record["render"].get("phases", {}).items():
+            phases[k].append(v)
+
+    for name, values in stages.items():
+        lines.append(summary_line(name, values))
+
+    if phases:
+        lines.append("Render phases:")
+        for name, values in phases.items():
+            lines.append(summary_line(name, values))
+
+    peak_memory = [
+        k["render"]["peak_memory_mb"]
+        for k in records
+        if k["render"].get("peak_memory_mb") is not None
+    ]
+    if peak_memory:
+        lines.append(
+            f"Peak memory: p50 {percentile(peak_memory, 50):.0f}M, "
+            f"max {max(peak_memory):.0f}M"
+        )
+
+    samples = [
+        k["render"]["samples"]
+        for k in records
+        if k["render"].get("samples") is not None
+    ]
+    if samples:
+        lines.append(
+            f"Achieved samples: min {min(samples)}, "
+            f"p50 {percentile(samples, 50):.0f}, max {max(samples)}"
+        )
+
+    changes = Counter(c for k in records for c in k.get("scene_changes", []))
+    if changes:
+        lines.append(
+            "Scene changes: "
+            + ", ".join(f"{k} in {v} samples" for k, v in changes.most_common())
+        )
+
+    for parameter in cost_parameters:
+        by_value = defaultdict(list)
+        for record in records:
+            if parameter in record["parameters"] and "render" in record["stages"]:
+                value = json.dumps(record["parameters"][parameter])
+                by_value[value].append(record["stages"]["render"])
+
+        if len(by_value) < 2:
+            continue
+
+        lines.append(f"Render time by {parameter}:")
+        for value, values in sorted(by_value.items(), key=lambda k: json.loads(k[0])):
+            lines.append(summary_line(value, values))
+
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(summarize(read_metrics(sys.argv[1])))
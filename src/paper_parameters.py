@@ -2,11 +2,17 @@ import math
 
 import bpy
 
+import image_cache
+import scene_changes
+
 
 data = bpy.data
 scene = data.scenes["Scene"]
 
-text_texture = bpy.data.images["text"]
+text_texture = image_cache.ImageSlot("text")
+
+# point attribute and aov of how sharply the folded paper bends
+crease_attribute = "crease"
 
 
 class Fold:
@@ -23,7 +29,12 @@ class Fold:
 
     @angle.setter
     def angle(self, angle):
-        self.__modifier[self.__angle_index] = math.radians(angle)
+        def apply(angle):
+            self.__modifier[self.__angle_index] = math.radians(angle)
+
+        scene_changes.tracker.write(
+            "geometry", (self.obj.name, self.__angle_index), angle, apply
+        )
 
     @property
     def strength(self):
@@ -31,7 +42,11 @@ class Fold:
 
     @strength.setter
     def strength(self, strength):
-        self.__modifier[self.__strength_index] = float(strength)
+        def apply(strength):
+            self.__modifier[self.__strength_index] = strength
+
+        key = (self.obj.name, self.__strength_index)
+        scene_changes.tracker.write("geometry", key, float(strength), apply)
 
 
 class Paper:
@@ -41,8 +56,12 @@ class Paper:
         self.folds = [Fold(self.obj, i) for i in range(2)]
 
     def paper_size_cm(self, width, height):
-        scene["paper_width_cm"] = width
-        scene["paper_height_cm"] = height
+        def apply(size):
+            scene["paper_width_cm"], scene["paper_height_cm"] = size
+
+        scene_changes.tracker.write(
+            "geometry", ("scene", "paper_size_cm"), (width, height), apply
+        )
 
     @property
     def subdivisions(self):
@@ -50,8 +69,13 @@ class Paper:
 
     @subdivisions.setter
     def subdivisions(self, n_divisions):
-        self.obj.modifiers["Subdivision"].render_levels = n_divisions
-        self.obj.modifiers["Subdivision"].levels = n_divisions
+        def apply(n_divisions):
+            self.obj.modifiers["Subdivision"].render_levels = n_divisions
+            self.obj.modifiers["Subdivision"].levels = n_divisions
+
+        scene_changes.tracker.write(
+            "geometry", (self.obj.name, "subdivisions"), n_divisions, apply
+        )
 
     @property
     def crumpling_strength(self):
@@ -59,7 +83,12 @@ class Paper:
 
     @crumpling_strength.setter
     def crumpling_strength(self, strength):
-        self.__fold_modifier["Input_6"] = strength
+        def apply(strength):
+            self.__fold_modifier["Input_6"] = strength
+
+        scene_changes.tracker.write(
+            "geometry", (self.obj.name, "Input_6"), strength, apply
+        )
 
     @property
     def fold_messiness(self):
@@ -67,7 +96,12 @@ class Paper:
 
     @fold_messiness.setter
     def fold_messiness(self, messiness):
-        self.__fold_modifier["Input_9"] = messiness
+        def apply(messiness):
+            self.__fold_modifier["Input_9"] = messiness
+
+        scene_changes.tracker.write(
+            "geometry", (self.obj.name, "Input_9"), messiness, apply
+        )
 
     @property
     def fold_smoothness(self):
@@ -75,7 +109,12 @@ class Paper:
 
     @fold_smoothness.setter
     def fold_smoothness(self, smoothness):
-        self.__fold_modifier["Input_10"] = smoothness
+        def apply(smoothness):
+            self.__fold_modifier["Input_10"] = smoothness
+
+        scene_changes.tracker.write(
+            "geometry", (self.obj.name, "Input_10"), smoothness, apply
+        )
 
     @property
     def texture_rotation(self):
@@ -83,7 +122,14 @@ class Paper:
 
     @texture_rotation.setter
     def texture_rotation(self, angle):
-        self.obj.modifiers["UVWarp"].rotation = math.radians(angle)
+        # the uv warp only moves the texture coordinates of the paper, the
+        # geometry cache keeps it running on top of the stored mesh
+        def apply(angle):
+            self.obj.modifiers["UVWarp"].rotation = math.radians(angle)
+
+        scene_changes.tracker.write(
+            "shading", (self.obj.name, "texture_rotation"), angle, apply
+        )
 
     @property
     def offset(self):
@@ -91,8 +137,13 @@ class Paper:
 
     @offset.setter
     def offset(self, offset):
-        self.obj.modifiers["UVWarp"].offset[0] = offset
-        self.obj.modifiers["UVWarp"].offset[1] = offset * 2
+        def apply(offset):
+            self.obj.modifiers["UVWarp"].offset[0] = offset
+            self.obj.modifiers["UVWarp"].offset[1] = offset * 2
+
+        scene_changes.tracker.write(
+            "shading", (self.obj.name, "uv_offset"), offset, apply
+        )
 
     @property
     def text_image_path(self):
@@ -100,4 +151,48 @@ class Paper:
 
     @text_image_path.setter
     def text_image_path(self, path):
-        text_texture.filepath = path
+        scene_changes.tracker.write_image("shading", text_texture, path)
+
+    def store_crease(self):
+        # fold_and_crumble has no crease output, the unsigned angle between the
+        # faces of every edge is stored on the points after it so that the
+        # subdivision and the shaders can interpolate it
+        group = self.__fold_modifier.node_group
+        if group.nodes.get("store_crease") is None:
+            output = next(k for k in group.nodes if k.type == "GROUP_OUTPUT")
+            geometry = output.inputs[0]
+
+            angle = group.nodes.new("GeometryNodeInputMeshEdgeAngle")
+            angle.name = "crease_angle"
+
+            store = group.nodes.new("GeometryNodeStoreNamedAttribute")
+            store.name = "store_crease"
+            store.data_type = "FLOAT"
+            store.domain = "POINT"
+            store.inputs["Name"].default_value = crease_attribute
+            value = next(k for k in store.inputs if k.identifier == "Value_Float")
+
+            group.links.new(geometry.links[0].from_socket, store.inputs["Geometry"])
+            group.links.new(angle.outputs["Unsigned Angle"], value)
+            group.links.new(store.outputs["Geometry"], geometry)
+
+            # the stored meshes of the geometry cache don't have the attribute
+            scene_changes.tracker.mark("geometry")
+
+        # every paper material writes the attribute to the crease aov
+        materials = {k.material for k in self.obj.material_slots if k.material}
+        for material in materials:
+            tree = material.node_tree
+            if tree.nodes.get("crease_aov") is not None:
+                continue
+
+            attribute = tree.nodes.new("ShaderNodeAttribute")
+            attribute.name = "crease_attribute"
+            attribute.attribute_type = "GEOMETRY"
+            attribute.attribute_name = crease_attribute
+
+            aov = tree.nodes.new("ShaderNodeOutputAOV")
+            aov.name = "crease_aov"
+            aov.aov_name = crease_attribute
+            tree.links.new(attribute.outputs["Fac"], aov.inputs["Value"])
+            scene_changes.tracker.mark("shading")
@@ -0,0 +1,62 @@
+import numpy as np
+
+import bpy
+
+
+data = bpy.data
+scene = data.scenes["Scene"]
+
+
+def project_mesh(obj, depsgraph, resolution):
+    # pixel positions of the evaluated vertices with the origin at the bottom
+    # left, whether they are in front of the camera, the edges and the polygons
+    # as their loop vertices, loop edges and loop starts
+    width, height = resolution
+    camera = scene.camera.evaluated_get(depsgraph)
+    projection = np.array(camera.calc_matrix_camera(depsgraph, x=width, y=height))
+    view = np.array(camera.matrix_world.inverted())
+
+    obj_eval = obj.evaluated_get(depsgraph)
+    mesh = obj_eval.to_mesh()
+    try:
+        positions = np.empty(len(mesh.vertices) * 3, np.float64)
+        mesh.vertices.foreach_get("co", positions)
+        edges = np.empty(len(mesh.edges) * 2, np.int64)
+        mesh.edges.foreach_get("vertices", edges)
+        loop_vertices = np.empty(len(mesh.loops), np.int64)
+        mesh.loops.foreach_get("vertex_index", loop_vertices)
+        loop_edges = np.empty(len(mesh.loops), np.int64)
+        mesh.loops.foreach_get("edge_index", loop_edges)
+        loop_starts = np.empty(len(mesh.polygons), np.int64)
+        mesh.polygons.foreach_get("loop_start", loop_starts)
+    finally:
+        obj_eval.to_mesh_clear()
+
+    positions = positions.reshape(-1, 3)
+
+    transform = projection @ view @ np.array(obj_eval.matrix_world)
+    clip = np.c_[positions, np.ones(len(positions))] @ transform.T
+
+    in_front = clip[:, 3] > 1e-6
+    ndc = clip[:, :2] / np.where(in_front, clip[:, 3], 1)[:, None]
+    pixels = (ndc + 1) / 2 * (width, height)
+
+    polygons = (loop_vertices, loop_edges, loop_starts)
+    return pixels, in_front, edges.reshape(-1, 2), polygons
+
+
+def pixel_bounds(obj, depsgraph, resolution, margin=0):
+    # integer pixel box x0, y0, x1, y1 around the object clamped to the frame,
+    # None when part of it is behind the camera
+    pixels, in_front, *_ = project_mesh(obj, depsgraph, resolution)
+    if not len(pixels) or not in_front.all():
+        return None
+
+    low = np.floor(pixels.min(0) - margin).astype(int)
+    high = np.ceil(pixels.max(0) + margin).astype(int)
+    low = np.clip(low, 0, resolution)
+    high = np.clip(high, 0, resolution)
+
+    if np.any(high <= low):
+        return None
+    return (*low.tolist(), *high.tolist())
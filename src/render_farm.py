@@ -0,0 +1,223 @@
+from typing import Union, Optional, List, Dict, Sequence
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+from pathlib import Path as pth
+
+import config_batch
+
+
+project_dir = pth(__file__).resolve().parent.parent
+
+
+def list_samples(config_path: Union[str, pth]) -> List[pth]:
+    # sorted so that every worker sees the same order
+    return sorted(
+        k for k in pth(config_path).iterdir() if k.is_file() and k.suffix == ".json"
+    )
+
+
+def shard_samples(samples: Sequence, shard_index: int, shard_count: int) -> list:
+    if shard_count < 1:
+        raise ValueError(f"Shard count must be at least 1, got {shard_count}")
+
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(
+            f"Shard index {shard_index} is out of range for {shard_count} shards"
+        )
+
+    return list(samples[shard_index::shard_count])
+
+
+def default_worker_count(device: str, threads_per_worker: int) -> int:
+    # gpu workers share a single device, cpu workers split the cores between them
+    if device != "CPU":
+        return 1
+
+    return max(1, (os.cpu_count() or 1) // max(1, threads_per_worker))
+
+
+def blender_command(
+    blender_path: Union[str, pth],
+    config_path: Optional[Union[str, pth]],
+    shard_index: int = 0,
+    shard_count: int = 1,
+    device: str = "CUDA",
+    render_engine: str = "CYCLES",
+    threads: int = 0,
+    blend_file_path: Optional[Union[str, pth]] = None,
+    script_path: Optional[Union[str, pth]] = None,
+    extra_args: Sequence[str] = (),
+) -> List[str]:
+    blend_file_path = blend_file_path or project_dir / "blender" / "scene.blend"
+    script_path = script_path or project_dir / "src" / "main.py"
+
+    command = [
+        str(blender_path),
+        str(blend_file_path),
+        "--background",
+        "--factory-startup",
+        "--threads",
+        str(threads),
+        "--engine",
+        render_engine,
+        "--enable-autoexec",
+        # blender exits with 0 when the script raises, crashed shards have to
+        # fail to be retried
+        "--python-exit-code",
+        "1",
+        "--python",
+        str(script_path),
+        "--",
+        "--cycles-device",
+        device,
+    ]
+
+    # workers started without a config path take their jobs from a queue
+    if config_path is not None:
+        command += [
+            "--config_path",
+            str(config_path),
+            "--shard-index",
+            str(shard_index),
+            "--shard-count",
+            str(shard_count),
+        ]
+
+    return command + list(extra_args)
+
+
+def run_farm(
+    blender_path: Union[str, pth],
+    config_path: Union[str, pth],
+    n_workers: Optional[int] = None,
+    n_shards: Optional[int] = None,
+    device: str = "CUDA",
+    render_engine: str = "CYCLES",
+    threads_per_worker: Optional[int] = None,
+    max_retries: int = 2,
+    log_dir: Optional[Union[str, pth]] = None,
+    extra_args: Sequence[str] = (),
+    poll_interval: float = 1.0,
+) -> Dict[int, int]:
+    # returns the last exit code of every shard, crashed shards are re-queued
+    # up to max_retries times
+    config_path = pth(config_path).resolve()
+
+    cpu_count = os.cpu_count() or 1
+    if threads_per_worker is None:
+        threads_per_worker = min(4, cpu_count) if device == "CPU" else 0
+
+    if n_workers is None:
+        n_workers = default_worker_count(device, threads_per_worker)
+
+    if device == "CPU" and threads_per_worker:
+        # don't oversubscribe the cores with cpu cycles workers
+        n_workers = max(1, min(n_workers, cpu_count // threads_per_worker))
+
+    n_shards = n_shards or n_workers
+
+    # config batches are sharded by sample index inside the workers
+    if not config_batch.is_batch(config_path):
+        print(f"Rendering {len(list_samples(config_path))} samples...")
+    print(f"Rendering {n_shards} shards with {n_workers} workers...")
+
+    if log_dir is not None:
+        log_dir = pth(log_dir)
+        log_dir.mkdir(parents=True, exist_ok=True)
+
+    queue = list(range(n_shards))
+    attempts = {k: 0 for k in queue}
+    exit_codes: Dict[int, int] = {}
+    running: Dict[int, subprocess.Popen] = {}
+    log_files = {}
+
+    while queue or running:
+        while queue and len(running) < n_workers:
+            shard_index = queue.pop(0)
+            attempts[shard_index] += 1
+
+            # a retried shard only renders the samples its crashed worker didn't finish
+            shard_args = list(extra_args)
+            if attempts[shard_index] > 1 and "--resume" not in shard_args:
+                shard_args.append("--resume")
+
+            command = blender_command(
+                blender_path,
+                config_path,
+                shard_index,
+                n_shards,
+                device,
+                render_engine,
+                threads_per_worker,
+                extra_args=shard_args,
+            )
+
+            output = None
+            if log_dir is not None:
+                output = open(log_dir / f"shard_{shard_index:04d}.log", "a")
+                log_files[shard_index] = output
+
+            print(f"Starting shard {shard_index} (attempt {attempts[shard_index]})...")
+            running[shard_index] = subprocess.Popen(
+                command, stdout=output, stderr=subprocess.STDOUT if output else None
+            )
+
+        time.sleep(poll_interval)
+
+        for shard_index, process in list(running.items()):
+            exit_code = process.poll()
+            if exit_code is None:
+                continue
+
+            del running[shard_index]
+            if shard_index in log_files:
+                log_files.pop(shard_index).close()
+
+            exit_codes[shard_index] = exit_code
+            if exit_code == 0:
+                print(f"Shard {shard_index} finished")
+                continue
+
+            if attempts[shard_index] <= max_retries:
+                print(f"Shard {shard_index} crashed with {exit_code}, re-queueing...")
+                queue.append(shard_index)
+            else:
+                print(f"Shard {shard_index} crashed with {exit_code}, giving up")
+
+    return exit_codes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--blender_path", required=True)
+    parser.add_argument("--config_path", required=True)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--shards", type=int)
+    parser.add_argument("--cycles-device", default="CUDA")
+    parser.add_argument("--render_engine", default="CYCLES")
+    parser.add_argument("--threads", type=int)
+    parser.add_argument("--max_retries", type=int, default=2)
+    parser.add_argument("--log_dir")
+    args, extra_args = parser.parse_known_args()
+
+    exit_codes = run_farm(
+        args.blender_path,
+        args.config_path,
+        args.workers,
+        args.shards,
+        args.cycles_device,
+        args.render_engine,
+        args.threads,
+        args.max_retries,
+        args.log_dir,
+        extra_args,
+    )
+
+    failed = sorted(k for k, v in exit_codes.items() if v != 0)
+    if failed:
+        print(f"Shards {failed} failed")
+        sys.exit(1)
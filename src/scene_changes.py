@@ -0,0 +1,60 @@
+# parts of the scene a property write invalidates, geometry covers everything
+# the modifier stacks and the visible objects read. code that changes the scene
+# without going through write has to mark the categories it touched, values it
+# sets back before the sample is rendered don't count
+categories = ("geometry", "shading", "lighting", "camera")
+
+missing = object()
+
+
+class ChangeTracker:
+    # last value the parameter classes wrote to every scene property, writing
+    # the same value again would still tag the depsgraph for an update
+    def __init__(self):
+        self.writes = 0
+        self.skipped = 0
+        self.changed = set(categories)
+        self.__applied = {}
+
+    def write(self, category, key, value, apply):
+        if self.__applied.get(key, missing) == value:
+            self.skipped += 1
+            return False
+
+        apply(value)
+        self.__applied[key] = value
+        self.changed.add(category)
+        self.writes += 1
+        return True
+
+    def write_image(self, category, slot, path):
+        # image slots skip unchanged files themselves, only a swapped image counts
+        image = slot.image
+        slot.filepath = path
+        if slot.image != image:
+            self.changed.add(category)
+
+    def mark(self, category):
+        self.changed.add(category)
+
+    def forget(self):
+        # the scene was changed around the parameter classes, e.g. by keyframes
+        self.__applied = {}
+        self.changed = set(categories)
+
+    def take_changes(self):
+        changed, self.changed = self.changed, set()
+        return [k for k in categories if k in changed]
+
+    def report(self):
+        total = self.writes + self.skipped
+        print(
+            f"Scene writes: {self.writes} applied, {self.skipped} unchanged "
+            f"({self.skipped / max(total, 1):.0%} skipped)"
+        )
+
+        self.writes = 0
+        self.skipped = 0
+
+
+tracker = ChangeTracker()
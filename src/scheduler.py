@@ -0,0 +1,97 @@
+from typing import Optional, List, Tuple, Sequence, Dict, Any
+
+import config
+
+
+# rough relative cost of changing each part of the scene between two renders,
+# new images have to be loaded and uploaded, new subdivision levels rebuild the
+# meshes and their bvh, visibility only changes which objects are in the bvh
+transition_costs = {
+    "assets": 10.0,
+    "subdivisions": 5.0,
+    "visibility": 1.0,
+}
+
+
+def asset_key(conf: config.Config) -> Tuple[str, ...]:
+    return (
+        conf.hdri.texture_path,
+        conf.ground.albedo_tex,
+        conf.ground.roughness_tex,
+        conf.ground.displacement_tex,
+        conf.paper.document_image_path,
+    )
+
+
+def subdivisions_key(conf: config.Config) -> Tuple[int, ...]:
+    return (conf.paper.subdivisions, conf.ground.subdivisions)
+
+
+def visibility_key(conf: config.Config) -> Tuple[bool, ...]:
+    return (
+        conf.ground.visible,
+        conf.shadows.visible,
+        *(k.visible for k in conf.lights),
+    )
+
+
+state_keys = {
+    "assets": asset_key,
+    "subdivisions": subdivisions_key,
+    "visibility": visibility_key,
+}
+
+
+def transition_cost(
+    previous: Optional[config.Config], conf: config.Config
+) -> Tuple[float, List[str]]:
+    # the first sample always pays for setting up the whole scene
+    if previous is None:
+        return sum(transition_costs.values()), list(state_keys)
+
+    changed = [name for name, key in state_keys.items() if key(previous) != key(conf)]
+    return sum(transition_costs[k] for k in changed), changed
+
+
+def total_cost(configs: Sequence[config.Config]) -> float:
+    cost = 0.0
+    previous = None
+    for conf in configs:
+        cost += transition_cost(previous, conf)[0]
+        previous = conf
+
+    return cost
+
+
+def schedule_key(conf: config.Config) -> tuple:
+    # most expensive state first so that equal assets end up next to each other
+    return tuple(state_keys[k](conf) for k in transition_costs)
+
+
+def changed_state_counts(configs: Sequence[config.Config]) -> Dict[str, int]:
+    counts = {k: 0 for k in state_keys}
+
+    previous = None
+    for conf in configs:
+        for name in transition_cost(previous, conf)[1]:
+            counts[name] += 1
+        previous = conf
+
+    return counts
+
+
+def schedule(samples: Sequence[Any], configs: Sequence[config.Config]) -> List[Any]:
+    # the sort is stable, so samples with the same state keep their order
+    order = sorted(range(len(samples)), key=lambda k: schedule_key(configs[k]))
+
+    for name, configs_ in (
+        ("original", configs),
+        ("scheduled", [configs[k] for k in order]),
+    ):
+        counts = changed_state_counts(configs_)
+        print(
+            f"{name.capitalize()} order: transition cost {total_cost(configs_):.0f}, "
+            + ", ".join(f"{v} {k} changes" for k, v in counts.items())
+        )
+
+    return [samples[k] for k in order]
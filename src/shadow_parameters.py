@@ -1,5 +1,7 @@
 import bpy
 
+import scene_changes
+
 
 data = bpy.data
 scene = data.scenes["Scene"]
@@ -15,9 +17,13 @@ class Shadows:
 
     @visible.setter
     def visible(self, visible):
-        hide = not visible
-        self.obj.hide_render = hide
-        self.obj.hide_viewport = hide
+        def apply(hide):
+            self.obj.hide_render = hide
+            self.obj.hide_viewport = hide
+
+        scene_changes.tracker.write(
+            "geometry", (self.obj.name, "hide"), not visible, apply
+        )
 
     @property
     def seed(self):
@@ -25,4 +31,7 @@ class Shadows:
 
     @seed.setter
     def seed(self, seed):
-        self.obj["seed"] = seed
+        def apply(seed):
+            self.obj["seed"] = seed
+
+        scene_changes.tracker.write("geometry", (self.obj.name, "seed"), seed, apply)
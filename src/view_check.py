@@ -0,0 +1,283 @@
+from typing import Union, Optional, Dict, Tuple
+import math
+from collections import Counter
+
+from pathlib import Path as pth
+
+import numpy as np
+
+import config
+
+
+# a sample is rejected for the first limit it fails, in this order
+default_limits = {
+    # fraction of the paper area inside of the frame
+    "min_visible_fraction": 0.98,
+    # fraction of the frame covered by the paper
+    "min_coverage": 0.05,
+    # rough irradiance at the paper center, a uniform hdri of strength 1 is pi
+    "min_illumination": 0.3,
+}
+
+rejection_reasons = {
+    "min_visible_fraction": "out_of_frame",
+    "min_coverage": "too_small",
+    "min_illumination": "too_dark",
+}
+
+# blender default, the field of view driver of the scene reads it
+sensor_width_mm = 36.0
+# paper points per side that are projected for the visible fraction
+grid_size = 8
+chunk_size = 16384
+
+
+def rotation_matrices(orbit: np.ndarray) -> np.ndarray:
+    # look at objects rotate by the attitude around x, then the azimuth around z
+    attitude, azimuth = np.radians(orbit).T
+    cos_x, sin_x = np.cos(attitude), np.sin(attitude)
+    cos_z, sin_z = np.cos(azimuth), np.sin(azimuth)
+    zeros, ones = np.zeros_like(cos_x), np.ones_like(cos_x)
+
+    rotation_x = np.stack(
+        (ones, zeros, zeros, zeros, cos_x, -sin_x, zeros, sin_x, cos_x), -1
+    ).reshape(-1, 3, 3)
+    rotation_z = np.stack(
+        (cos_z, -sin_z, zeros, sin_z, cos_z, zeros, zeros, zeros, ones), -1
+    ).reshape(-1, 3, 3)
+
+    return rotation_z @ rotation_x
+
+
+def orbit_positions(
+    look_at_2d: np.ndarray, orbit: np.ndarray, distance: np.ndarray
+) -> np.ndarray:
+    # children of the look at objects sit on their local z axis
+    look_at = np.c_[look_at_2d, np.zeros(len(look_at_2d))]
+    return look_at + rotation_matrices(orbit)[..., 2] * distance[:, None]
+
+
+def paper_points(paper_size: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # scene units are the long side of the paper, the paper lies centered on
+    # the xy plane, folds and crumpling are ignored
+    half_size = paper_size / paper_size.max(-1, keepdims=True) / 2
+
+    steps = (np.arange(grid_size) + 0.5) / grid_size * 2 - 1
+    grid = np.stack(np.meshgrid(steps, steps), -1).reshape(-1, 2)
+    points = grid[None] * half_size[:, None]
+
+    corners = np.array(((-1, -1), (1, -1), (1, 1), (-1, 1)))[None] * half_size[:, None]
+    return points, corners
+
+
+def project(
+    points: np.ndarray,
+    camera_position: np.ndarray,
+    rotation: np.ndarray,
+    tan_half_fov: np.ndarray,
+) -> np.ndarray:
+    # frame coordinates 0-1 of points on the paper plane, nan behind the camera
+    points = np.concatenate((points, np.zeros((*points.shape[:2], 1))), -1)
+    local = np.einsum("nij,npi->npj", rotation, points - camera_position[:, None])
+
+    depth = -local[..., 2]
+    in_front = depth > 1e-6
+    ndc = local[..., :2] / np.where(in_front, depth, 1)[..., None]
+    ndc /= tan_half_fov[:, None]
+
+    frame = (ndc + 1) / 2
+    frame[~in_front] = np.nan
+    return frame
+
+
+def view_metrics(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    # screen coverage, visible fraction and illumination of every sample of
+    # a column batch from the config values only, nothing is rendered
+    n = len(columns["camera.focal_length"])
+    metrics = {k: np.empty(n) for k in ("coverage", "visible_fraction")}
+
+    for start in range(0, n, chunk_size):
+        part = slice(start, start + chunk_size)
+        coverage, visible_fraction = paper_visibility(
+            {k: np.asarray(v[part]) for k, v in columns.items()}
+        )
+        metrics["coverage"][part] = coverage
+        metrics["visible_fraction"][part] = visible_fraction
+
+    metrics["illumination"] = illumination(columns)
+    return metrics
+
+
+def paper_visibility(columns: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    focal_length = columns["camera.focal_length"].astype(float)
+    resolution = columns["render.resolution"].astype(float)
+
+    # the same drivers as the scene, the camera is relative_camera_distance
+    # frame widths away from its look at object
+    tan_half = sensor_width_mm / (2 * np.maximum(focal_length, 1))
+    distance = columns["camera.relative_camera_distance"] / (2 * tan_half)
+
+    # the sensor fits the longer side of the resolution
+    aspect = resolution[:, 0] / resolution[:, 1]
+    tan_half_fov = np.stack(
+        (
+            np.where(aspect >= 1, tan_half, tan_half * aspect),
+            np.where(aspect >= 1, tan_half / aspect, tan_half),
+        ),
+        -1,
+    )
+
+    rotation = rotation_matrices(columns["camera.orbit"].astype(float))
+    camera_position = orbit_positions(
+        columns["camera.look_at_2d"].astype(float),
+        columns["camera.orbit"].astype(float),
+        distance,
+    )
+
+    points, corners = paper_points(columns["paper.size"].astype(float))
+    frame_points = project(points, camera_position, rotation, tan_half_fov)
+    frame_corners = project(corners, camera_position, rotation, tan_half_fov)
+
+    inside = np.all((frame_points >= 0) & (frame_points <= 1), -1)
+    visible_fraction = inside.mean(-1)
+
+    # shoelace area of the projected paper outline
+    x, y = frame_corners[..., 0], frame_corners[..., 1]
+    area = np.abs((x * np.roll(y, -1, -1) - np.roll(x, -1, -1) * y).sum(-1) / 2)
+    coverage = np.nan_to_num(area * visible_fraction)
+
+    # part of the paper behind the camera
+    behind = np.isnan(frame_corners).any((-1, -2))
+    visible_fraction[behind] = 0
+    coverage[behind] = 0
+
+    return coverage, visible_fraction
+
+
+def illumination(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    # irradiance at the paper center from the hdri and every visible spot light
+    irradiance = math.pi * columns["hdri.light_strength"].astype(float)
+
+    i = 0
+    while f"lights.{i}.power" in columns:
+        prefix = f"lights.{i}."
+        look_at_2d = columns[f"{prefix}look_at_2d"].astype(float)
+        orbit = columns[f"{prefix}orbit"].astype(float)
+        position = orbit_positions(
+            look_at_2d, orbit, columns[f"{prefix}distance"].astype(float)
+        )
+
+        radius = np.linalg.norm(position, axis=-1)
+        to_paper = -position / radius[:, None]
+        cos_incidence = np.maximum(-to_paper[:, 2], 0)
+
+        # the spot points at its look at object
+        axis = np.c_[look_at_2d, np.zeros(len(look_at_2d))] - position
+        axis /= np.linalg.norm(axis, axis=-1, keepdims=True)
+        half_cone = np.radians(columns[f"{prefix}light_cone_angle"].astype(float)) / 2
+        in_cone = np.sum(axis * to_paper, -1) >= np.cos(half_cone)
+
+        power = columns[f"{prefix}power"].astype(float)
+        visible = columns[f"{prefix}visible"].astype(bool)
+        irradiance += np.where(
+            visible & in_cone,
+            power / (4 * math.pi * radius**2) * cos_incidence,
+            0,
+        )
+        i += 1
+
+    return irradiance
+
+
+def rejections(
+    metrics: Dict[str, np.ndarray], limits: Optional[Dict[str, float]] = None
+) -> np.ndarray:
+    # the reason every sample is rejected for, an empty string if it is not
+    limits = {**default_limits, **(limits or {})}
+
+    unknown_limits = set(limits) - set(default_limits)
+    if unknown_limits:
+        raise ValueError(f"{', '.join(sorted(unknown_limits))} are not view limits")
+
+    reasons = np.full(len(metrics["coverage"]), "", object)
+    for name, reason in reversed(rejection_reasons.items()):
+        metric = name[len("min_") :]
+        reasons[metrics[metric] < limits[name]] = reason
+
+    return reasons
+
+
+def config_columns(conf: config.Config) -> Dict[str, np.ndarray]:
+    # a single sample batch of the values the checks read
+    columns = {
+        "render.resolution": conf.render.resolution,
+        "paper.size": conf.paper.size,
+        "camera.focal_length": conf.camera.focal_length,
+        "camera.relative_camera_distance": conf.camera.relative_camera_distance,
+        "camera.orbit": conf.camera.orbit,
+        "camera.look_at_2d": conf.camera.look_at_2d,
+        "hdri.light_strength": conf.hdri.light_strength,
+    }
+    for i, light in enumerate(conf.lights):
+        for name in (
+            "visible",
+            "distance",
+            "orbit",
+            "look_at_2d",
+            "power",
+            "light_cone_angle",
+        ):
+            columns[f"lights.{i}.{name}"] = getattr(light, name)
+
+    return {k: np.asarray([v]) for k, v in columns.items()}
+
+
+def rejection(
+    conf: config.Config, limits: Optional[Dict[str, float]] = None
+) -> Optional[str]:
+    # checks the sample and every variant of it
+    views = [config.apply_variant(conf, k) for k in conf.variants] or [conf]
+    for view in views:
+        reason = rejections(view_metrics(config_columns(view)), limits)[0]
+        if reason:
+            return reason
+
+    return None
+
+
+class RejectionStats:
+    def __init__(self) -> None:
+        self.drawn = 0
+        self.reasons: Dict[str, int] = Counter()
+
+    def add(self, reasons: np.ndarray):
+        self.drawn += len(reasons)
+        self.reasons.update(k for k in reasons if k)
+
+    def report(self):
+        rejected = sum(self.reasons.values())
+        print(
+            f"Rejected {rejected} of {self.drawn} drawn samples "
+            f"({rejected / max(self.drawn, 1):.1%}) before rendering"
+        )
+        for reason, count in sorted(self.reasons.items(), key=lambda k: -k[1]):
+            print(f"  {reason:<14} {count}")
+
+
+def draw_config(
+    cycles_device: str = "CUDA",
+    project_root: Optional[Union[str, pth]] = None,
+    limits: Optional[Dict[str, float]] = None,
+    stats: Optional[RejectionStats] = None,
+    max_attempts: int = 100,
+) -> config.Config:
+    # draws random configs until one passes the view checks
+    for _ in range(max_attempts):
+        conf = config.Config(cycles_device, project_root)
+        reason = rejection(conf, limits)
+        if stats is not None:
+            stats.add(np.asarray([reason or ""], object))
+        if reason is None:
+            return conf
+
+    raise ValueError(f"No config passed the view checks in {max_attempts} attempts")
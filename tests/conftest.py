@@ -0,0 +1,29 @@
+import sys
+
+from pathlib import Path as pth
+
+import numpy as np
+import pytest
+
+# the host side modules import their siblings from src
+src_dir = pth(__file__).resolve().parent.parent / "src"
+if str(src_dir) not in sys.path:
+    sys.path.append(str(src_dir))
+
+
+@pytest.fixture
+def write_coordinates():
+    # a 640x512 render of a flat document covering the pixels from (100, 50)
+    # to (540, 462), stored the way read_output expects npy outputs
+    def write(path, resolution=(640, 512), box=(100, 50, 540, 462)):
+        width, height = resolution
+        x0, y0, x1, y1 = box
+        ys, xs = np.mgrid[:height, :width] + 0.5
+        u = (xs - x0) / (x1 - x0)
+        v = (ys - y0) / (y1 - y0)
+        alpha = ((u >= 0) & (u <= 1) & (v >= 0) & (v <= 1)).astype(np.float32)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(path, np.stack((u, 1 - v, alpha), -1).astype(np.float32))
+
+    return write
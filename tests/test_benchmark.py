@@ -0,0 +1,39 @@
+import benchmark
+
+
+def results(**cases):
+    return {"results": [dict(name=k, **v) for k, v in cases.items()]}
+
+
+def test_regressions_over_the_tolerance():
+    baseline = results(
+        base={"seconds_per_image": 10.0, "peak_rss_mb": 1000.0},
+        crop={"seconds_per_image": 5.0, "peak_rss_mb": 800.0},
+    )
+    current = results(
+        base={"seconds_per_image": 10.5, "peak_rss_mb": 1200.0},
+        crop={"seconds_per_image": 4.0, "peak_rss_mb": 800.0},
+        new={"seconds_per_image": 100.0},
+    )
+
+    assert benchmark.regressions(baseline, current) == [
+        "base peak_rss_mb 1000.00 -> 1200.00 (+20%)"
+    ]
+    assert len(benchmark.regressions(baseline, current, {"peak_rss_mb": 0.5})) == 0
+
+
+def test_failed_cases():
+    baseline = results(base={"seconds_per_image": 10.0}, old={"error": "crashed"})
+    current = results(base={"error": "crashed"}, old={"seconds_per_image": 99.0})
+
+    assert benchmark.regressions(baseline, current) == ["base failed: crashed"]
+
+
+def test_sweep_cases_skip_the_base_value():
+    columns = benchmark.seeded_columns(3, 0)
+    cases = benchmark.sweep_cases(
+        {"render.resolution": [(1024, 1024), (512, 512)]}, columns
+    )
+
+    assert list(cases) == ["base", "resolution_512x512"]
+    assert cases["resolution_512x512"]["render.resolution"].tolist() == [[512, 512]] * 3
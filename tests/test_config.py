@@ -0,0 +1,180 @@
+import json
+
+import pytest
+
+import config
+
+
+# render keys of configs written before the render budget, level of detail,
+# output format, crop, coordinate pass, denoiser and ground truth options
+legacy_render_keys = (
+    "output_dir",
+    "resolution",
+    "compression_ratio",
+    "render_engine",
+    "cycles_device",
+    "cycles_samples",
+    "cycles_denoise",
+)
+
+
+def drawn_config():
+    config.set_seed(0)
+    return config.Config("CPU", "/project")
+
+
+def test_round_trip(tmp_path):
+    conf = drawn_config()
+    conf.variants = [{"name": "top", "camera": {"orbit": (0, 0)}}]
+
+    assert config.load_config(config.dump_config(conf)) == conf
+    assert conf.from_dict(conf.to_dict()) == conf
+
+    path = tmp_path / "sample.json"
+    config.write_config(path, conf)
+    assert config.read_config(path) == conf
+
+
+def test_unknown_key():
+    dictionary = config.dump_config(drawn_config())
+    dictionary["paper"]["sizes"] = [21, 29.7]
+
+    with pytest.raises(config.ConfigValueError) as error:
+        config.load_config(dictionary)
+    assert str(error.value) == "config.paper has unknown keys sizes"
+
+
+@pytest.mark.parametrize(
+    "section, key, value, message",
+    [
+        ("ground", "visible", 1, "has to be of type bool, got 1"),
+        ("render", "resolution", [1024, 1024, 3], "has to have 2 items, got 3"),
+        ("camera", "focal_length", "50mm", "has to be of type float, got '50mm'"),
+    ],
+)
+def test_wrong_type(section, key, value, message):
+    dictionary = config.dump_config(drawn_config())
+    dictionary[section][key] = value
+
+    with pytest.raises(config.ConfigValueError) as error:
+        config.load_config(dictionary)
+    assert error.value.keys == [section, key]
+    assert str(error.value) == f"config.{section}.{key} {message}"
+
+
+def test_wrong_type_in_a_list():
+    dictionary = config.dump_config(drawn_config())
+    dictionary["lights"][1]["power"] = "bright"
+
+    with pytest.raises(config.ConfigValueError) as error:
+        config.load_config(dictionary)
+    assert str(error.value).startswith("config.lights.1.power ")
+
+
+def test_legacy_json_without_the_new_render_keys(tmp_path):
+    dictionary = config.dump_config(drawn_config())
+    dictionary["render"] = {k: dictionary["render"][k] for k in legacy_render_keys}
+    del dictionary["ground"]["detail_mode"]
+    del dictionary["variants"]
+
+    path = tmp_path / "legacy.json"
+    path.write_text(json.dumps(dictionary))
+    conf = config.read_config(path)
+
+    assert conf.render.resolution == tuple(dictionary["render"]["resolution"])
+    assert conf.render.lod_pixels_per_edge is None
+    assert conf.render.output_formats == {}
+    assert conf.render.crop_to_paper is False
+    assert conf.render.coordinate_pass == "combined"
+    assert conf.render.ground_truth_passes == []
+    assert conf.ground.detail_mode == "mesh"
+    assert conf.variants == []
+
+
+def test_legacy_render_without_denoiser_stays_undenoised():
+    dictionary = config.dump_config(drawn_config())
+    del dictionary["render"]["denoiser"]
+    conf = config.load_config(dictionary)
+
+    assert conf.render.denoiser == "cycles"
+    assert conf.render.cycles_denoise is False
+
+
+def test_render_denoiser_honours_cycles_denoise():
+    dictionary = config.dump_config(drawn_config())
+    dictionary["render"].update(cycles_denoise=True, denoiser="cycles")
+    assert config.load_config(dictionary).render.cycles_denoise is True
+
+    # configs built in code aren't legacy configs
+    assert config.Render("/project", cycles_denoise=True).cycles_denoise is True
+    assert config.Render("/project").cycles_denoise is True
+    assert config.Config("CPU", "/project").render.cycles_denoise is True
+
+
+def test_partial_section_draws_the_missing_values():
+    config.set_seed(1)
+    paper = config.load_section(config.Paper, {"subdivisions": 4}, "/project")
+    config.set_seed(2)
+    other = config.load_section(config.Paper, {"subdivisions": 4}, "/project")
+
+    assert paper.subdivisions == other.subdivisions == 4
+    assert paper.size == (21.0, 29.7)
+    assert 0 <= paper.crumpling_strength <= 1.5
+    assert paper.crumpling_strength != other.crumpling_strength
+
+
+def test_missing_sections_are_drawn():
+    conf = config.load_config({"project_root": "/project", "camera": {"orbit": [0, 0]}})
+
+    assert conf.project_root == str(config.pth("/project").resolve())
+    assert conf.render.cycles_device == "CUDA"
+    assert conf.camera.orbit == (0, 0)
+    assert 24 <= conf.camera.focal_length <= 135
+    assert len(conf.lights) == 2
+
+
+def test_partial_top_level_dict_without_project_root():
+    conf = config.load_config({"paper": {"subdivisions": 4}})
+
+    assert conf.paper.subdivisions == 4
+    assert conf.render.cycles_device == "CUDA"
+    assert conf.project_root == str(config.pth.cwd().resolve())
+
+
+def test_variants_are_checked():
+    dictionary = config.dump_config(drawn_config())
+    dictionary["variants"] = [
+        {"name": "top", "camera": {"orbit": [0, 0]}},
+        {"name": "dim", "hdri": {"light_strength": 0.05}, "lights": [{"power": 200}]},
+    ]
+
+    conf = config.load_config(dictionary)
+    assert conf.variants[0] == {"name": "top", "camera": {"orbit": (0, 0)}}
+    assert config.apply_variant(conf, conf.variants[1]).lights[0].power == 200
+
+
+@pytest.mark.parametrize(
+    "variants, message",
+    [
+        (
+            [{"name": "a", "paper": {}}],
+            "config.variants.0 has unknown keys paper, variants can only override "
+            "the camera, hdri and lights",
+        ),
+        ([{"name": "a", "camera": {"zoom": 2}}], "config.variants.0.camera has "),
+        ([{"camera": {}}], "config.variants.0.name has to be a non-empty string"),
+        ([{"name": "a", "lights": [{}, {}, {}]}], "config.variants.0.lights has "),
+        (
+            [{"name": "a", "lights": [{}, {"power": "bright"}]}],
+            "config.variants.0.lights.1.power has to be of type float",
+        ),
+        ([{"name": "a"}, {"name": "a"}], "config.variants have duplicate names a"),
+    ],
+)
+def test_invalid_variants(variants, message):
+    dictionary = config.dump_config(drawn_config())
+    dictionary["variants"] = variants
+
+    with pytest.raises(config.ConfigValueError) as error:
+        config.load_config(dictionary)
+    assert str(error.value).startswith(message)
@@ -0,0 +1,102 @@
+import numpy as np
+
+import config
+import config_batch
+import view_check
+
+
+def test_batch_round_trip(tmp_path):
+    columns = config_batch.generate_batch(16, 0, "CPU", project_root=tmp_path)
+    path = tmp_path / "configs.batch"
+    config_batch.write_batch(path, columns)
+
+    # constant columns are stored as a single value
+    assert np.load(path / "paper.size.npy").shape == (2,)
+    assert np.load(path / "ground.offset.npy").shape == (16,)
+
+    batch = config_batch.BatchReader(path)
+    assert len(batch) == 16
+    assert batch.name(3) == "sample_00000003"
+    for key, column in columns.items():
+        np.testing.assert_array_equal(batch.columns[key], column)
+
+    sample = batch.config(3)
+    assert sample.paper.size == (21.0, 29.7)
+    assert sample.ground.offset == columns["ground.offset"][3]
+
+
+def test_read_npz_batch(tmp_path):
+    columns = config_batch.generate_batch(4, 0, "CPU", project_root=tmp_path)
+    path = tmp_path / "configs.npz"
+    np.savez(path, **columns)
+
+    assert config_batch.is_batch(path)
+    batch = config_batch.BatchReader(path)
+    assert batch.config(2).camera.focal_length == columns["camera.focal_length"][2]
+
+
+def test_draw_columns_match_config():
+    n = 2000
+    config.set_seed(0)
+    expected = config_batch.to_columns(
+        [config.Config("CPU", "/project") for _ in range(n)]
+    )
+    drawn = config_batch.draw_columns(np.random.default_rng(0), n, "CPU", "/project")
+
+    assert drawn.keys() == expected.keys()
+    for key, column in drawn.items():
+        assert column.shape == expected[key].shape, key
+        if column.dtype.kind not in "biuf":
+            assert set(column.ravel()) == set(expected[key].ravel()), key
+            continue
+
+        if not column.size:
+            continue
+
+        column, reference = column.astype(float), expected[key].astype(float)
+        spread = max(np.ptp(reference), 1e-9)
+        for statistic in (np.min, np.max, np.mean):
+            difference = abs(statistic(column) - statistic(reference))
+            assert difference <= 0.05 * spread, (key, statistic.__name__)
+
+
+def test_generate_batch_numbers_the_accepted_samples(capsys):
+    limits = {"min_coverage": 0.41}
+    columns = config_batch.generate_batch(
+        64, 0, "CPU", project_root="/project", view_limits=limits, max_redraws=1
+    )
+
+    n = len(columns[config_batch.name_column])
+    assert 0 < n < 64
+    assert "samples that failed every redraw" in capsys.readouterr().out
+    assert columns[config_batch.name_column].tolist() == [
+        f"sample_{i:08d}" for i in range(n)
+    ]
+    assert all(len(k) == n for k in columns.values())
+
+    metrics = view_check.view_metrics(columns)
+    assert (view_check.rejections(metrics, limits) == "").all()
+
+
+def test_generate_batch_checks_keep_the_first_draw():
+    plain = config_batch.generate_batch(32, 0, "CPU", project_root="/project")
+    checked = config_batch.generate_batch(
+        32, 0, "CPU", project_root="/project", view_limits={}
+    )
+
+    # samples that pass are the same as without checks
+    metrics = view_check.view_metrics(plain)
+    passed = view_check.rejections(metrics) == ""
+    for key, column in plain.items():
+        np.testing.assert_array_equal(checked[key][passed], column[passed])
+
+
+def test_config_from_columns_is_deterministic(tmp_path):
+    columns = config_batch.generate_batch(4, 0, "CPU", project_root=tmp_path)
+    # parameters without a column are drawn, the same way on every load
+    del columns["ground.offset"], columns["lights.0.orbit"]
+
+    first = config_batch.config_from_columns(columns, 1).to_dict()
+    config.Config("CPU", tmp_path)
+    assert config_batch.config_from_columns(columns, 1).to_dict() == first
+    assert config_batch.config_from_columns(columns, 2).to_dict() != first
@@ -0,0 +1,48 @@
+import numpy as np
+
+import coordinate_index
+
+
+def test_corners_round_trip(tmp_path, write_coordinates):
+    path = tmp_path / "coordinates0001.npy"
+    write_coordinates(path)
+    index = coordinate_index.CoordinateIndex.from_file(path)
+    assert index.image_size == (640, 512)
+
+    corners = [[0, 0], [1, 0], [1, 1], [0, 1]]
+    pixels, status = index.remap_uv(corners)
+
+    assert (status == coordinate_index.VISIBLE).all()
+    np.testing.assert_allclose(
+        pixels, [[100, 50], [540, 50], [540, 462], [100, 462]], atol=0.1
+    )
+
+
+def test_interior_points(tmp_path, write_coordinates):
+    path = tmp_path / "coordinates0001.npy"
+    write_coordinates(path)
+    # cells of many pixels, the default grid fits a few pixels per cell
+    index = coordinate_index.CoordinateIndex.from_file(path, 32)
+
+    uv = np.random.default_rng(0).uniform(0, 1, (100, 2))
+    pixels, status = index.remap_uv(uv)
+
+    assert (status == coordinate_index.VISIBLE).all()
+    np.testing.assert_allclose(pixels, uv * (440, 412) + (100, 50), atol=0.1)
+
+
+def test_off_paper_and_occluded(tmp_path, write_coordinates):
+    path = tmp_path / "coordinates0001.npy"
+    write_coordinates(path)
+    coords, _ = coordinate_index.read_coordinates(path)
+    # something in front of the top left quarter of the paper
+    coords[:256, :320] = -1
+    index = coordinate_index.CoordinateIndex(coords)
+
+    pixels, status = index.remap_uv([[0.1, 0.1], [0.9, 0.9], [1.5, 0.5]])
+    assert status.tolist() == [
+        coordinate_index.OCCLUDED,
+        coordinate_index.VISIBLE,
+        coordinate_index.OFF_PAPER,
+    ]
+    assert np.isnan(pixels[[0, 2]]).all()
@@ -0,0 +1,71 @@
+import json
+
+import numpy as np
+import pytest
+
+import manifest
+import dataset_export
+
+
+def test_shard_writer_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        dataset_export.ShardWriter(tmp_path)
+
+
+def write_render(tmp_path, write_coordinates):
+    # a sample with two variants, only the top one has an image
+    output_dir = tmp_path / "output"
+    for view in ("top", "side"):
+        write_coordinates(output_dir / "sample" / view / "coordinates0001.npy")
+    np.save(output_dir / "sample" / "top" / "image0001.npy", np.zeros((512, 640, 3)))
+    manifest.write_record(output_dir, "sample", None, "hash", 1.0)
+
+    annotations = tmp_path / "page.annotations.json"
+    annotations.write_text(
+        json.dumps(
+            {
+                "image_size": [200, 100],
+                "annotations": [{"type": "box", "bbox": [50, 25, 150, 75]}],
+            }
+        )
+    )
+
+    return output_dir, annotations
+
+
+def test_export_skips_views_without_an_image(tmp_path, write_coordinates, capsys):
+    output_dir, annotations = write_render(tmp_path, write_coordinates)
+
+    export_dir = tmp_path / "export"
+    dataset_export.export(
+        output_dir, export_dir, "jsonl", n_workers=1, annotations=annotations
+    )
+    assert "Exported 1 views, 1 failed" in capsys.readouterr().out
+
+    shards = [json.loads(k) for k in open(export_dir / "index.jsonl")]
+    assert [k["samples"] for k in shards] == [["sample_top"]]
+
+    (record,) = [json.loads(k) for k in open(export_dir / "shard-000000.jsonl")]
+    # relative to the output directory
+    assert record["image"] == "sample/top/image0001.npy"
+    np.testing.assert_allclose(
+        record["annotations"][0]["points"][0], (210, 153), atol=0.1
+    )
+
+
+def test_export_again_after_a_new_render(tmp_path, write_coordinates):
+    output_dir, annotations = write_render(tmp_path, write_coordinates)
+    export_dir = tmp_path / "export"
+
+    def export():
+        dataset_export.export(
+            output_dir, export_dir, "jsonl", n_workers=1, annotations=annotations
+        )
+        return [json.loads(k)["samples"] for k in open(export_dir / "index.jsonl")]
+
+    assert export() == [["sample_top"]]
+    assert export() == [["sample_top"]]
+
+    # e.g. rendered again with --resume after the config changed
+    manifest.write_record(output_dir, "sample", None, "new hash", 1.0)
+    assert export() == [["sample_top"], ["sample_top"]]
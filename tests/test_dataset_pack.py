@@ -0,0 +1,39 @@
+import numpy as np
+
+import config
+import manifest
+import dataset_pack
+
+
+def test_pack_round_trip(tmp_path, write_coordinates):
+    output_dir = tmp_path / "output"
+    config.set_seed(0)
+    conf = config.Config("CPU", "/project")
+    conf.variants = [{"name": "top", "camera": {"orbit": (0, 0)}}]
+
+    image = np.random.default_rng(0).uniform(0, 1, (512, 640, 3)).astype(np.float32)
+    for view in ("top", "side"):
+        write_coordinates(output_dir / "sample" / view / "coordinates0001.npy")
+        np.save(output_dir / "sample" / view / "image0001.npy", image)
+    manifest.write_record(
+        output_dir, "sample", None, "hash", 1.0, {"config": conf.to_dict()}
+    )
+
+    pack_dir = tmp_path / "pack"
+    dataset_pack.pack(output_dir, pack_dir, n_workers=1)
+    reader = dataset_pack.DatasetReader(pack_dir)
+
+    assert len(reader) == 2
+    assert [reader.name(k) for k in range(2)] == ["sample_side", "sample_top"]
+    np.testing.assert_array_equal(reader.image(0), np.round(image * 255))
+    assert reader.batch(slice(0, 2)).shape == (2, 512, 640, 3)
+
+    coords = reader.coordinates_float(0)
+    assert (coords[0, 0] == -1).all()
+    np.testing.assert_allclose(coords[50, 100], (0.5 / 440, 0.5 / 412), atol=1e-4)
+    assert reader.mask(0)[256, 320] == 255
+
+    # variants are packed with their overrides applied
+    assert reader.config(1).camera.orbit == (0, 0)
+    assert reader.config(0) == conf
+    assert reader.parameters(1)["camera.orbit"] == [0, 0]
@@ -0,0 +1,41 @@
+import numpy as np
+
+import denoise
+
+
+def test_filter_gets_rgb_and_xyz(tmp_path, monkeypatch):
+    rgb = np.full((4, 4, 3), (0.1, 0.2, 0.3), np.float32)
+    xyz = np.full((4, 4, 3), (0.0, 0.6, 0.8), np.float32)
+    # npy outputs are stored in rgb order
+    np.save(tmp_path / "image0001.npy", rgb)
+    np.save(tmp_path / "denoising_albedo0001.npy", rgb)
+    np.save(tmp_path / "denoising_normal0001.npy", xyz)
+
+    filtered = {}
+
+    def run_filter(color, albedo, normal):
+        filtered.update(color=color, albedo=albedo, normal=normal)
+        return color
+
+    monkeypatch.setattr(denoise, "run_filter", run_filter)
+    denoise.denoise_view(tmp_path)
+
+    np.testing.assert_allclose(filtered["color"], rgb / (1 + rgb), rtol=1e-6)
+    np.testing.assert_allclose(filtered["albedo"], rgb)
+    np.testing.assert_allclose(filtered["normal"], xyz)
+    np.testing.assert_allclose(np.load(tmp_path / "image0001.npy"), rgb, rtol=1e-5)
+    assert not (tmp_path / "denoising_normal0001.npy").exists()
+
+
+def test_interrupted_view_counts_as_denoised(tmp_path, monkeypatch):
+    rgb = np.full((4, 4, 3), 0.5, np.float32)
+    np.save(tmp_path / "image0001.npy", rgb)
+    # stopped after deleting the first pass, the image is already denoised
+    np.save(tmp_path / "denoising_normal0001.npy", rgb)
+
+    def run_filter(color, albedo, normal):
+        raise AssertionError("denoised twice")
+
+    monkeypatch.setattr(denoise, "run_filter", run_filter)
+    assert denoise.denoise_views([tmp_path]) == [None]
+    np.testing.assert_array_equal(np.load(tmp_path / "image0001.npy"), rgb)
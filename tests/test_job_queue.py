@@ -0,0 +1,67 @@
+import sys
+import json
+import subprocess
+
+import job_queue
+
+
+def test_directory_jobs_skip_unfinished_files(tmp_path):
+    # a job that is still being written, under a temporary name
+    (tmp_path / ".b.json").write_text('{"name": "b", "conf')
+    (tmp_path / "c.json.tmp").write_text('{"name": "c", "conf')
+    result_path = job_queue.submit_directory_job(tmp_path, "a", {"name": "a"})
+
+    jobs = job_queue.directory_jobs(tmp_path, poll_interval=0.01)
+    job, reply = next(jobs)
+    assert job == {"name": "a"}
+    assert not (tmp_path / "a.json").exists()
+
+    reply({"status": "rendered"})
+    assert json.loads(result_path.read_text()) == {"status": "rendered"}
+    assert sorted(k.name for k in tmp_path.iterdir()) == [
+        ".b.json",
+        "c.json.tmp",
+        "results",
+    ]
+
+    # the finished rename is picked up
+    (tmp_path / ".b.json").write_text('{"name": "b"}')
+    (tmp_path / ".b.json").rename(tmp_path / "b.json")
+    assert next(jobs)[0] == {"name": "b"}
+
+
+def test_parse_job():
+    assert job_queue.parse_job('{"command": "stop"}') == {"command": "stop"}
+    assert job_queue.parse_job("[1]")["command"] == "invalid"
+    assert job_queue.parse_job('{"name": ')["command"] == "invalid"
+
+
+def test_reclaim_jobs_of_crashed_workers(tmp_path):
+    # a process that already exited
+    process = subprocess.Popen([sys.executable, "-c", ""])
+    process.wait()
+
+    job_path = tmp_path / "a.json"
+    crashed = tmp_path / job_queue.claimed_name(job_path, pid=process.pid)
+    running = tmp_path / job_queue.claimed_name(tmp_path / "b.json")
+    other_host = tmp_path / job_queue.claimed_name(
+        tmp_path / "c.json", "other_host", process.pid
+    )
+    for path in (crashed, running, other_host):
+        path.write_text('{"name": "job"}')
+
+    assert job_queue.reclaim_jobs(tmp_path) == [job_path]
+    assert job_path.is_file()
+    assert running.is_file() and other_host.is_file()
+
+
+def test_failed_replies_are_logged(capsys):
+    def reply(result):
+        raise BrokenPipeError("client went away")
+
+    assert not job_queue.send_reply(reply, {"id": 3})
+    assert "Failed to reply to job 3" in capsys.readouterr().out
+
+    replies = []
+    assert job_queue.send_reply(replies.append, {"id": 4})
+    assert replies == [{"id": 4}]
@@ -0,0 +1,60 @@
+import numpy as np
+
+import level_of_detail
+
+
+resolution = (640, 512)
+
+
+def quad(corners):
+    edges = np.array([[0, 1], [1, 2], [2, 3], [3, 0]])
+    polygons = (np.arange(4), np.arange(4), np.array([0]))
+    return np.array(corners, float), np.ones(4, bool), edges, polygons
+
+
+def test_edge_crossing_the_frame():
+    pixels = np.array([[-100, 256], [740, 256]], float)
+    edges = np.array([[0, 1]])
+    polygons = (np.empty(0, int), np.empty(0, int), np.empty(0, int))
+
+    lengths = level_of_detail.edge_pixels(
+        pixels, np.ones(2, bool), edges, polygons, resolution
+    )
+    np.testing.assert_allclose(lengths, [840])
+
+
+def test_edge_outside_of_the_frame():
+    pixels = np.array([[-100, -10], [740, -10]], float)
+    edges = np.array([[0, 1]])
+    polygons = (np.empty(0, int), np.empty(0, int), np.empty(0, int))
+
+    lengths = level_of_detail.edge_pixels(
+        pixels, np.ones(2, bool), edges, polygons, resolution
+    )
+    assert not len(lengths)
+
+
+def test_quad_larger_than_the_frame():
+    lengths = level_of_detail.edge_pixels(
+        *quad([[-100, -100], [740, -100], [740, 612], [-100, 612]]), resolution
+    )
+    np.testing.assert_allclose(sorted(lengths), [712, 712, 840, 840])
+    assert level_of_detail.subdivision_level(lengths, 16, 8) == 6
+
+
+def test_quad_next_to_the_frame():
+    lengths = level_of_detail.edge_pixels(
+        *quad([[700, 0], [900, 0], [900, 200], [700, 200]]), resolution
+    )
+    assert not len(lengths)
+
+
+def test_quad_behind_the_camera():
+    pixels, in_front, edges, polygons = quad(
+        [[-100, -100], [740, -100], [740, 612], [-100, 612]]
+    )
+    in_front[0] = False
+
+    # the projection of the polygon is undefined, its edges are all outside
+    lengths = level_of_detail.edge_pixels(pixels, in_front, edges, polygons, resolution)
+    assert not len(lengths)
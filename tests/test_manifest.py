@@ -0,0 +1,66 @@
+import manifest
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def test_merge_outputs_keeps_variant_outputs(tmp_path):
+    previous = tmp_path / "sample"
+    rendered = tmp_path / ".sample.partial"
+
+    for variant in ("top", "side"):
+        write(previous / variant / "image0001.png", f"{variant} image")
+        write(previous / variant / "normal0001.exr", f"{variant} normal")
+        write(previous / variant / "coordinates0001.exr", "old coordinates")
+        write(rendered / variant / "coordinates0001.exr", "new coordinates")
+    write(previous / "metadata.json", "metadata")
+
+    manifest.merge_outputs(previous, rendered, "coordinates")
+
+    for variant in ("top", "side"):
+        assert (rendered / variant / "image0001.png").read_text() == f"{variant} image"
+        assert (rendered / variant / "normal0001.exr").read_text() == (
+            f"{variant} normal"
+        )
+        assert (rendered / variant / "coordinates0001.exr").read_text() == (
+            "new coordinates"
+        )
+    assert (rendered / "metadata.json").read_text() == "metadata"
+
+
+def test_merge_outputs_without_variants(tmp_path):
+    previous = tmp_path / "sample"
+    rendered = tmp_path / ".sample.partial"
+
+    write(previous / "image0001.png", "image")
+    write(previous / "coordinates0001.exr", "old coordinates")
+    write(rendered / "coordinates0001.exr", "new coordinates")
+
+    manifest.merge_outputs(previous, rendered, "coordinates")
+
+    assert sorted(manifest.output_files(rendered)) == [
+        "coordinates0001.exr",
+        "image0001.png",
+    ]
+    assert (rendered / "coordinates0001.exr").read_text() == "new coordinates"
+
+
+def test_is_complete(tmp_path):
+    output_dir = tmp_path / "output"
+    write(output_dir / "sample" / "image0001.png", "image")
+    write(output_dir / "sample" / "top" / "coordinates0001.exr", "coordinates")
+    manifest.write_record(output_dir, "sample", None, "hash", 1.0)
+
+    assert manifest.is_complete(output_dir, "sample", "hash")
+    assert not manifest.is_complete(output_dir, "sample", "changed config")
+    assert not manifest.is_complete(output_dir, "other", "hash")
+
+    # a partially rewritten output doesn't match its record
+    write(output_dir / "sample" / "top" / "coordinates0001.exr", "coord")
+    assert not manifest.is_complete(output_dir, "sample", "hash")
+
+    manifest.update_record(output_dir, "sample", denoise_pending=False)
+    assert manifest.is_complete(output_dir, "sample", "hash")
+    assert manifest.read_record(output_dir, "sample")["denoise_pending"] is False
@@ -0,0 +1,34 @@
+import metrics
+
+
+def test_percentile():
+    assert metrics.percentile([4, 1, 3, 2], 50) == 2.5
+    assert metrics.percentile([1, 2, 3], 100) == 3
+    assert metrics.percentile([5], 90) == 5
+
+
+def test_write_read_and_summarize(tmp_path):
+    path = metrics.metrics_path(tmp_path / "output")
+    assert path == tmp_path / "output.metrics.jsonl"
+
+    for i, samples in enumerate((2, 2, 8)):
+        sample = metrics.SampleMetrics(f"sample_{i}")
+        sample.stages = {"set_scene": 1.0, "render": float(samples)}
+        sample.render = {"peak_memory_mb": 100.0 * (i + 1), "samples": samples}
+        sample.parameters = {"render.cycles_samples": samples}
+        sample.scene_changes = ["geometry"] if i == 0 else ["camera"]
+        metrics.write_metrics(path, sample)
+
+    records = metrics.read_metrics(path)
+    assert [k["sample"] for k in records] == ["sample_0", "sample_1", "sample_2"]
+
+    summary = metrics.summarize(records)
+    assert summary.startswith("Timings of 3 samples:")
+    assert "Peak memory: p50 200M, max 300M" in summary
+    assert "Achieved samples: min 2, p50 2, max 8" in summary
+    assert "Scene changes: camera in 2 samples, geometry in 1 samples" in summary
+    assert "Render time by render.cycles_samples:" in summary
+
+
+def test_summarize_nothing():
+    assert metrics.summarize([]) == "No metrics recorded"
@@ -0,0 +1,20 @@
+import render_farm
+
+
+def test_blender_command_fails_on_script_errors():
+    command = render_farm.blender_command("blender", "/configs", 1, 4, "CPU")
+
+    exit_code = command.index("--python-exit-code")
+    assert command[exit_code + 1] == "1"
+    assert exit_code < command.index("--python")
+    assert command[command.index("--") :] == [
+        "--",
+        "--cycles-device",
+        "CPU",
+        "--config_path",
+        "/configs",
+        "--shard-index",
+        "1",
+        "--shard-count",
+        "4",
+    ]
@@ -0,0 +1,80 @@
+import scene_changes
+
+
+def test_unchanged_writes_are_skipped():
+    tracker = scene_changes.ChangeTracker()
+    tracker.take_changes()
+    applied = []
+
+    assert tracker.write("geometry", ("Paper", "strength"), 0.5, applied.append)
+    assert not tracker.write("geometry", ("Paper", "strength"), 0.5, applied.append)
+    assert tracker.write("geometry", ("Paper", "strength"), 0.7, applied.append)
+
+    assert applied == [0.5, 0.7]
+    assert (tracker.writes, tracker.skipped) == (2, 1)
+    assert tracker.take_changes() == ["geometry"]
+
+
+def test_take_changes_clears_and_keeps_the_category_order():
+    tracker = scene_changes.ChangeTracker()
+    # a new tracker knows nothing about the scene
+    assert tracker.take_changes() == list(scene_changes.categories)
+
+    tracker.write("camera", ("Camera", "lens"), 50, lambda value: None)
+    tracker.mark("geometry")
+    assert tracker.take_changes() == ["geometry", "camera"]
+    assert tracker.take_changes() == []
+
+    # an unchanged write doesn't mark its category again
+    tracker.write("camera", ("Camera", "lens"), 50, lambda value: None)
+    assert tracker.take_changes() == []
+
+
+def test_forget_applies_everything_again():
+    tracker = scene_changes.ChangeTracker()
+    applied = []
+    tracker.write("lighting", ("Light", "power"), 500, applied.append)
+    tracker.take_changes()
+
+    tracker.forget()
+    assert tracker.take_changes() == list(scene_changes.categories)
+    tracker.write("lighting", ("Light", "power"), 500, applied.append)
+    assert applied == [500, 500]
+
+
+class ImageSlot:
+    # an image texture node loads a new image only for a new file
+    def __init__(self):
+        self.image = None
+        self.path = None
+
+    @property
+    def filepath(self):
+        return self.path
+
+    @filepath.setter
+    def filepath(self, path):
+        if path != self.path:
+            self.path = path
+            self.image = object()
+
+
+def test_write_image_marks_only_swapped_images():
+    tracker = scene_changes.ChangeTracker()
+    tracker.take_changes()
+    slot = ImageSlot()
+
+    tracker.write_image("shading", slot, "albedo.png")
+    assert tracker.take_changes() == ["shading"]
+    tracker.write_image("shading", slot, "albedo.png")
+    assert tracker.take_changes() == []
+
+
+def test_report_resets_the_counters(capsys):
+    tracker = scene_changes.ChangeTracker()
+    tracker.write("camera", "key", 1, lambda value: None)
+    tracker.write("camera", "key", 1, lambda value: None)
+
+    tracker.report()
+    assert "1 applied, 1 unchanged (50% skipped)" in capsys.readouterr().out
+    assert (tracker.writes, tracker.skipped) == (0, 0)
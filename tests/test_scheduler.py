@@ -0,0 +1,48 @@
+import config
+import scheduler
+
+
+def configs(n):
+    config.set_seed(0)
+    return [config.Config("CPU", "/project") for _ in range(n)]
+
+
+def test_schedule_groups_equal_assets():
+    samples = configs(8)
+    for i, conf in enumerate(samples):
+        conf.hdri.texture_path = f"/hdri/{i % 2}.exr"
+        conf.paper.subdivisions = 8 - i % 2
+
+    names = [f"sample_{i}" for i in range(len(samples))]
+    scheduled = scheduler.schedule(names, samples)
+
+    assert sorted(scheduled) == names
+
+    order = [samples[names.index(k)] for k in scheduled]
+    hdris = [k.hdri.texture_path for k in order]
+    assert hdris == sorted(hdris)
+    assert scheduler.total_cost(order) < scheduler.total_cost(samples)
+    assert scheduler.changed_state_counts(order)["assets"] == 2
+
+
+def test_transition_cost():
+    first, second = configs(2)
+    second.ground = first.ground
+    second.paper = first.paper
+    second.hdri = first.hdri
+    second.shadows = first.shadows
+    second.lights = first.lights
+
+    assert scheduler.transition_cost(None, first) == (
+        sum(scheduler.transition_costs.values()),
+        list(scheduler.state_keys),
+    )
+    assert scheduler.transition_cost(first, second) == (0, [])
+
+    second.shadows = config.load_section(
+        config.Shadows, {"visible": not first.shadows.visible}, "/project"
+    )
+    assert scheduler.transition_cost(first, second) == (
+        scheduler.transition_costs["visibility"],
+        ["visibility"],
+    )
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+import config
+import view_check
+
+
+def top_down_config():
+    config.set_seed(0)
+    conf = config.Config("CPU", "/project")
+    conf.camera.orbit = (0, 0)
+    conf.camera.focal_length = 50.0
+    conf.camera.look_at_2d = (0, 0)
+    return conf
+
+
+def test_centered_paper_passes():
+    conf = top_down_config()
+    metrics = view_check.view_metrics(view_check.config_columns(conf))
+
+    assert metrics["visible_fraction"][0] == 1
+    assert 0.05 < metrics["coverage"][0] < 1
+    assert view_check.rejection(conf) is None
+
+
+def test_rejection_reasons():
+    out_of_frame = top_down_config()
+    out_of_frame.camera.look_at_2d = (2, 2)
+    too_small = top_down_config()
+    too_small.camera.relative_camera_distance = 20
+    too_dark = top_down_config()
+    too_dark.hdri.light_strength = 0.0
+    too_dark.lights = tuple(
+        config.load_section(config.Light, dict(config.dump_section(k), power=0.0), "")
+        for k in too_dark.lights
+    )
+
+    assert view_check.rejection(out_of_frame) == "out_of_frame"
+    assert view_check.rejection(too_small) == "too_small"
+    assert view_check.rejection(too_dark) == "too_dark"
+
+
+def test_variants_are_checked():
+    conf = top_down_config()
+    conf.variants = [{"name": "off", "camera": {"look_at_2d": [2, 2]}}]
+    assert view_check.rejection(conf) == "out_of_frame"
+
+
+def test_batch_matches_single_configs():
+    configs = [config.Config("CPU", "/project") for _ in range(20)]
+    columns = {
+        k: np.concatenate([view_check.config_columns(c)[k] for c in configs])
+        for k in view_check.config_columns(configs[0])
+    }
+
+    reasons = view_check.rejections(view_check.view_metrics(columns))
+    assert list(reasons) == [view_check.rejection(k) or "" for k in configs]
+
+
+def test_unknown_limit():
+    metrics = view_check.view_metrics(view_check.config_columns(top_down_config()))
+    with pytest.raises(ValueError):
+        view_check.rejections(metrics, {"min_brightness": 1})